@@ -1,7 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, ParkingLot, ParkingSpot, Reservation
+from models import (
+    db,
+    User,
+    ParkingLot,
+    ParkingSpot,
+    Reservation,
+    ReservationHourlyRollup,
+)
 from datetime import datetime
+from app.caching import cached_response, cache_stats
+from api.pagination import (
+    clamp_per_page,
+    cursor_page,
+    cursor_requested,
+    InvalidCursor,
+)
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -22,6 +36,7 @@ def admin_required(f):
 @admin_bp.route("/dashboard", methods=["GET"])
 @jwt_required()
 @admin_required
+@cached_response("admin-dashboard")
 def get_dashboard():
     """Get admin dashboard data"""
     try:
@@ -36,7 +51,10 @@ def get_dashboard():
 
         # Get recent reservations
         recent_reservations = (
-            Reservation.query.order_by(Reservation.created_at.desc()).limit(10).all()
+            Reservation.with_details()
+            .order_by(Reservation.created_at.desc())
+            .limit(10)
+            .all()
         )
 
         return (
@@ -61,6 +79,18 @@ def get_dashboard():
         return jsonify({"error": str(e)}), 500
 
 
+@admin_bp.route("/cache-stats", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_cache_stats():
+    """Get hit/miss counters of the cached dashboard endpoints"""
+    try:
+        return jsonify({"cache": cache_stats()}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @admin_bp.route("/users", methods=["GET"])
 @jwt_required()
 @admin_required
@@ -70,6 +100,20 @@ def get_all_users():
         page = request.args.get("page", 1, type=int)
         per_page = request.args.get("per_page", 10, type=int)
 
+        if cursor_requested():
+            per_page = clamp_per_page(per_page)
+            users, next_cursor = cursor_page(User.query, User, per_page)
+            return (
+                jsonify(
+                    {
+                        "users": [user.to_dict() for user in users],
+                        "next_cursor": next_cursor,
+                        "per_page": per_page,
+                    }
+                ),
+                200,
+            )
+
         users = User.query.paginate(page=page, per_page=per_page, error_out=False)
 
         return (
@@ -85,6 +129,9 @@ def get_all_users():
             200,
         )
 
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -130,17 +177,15 @@ def create_parking_lot():
             number_of_spots=data["number_of_spots"],
             price_per_hour=data["price_per_hour"],
             description=data.get("description", ""),
+            total_spots=data["number_of_spots"],
+            available_spots=data["number_of_spots"],
         )
 
         db.session.add(lot)
         db.session.flush()  # To get the lot ID
 
-        # Create parking spots automatically
-        for i in range(1, data["number_of_spots"] + 1):
-            spot = ParkingSpot(
-                lot_id=lot.id, spot_number=f"SPOT-{i:03d}", status="A"  # Available
-            )
-            db.session.add(spot)
+        # Create parking spots automatically, in one executemany
+        add_spots(lot.id, 1, data["number_of_spots"])
 
         db.session.commit()
 
@@ -159,6 +204,17 @@ def create_parking_lot():
         return jsonify({"error": str(e)}), 500
 
 
+def add_spots(lot_id, first, last):
+    """Insert available spots numbered first..last with a single statement"""
+    db.session.execute(
+        db.insert(ParkingSpot),
+        [
+            {"lot_id": lot_id, "spot_number": f"SPOT-{i:03d}", "status": "A"}
+            for i in range(first, last + 1)
+        ],
+    )
+
+
 @admin_bp.route("/parking-lots/<int:lot_id>", methods=["PUT"])
 @jwt_required()
 @admin_required
@@ -185,19 +241,17 @@ def update_parking_lot(lot_id):
 
             if new_spots_count > current_spots:
                 # Add new spots
-                for i in range(current_spots + 1, new_spots_count + 1):
-                    spot = ParkingSpot(
-                        lot_id=lot.id, spot_number=f"SPOT-{i:03d}", status="A"
-                    )
-                    db.session.add(spot)
+                add_spots(lot.id, current_spots + 1, new_spots_count)
+                added = new_spots_count - current_spots
+                ParkingLot.adjust_spot_counters(lot.id, total=added, available=added)
             elif new_spots_count < current_spots:
                 # Remove spots (only if they're available)
-                spots_to_remove = (
-                    ParkingSpot.query.filter_by(lot_id=lot.id, status="A")
+                spots_to_remove = db.session.scalars(
+                    db.select(ParkingSpot.id)
+                    .where(ParkingSpot.lot_id == lot.id, ParkingSpot.status == "A")
                     .order_by(ParkingSpot.id.desc())
                     .limit(current_spots - new_spots_count)
-                    .all()
-                )
+                ).all()
 
                 if len(spots_to_remove) < (current_spots - new_spots_count):
                     return (
@@ -209,8 +263,22 @@ def update_parking_lot(lot_id):
                         400,
                     )
 
-                for spot in spots_to_remove:
-                    db.session.delete(spot)
+                # Their reservation history goes with them, as the ORM
+                # cascade did, in one statement per table, and leaves the
+                # hourly rollup the analytics read
+                ReservationHourlyRollup.forget_spots(spots_to_remove)
+                db.session.execute(
+                    db.delete(Reservation).where(
+                        Reservation.spot_id.in_(spots_to_remove)
+                    )
+                )
+                db.session.execute(
+                    db.delete(ParkingSpot).where(ParkingSpot.id.in_(spots_to_remove))
+                )
+                removed = len(spots_to_remove)
+                ParkingLot.adjust_spot_counters(
+                    lot.id, total=-removed, available=-removed
+                )
 
             lot.number_of_spots = new_spots_count
 
@@ -251,8 +319,13 @@ def delete_parking_lot(lot_id):
                 400,
             )
 
-        # Delete all spots and reservations
+        # Delete all spots and the lot's analytics rollup
         ParkingSpot.query.filter_by(lot_id=lot_id).delete()
+        db.session.execute(
+            db.delete(ReservationHourlyRollup).where(
+                ReservationHourlyRollup.lot_id == lot_id
+            )
+        )
         db.session.delete(lot)
         db.session.commit()
 
@@ -272,16 +345,23 @@ def get_parking_spots(lot_id):
         lot = ParkingLot.query.get_or_404(lot_id)
         spots = ParkingSpot.query.filter_by(lot_id=lot_id).all()
 
-        # Get current reservations for occupied spots
+        # Get current reservations for occupied spots in one query
+        current_reservations = {
+            reservation.spot_id: reservation
+            for reservation in Reservation.with_details().filter(
+                Reservation.status == "active",
+                Reservation.spot_id.in_(
+                    db.select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id)
+                ),
+            )
+        }
+
         spots_data = []
         for spot in spots:
             spot_dict = spot.to_dict()
-            if spot.status == "O":
-                current_reservation = Reservation.query.filter_by(
-                    spot_id=spot.id, status="active"
-                ).first()
-                if current_reservation:
-                    spot_dict["current_reservation"] = current_reservation.to_dict()
+            current_reservation = current_reservations.get(spot.id)
+            if spot.status == "O" and current_reservation:
+                spot_dict["current_reservation"] = current_reservation.to_dict()
             spots_data.append(spot_dict)
 
         return jsonify({"parking_lot": lot.to_dict(), "spots": spots_data}), 200
@@ -326,7 +406,8 @@ def get_user_reservations(user_id):
     try:
         user = User.query.get_or_404(user_id)
         reservations = (
-            Reservation.query.filter_by(user_id=user_id)
+            Reservation.with_details()
+            .filter_by(user_id=user_id)
             .order_by(Reservation.created_at.desc())
             .all()
         )
@@ -355,10 +436,24 @@ def get_all_reservations():
         per_page = request.args.get("per_page", 20, type=int)
         status = request.args.get("status")
 
-        query = Reservation.query
+        query = Reservation.with_details()
         if status:
             query = query.filter_by(status=status)
 
+        if cursor_requested():
+            per_page = clamp_per_page(per_page)
+            reservations, next_cursor = cursor_page(query, Reservation, per_page)
+            return (
+                jsonify(
+                    {
+                        "reservations": [r.to_dict() for r in reservations],
+                        "next_cursor": next_cursor,
+                        "per_page": per_page,
+                    }
+                ),
+                200,
+            )
+
         reservations = query.order_by(Reservation.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -376,5 +471,8 @@ def get_all_reservations():
             200,
         )
 
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
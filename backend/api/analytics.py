@@ -1,14 +1,40 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+import os
+import zlib
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    request,
+    jsonify,
+    send_file,
+    stream_with_context,
+    url_for,
+)
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, ParkingLot, ParkingSpot, Reservation, User
-from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from models import (
+    db,
+    ParkingLot,
+    ParkingSpot,
+    Reservation,
+    ReservationHourlyRollup,
+    User,
+)
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, desc, case
+from app import cache, get_celery
+from app.caching import cached_response
+from itsdangerous import BadSignature, SignatureExpired
 
 analytics_bp = Blueprint("analytics", __name__)
 
 
 @analytics_bp.route("/dashboard", methods=["GET"])
 @jwt_required()
+@cached_response("analytics-dashboard", per_user=True)
 def get_analytics_dashboard():
     """Get analytics data for dashboard"""
     try:
@@ -34,97 +60,49 @@ def get_admin_analytics():
         week_ago = today - timedelta(days=7)
         month_ago = today - timedelta(days=30)
 
-        # Basic statistics
-        total_lots = ParkingLot.query.count()
-        total_spots = ParkingSpot.query.count()
-        total_users = User.query.count()
-        total_reservations = Reservation.query.count()
-
-        # Current occupancy
-        occupied_spots = ParkingSpot.query.filter_by(status="O").count()
+        # Lot, spot and occupancy totals from the per-lot counters
+        total_lots, total_spots, occupied_spots = db.session.query(
+            func.count(ParkingLot.id),
+            func.coalesce(func.sum(ParkingLot.total_spots), 0),
+            func.coalesce(func.sum(ParkingLot.occupied_spots), 0),
+        ).one()
         occupancy_rate = round(
             (occupied_spots / total_spots * 100) if total_spots > 0 else 0, 2
         )
 
-        # Revenue statistics
-        total_revenue = (
-            db.session.query(func.sum(Reservation.parking_cost))
-            .filter(Reservation.status == "completed")
-            .scalar()
-            or 0
-        )
-
-        monthly_revenue = (
-            db.session.query(func.sum(Reservation.parking_cost))
-            .filter(
-                Reservation.status == "completed",
-                Reservation.leaving_timestamp >= month_ago,
-            )
-            .scalar()
-            or 0
-        )
+        total_users = User.query.count()
 
-        weekly_revenue = (
-            db.session.query(func.sum(Reservation.parking_cost))
-            .filter(
-                Reservation.status == "completed",
-                Reservation.leaving_timestamp >= week_ago,
-            )
-            .scalar()
-            or 0
-        )
+        # Reservation, revenue and duration totals from the hourly rollup
+        rollup = ReservationHourlyRollup
+        month_start = datetime.combine(month_ago, time.min)
+        week_start = datetime.combine(week_ago, time.min)
+        totals = db.session.query(
+            func.coalesce(func.sum(rollup.reservation_count), 0).label("reservations"),
+            func.sum(rollup.revenue).label("revenue"),
+            func.sum(case((rollup.hour_bucket >= month_start, rollup.revenue))).label(
+                "monthly_revenue"
+            ),
+            func.sum(case((rollup.hour_bucket >= week_start, rollup.revenue))).label(
+                "weekly_revenue"
+            ),
+            func.sum(rollup.completed_count).label("completed"),
+            func.sum(rollup.parked_seconds).label("parked_seconds"),
+        ).one()
 
         # Popular parking lots
         popular_lots = (
             db.session.query(
                 ParkingLot.id,
                 ParkingLot.prime_location_name,
-                func.count(Reservation.id).label("reservation_count"),
+                func.sum(rollup.reservation_count).label("reservation_count"),
             )
-            .join(ParkingSpot)
-            .join(Reservation)
+            .join(rollup, rollup.lot_id == ParkingLot.id)
             .group_by(ParkingLot.id, ParkingLot.prime_location_name)
             .order_by(desc("reservation_count"))
             .limit(5)
             .all()
         )
 
-        # Daily reservation trends (last 7 days)
-        daily_reservations = []
-        for i in range(7):
-            date = today - timedelta(days=i)
-            count = Reservation.query.filter(
-                func.date(Reservation.created_at) == date
-            ).count()
-            daily_reservations.append({"date": date.isoformat(), "reservations": count})
-
-        # Hourly distribution of reservations today
-        hourly_data = []
-        for hour in range(24):
-            count = Reservation.query.filter(
-                func.date(Reservation.created_at) == today,
-                func.extract("hour", Reservation.created_at) == hour,
-            ).count()
-            hourly_data.append({"hour": hour, "reservations": count})
-
-        # Parking duration analysis
-        avg_duration = (
-            db.session.query(
-                func.avg(
-                    func.julianday(Reservation.leaving_timestamp)
-                    - func.julianday(Reservation.parking_timestamp)
-                )
-                * 24
-            )
-            .filter(
-                Reservation.status == "completed",
-                Reservation.parking_timestamp.isnot(None),
-                Reservation.leaving_timestamp.isnot(None),
-            )
-            .scalar()
-            or 0
-        )
-
         return (
             jsonify(
                 {
@@ -132,15 +110,17 @@ def get_admin_analytics():
                         "total_lots": total_lots,
                         "total_spots": total_spots,
                         "total_users": total_users,
-                        "total_reservations": total_reservations,
+                        "total_reservations": totals.reservations,
                         "occupied_spots": occupied_spots,
                         "occupancy_rate": occupancy_rate,
-                        "avg_parking_duration_hours": round(avg_duration, 2),
+                        "avg_parking_duration_hours": round(
+                            average_hours(totals.parked_seconds, totals.completed), 2
+                        ),
                     },
                     "revenue": {
-                        "total_revenue": round(total_revenue, 2),
-                        "monthly_revenue": round(monthly_revenue, 2),
-                        "weekly_revenue": round(weekly_revenue, 2),
+                        "total_revenue": round(totals.revenue or 0, 2),
+                        "monthly_revenue": round(totals.monthly_revenue or 0, 2),
+                        "weekly_revenue": round(totals.weekly_revenue or 0, 2),
                     },
                     "popular_lots": [
                         {
@@ -151,8 +131,8 @@ def get_admin_analytics():
                         for lot in popular_lots
                     ],
                     "trends": {
-                        "daily_reservations": daily_reservations,
-                        "hourly_distribution": hourly_data,
+                        "daily_reservations": daily_reservation_trend(today),
+                        "hourly_distribution": hourly_reservation_distribution(today),
                     },
                 }
             ),
@@ -166,36 +146,19 @@ def get_admin_analytics():
 def get_user_analytics(user_id):
     """Get analytics data for user dashboard"""
     try:
-        # User's reservation statistics
-        total_reservations = Reservation.query.filter_by(user_id=user_id).count()
-        completed_reservations = Reservation.query.filter_by(
-            user_id=user_id, status="completed"
-        ).count()
-
-        # Total spent
-        total_spent = (
-            db.session.query(func.sum(Reservation.parking_cost))
-            .filter_by(user_id=user_id, status="completed")
-            .scalar()
-            or 0
-        )
-
-        # Average parking duration
-        avg_duration = (
+        # User's reservation statistics, spend and parking duration
+        completed = Reservation.status == "completed"
+        overview = (
             db.session.query(
-                func.avg(
-                    func.julianday(Reservation.leaving_timestamp)
-                    - func.julianday(Reservation.parking_timestamp)
-                )
-                * 24
+                func.count(Reservation.id).label("total"),
+                func.sum(case((completed, 1), else_=0)).label("completed"),
+                func.sum(case((completed, Reservation.parking_cost))).label("spent"),
+                (func.avg(case((completed, parking_duration_days()))) * 24).label(
+                    "avg_duration"
+                ),
             )
-            .filter_by(user_id=user_id, status="completed")
-            .filter(
-                Reservation.parking_timestamp.isnot(None),
-                Reservation.leaving_timestamp.isnot(None),
-            )
-            .scalar()
-            or 0
+            .filter(Reservation.user_id == user_id)
+            .one()
         )
 
         # Most used parking lots
@@ -205,6 +168,7 @@ def get_user_analytics(user_id):
                 ParkingLot.prime_location_name,
                 func.count(Reservation.id).label("usage_count"),
             )
+            .select_from(ParkingLot)
             .join(ParkingSpot)
             .join(Reservation)
             .filter(Reservation.user_id == user_id)
@@ -214,35 +178,10 @@ def get_user_analytics(user_id):
             .all()
         )
 
-        # Monthly spending (last 6 months)
-        monthly_spending = []
-        for i in range(6):
-            start_date = datetime.utcnow().replace(day=1) - timedelta(days=30 * i)
-            end_date = (
-                start_date.replace(month=start_date.month % 12 + 1, day=1)
-                if start_date.month < 12
-                else start_date.replace(year=start_date.year + 1, month=1, day=1)
-            )
-
-            spent = (
-                db.session.query(func.sum(Reservation.parking_cost))
-                .filter(
-                    Reservation.user_id == user_id,
-                    Reservation.status == "completed",
-                    Reservation.leaving_timestamp >= start_date,
-                    Reservation.leaving_timestamp < end_date,
-                )
-                .scalar()
-                or 0
-            )
-
-            monthly_spending.append(
-                {"month": start_date.strftime("%Y-%m"), "amount": round(spent, 2)}
-            )
-
         # Recent reservations
         recent_reservations = (
-            Reservation.query.filter_by(user_id=user_id)
+            Reservation.with_details()
+            .filter_by(user_id=user_id)
             .order_by(Reservation.created_at.desc())
             .limit(5)
             .all()
@@ -252,10 +191,12 @@ def get_user_analytics(user_id):
             jsonify(
                 {
                     "overview": {
-                        "total_reservations": total_reservations,
-                        "completed_reservations": completed_reservations,
-                        "total_spent": round(total_spent, 2),
-                        "avg_parking_duration_hours": round(avg_duration, 2),
+                        "total_reservations": overview.total,
+                        "completed_reservations": overview.completed or 0,
+                        "total_spent": round(overview.spent or 0, 2),
+                        "avg_parking_duration_hours": round(
+                            overview.avg_duration or 0, 2
+                        ),
                     },
                     "favorite_lots": [
                         {
@@ -265,7 +206,7 @@ def get_user_analytics(user_id):
                         }
                         for lot in favorite_lots
                     ],
-                    "monthly_spending": monthly_spending,
+                    "monthly_spending": monthly_spending_trend(user_id),
                     "recent_activity": [r.to_dict() for r in recent_reservations],
                 }
             ),
@@ -278,6 +219,7 @@ def get_user_analytics(user_id):
 
 @analytics_bp.route("/lots/<int:lot_id>/analytics", methods=["GET"])
 @jwt_required()
+@cached_response("lot-analytics", per_user=True)
 def get_lot_analytics(lot_id):
     """Get detailed analytics for a specific parking lot"""
     try:
@@ -287,83 +229,44 @@ def get_lot_analytics(lot_id):
 
         lot = ParkingLot.query.get_or_404(lot_id)
 
-        # Basic statistics
-        total_spots = ParkingSpot.query.filter_by(lot_id=lot_id).count()
-        occupied_spots = ParkingSpot.query.filter_by(lot_id=lot_id, status="O").count()
-
-        # Revenue for this lot
-        total_revenue = (
-            db.session.query(func.sum(Reservation.parking_cost))
-            .join(ParkingSpot)
-            .filter(ParkingSpot.lot_id == lot_id, Reservation.status == "completed")
-            .scalar()
-            or 0
-        )
-
-        # Total reservations
-        total_reservations = (
-            db.session.query(func.count(Reservation.id))
-            .join(ParkingSpot)
-            .filter(ParkingSpot.lot_id == lot_id)
-            .scalar()
-            or 0
-        )
-
-        # Average duration
-        avg_duration = (
+        # Reservation count, revenue and duration for this lot
+        rollup = ReservationHourlyRollup
+        statistics = (
             db.session.query(
-                func.avg(
-                    func.julianday(Reservation.leaving_timestamp)
-                    - func.julianday(Reservation.parking_timestamp)
-                )
-                * 24
-            )
-            .join(ParkingSpot)
-            .filter(
-                ParkingSpot.lot_id == lot_id,
-                Reservation.status == "completed",
-                Reservation.parking_timestamp.isnot(None),
-                Reservation.leaving_timestamp.isnot(None),
+                func.coalesce(func.sum(rollup.reservation_count), 0).label("total"),
+                func.sum(rollup.revenue).label("revenue"),
+                func.sum(rollup.completed_count).label("completed"),
+                func.sum(rollup.parked_seconds).label("parked_seconds"),
             )
-            .scalar()
-            or 0
+            .filter(rollup.lot_id == lot_id)
+            .one()
         )
 
-        # Peak hours analysis
-        peak_hours = []
-        for hour in range(24):
-            count = (
-                db.session.query(func.count(Reservation.id))
-                .join(ParkingSpot)
-                .filter(
-                    ParkingSpot.lot_id == lot_id,
-                    func.extract("hour", Reservation.parking_timestamp) == hour,
-                )
-                .scalar()
-                or 0
-            )
-            peak_hours.append({"hour": hour, "reservations": count})
-
         return (
             jsonify(
                 {
                     "lot_info": lot.to_dict(),
                     "statistics": {
-                        "total_spots": total_spots,
-                        "occupied_spots": occupied_spots,
+                        "total_spots": lot.total_spots,
+                        "occupied_spots": lot.occupied_spots,
                         "occupancy_rate": round(
                             (
-                                (occupied_spots / total_spots * 100)
-                                if total_spots > 0
+                                (lot.occupied_spots / lot.total_spots * 100)
+                                if lot.total_spots > 0
                                 else 0
                             ),
                             2,
                         ),
-                        "total_revenue": round(total_revenue, 2),
-                        "total_reservations": total_reservations,
-                        "avg_duration_hours": round(avg_duration, 2),
+                        "total_revenue": round(statistics.revenue or 0, 2),
+                        "total_reservations": statistics.total,
+                        "avg_duration_hours": round(
+                            average_hours(
+                                statistics.parked_seconds, statistics.completed
+                            ),
+                            2,
+                        ),
                     },
-                    "peak_hours": peak_hours,
+                    "peak_hours": lot_peak_hours(lot_id),
                 }
             ),
             200,
@@ -373,54 +276,343 @@ def get_lot_analytics(lot_id):
         return jsonify({"error": str(e)}), 500
 
 
+def parking_duration_days():
+    """Parked time of a reservation in days, NULL until both timestamps exist"""
+    return func.julianday(Reservation.leaving_timestamp) - func.julianday(
+        Reservation.parking_timestamp
+    )
+
+
+def average_hours(total_seconds, count):
+    """Average duration in hours from a summed number of seconds"""
+    return (total_seconds / count / 3600) if count else 0
+
+
+def daily_reservation_trend(today, days=7):
+    """Reservations created per day for the last `days` days, newest first"""
+    rollup = ReservationHourlyRollup
+    first_day = datetime.combine(today - timedelta(days=days - 1), time.min)
+    day = func.date(rollup.hour_bucket)
+
+    counts = dict(
+        db.session.query(day, func.sum(rollup.reservation_count))
+        .filter(rollup.hour_bucket >= first_day)
+        .group_by(day)
+        .all()
+    )
+
+    trend = []
+    for i in range(days):
+        date = (today - timedelta(days=i)).isoformat()
+        trend.append({"date": date, "reservations": counts.get(date) or 0})
+    return trend
+
+
+def hourly_reservation_distribution(today):
+    """Reservations created per hour of the given day, all 24 buckets"""
+    rollup = ReservationHourlyRollup
+    day_start = datetime.combine(today, time.min)
+    hour = func.extract("hour", rollup.hour_bucket)
+
+    counts = dict(
+        db.session.query(hour, func.sum(rollup.reservation_count))
+        .filter(
+            rollup.hour_bucket >= day_start,
+            rollup.hour_bucket < day_start + timedelta(days=1),
+        )
+        .group_by(hour)
+        .all()
+    )
+
+    return [{"hour": h, "reservations": counts.get(h) or 0} for h in range(24)]
+
+
+def monthly_spending_trend(user_id, months=6):
+    """Completed spend per calendar month for a user, current month first"""
+    month_starts = [
+        datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    ]
+    for _ in range(months - 1):
+        month_starts.append((month_starts[-1] - timedelta(days=1)).replace(day=1))
+
+    month = func.strftime("%Y-%m", Reservation.leaving_timestamp)
+    spent = dict(
+        db.session.query(month, func.sum(Reservation.parking_cost))
+        .filter(
+            Reservation.user_id == user_id,
+            Reservation.status == "completed",
+            Reservation.leaving_timestamp >= month_starts[-1],
+        )
+        .group_by(month)
+        .all()
+    )
+
+    return [
+        {
+            "month": start.strftime("%Y-%m"),
+            "amount": round(spent.get(start.strftime("%Y-%m")) or 0, 2),
+        }
+        for start in month_starts
+    ]
+
+
+def lot_peak_hours(lot_id):
+    """Reservations per hour of day in which parking started, all 24 buckets"""
+    hour = func.extract("hour", Reservation.parking_timestamp)
+
+    counts = dict(
+        db.session.query(hour, func.count(Reservation.id))
+        .join(ParkingSpot)
+        .filter(ParkingSpot.lot_id == lot_id, Reservation.parking_timestamp.isnot(None))
+        .group_by(hour)
+        .all()
+    )
+
+    return [{"hour": h, "reservations": counts.get(h, 0)} for h in range(24)]
+
+
 @analytics_bp.route("/export/user-data", methods=["GET"])
 @jwt_required()
 def export_user_data():
-    """Export user's parking data for CSV download"""
+    """Export user's parking data for CSV download.
+
+    ?format=csv or ?format=ndjson streams the rows as they are read, with
+    memory use independent of the history size; add ?gzip=1 to compress
+    the stream. Without a format the rows come back as one JSON document.
+    """
     try:
         current_user = get_jwt_identity()
         if current_user.get("type") != "user":
             return jsonify({"error": "User access required"}), 403
 
         user_id = current_user["id"]
+        export_format = request.args.get("format", "json")
+
+        if export_format == "json":
+            return jsonify({"export_data": list(export_rows(user_id))}), 200
+
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "format must be json, csv or ndjson"}), 400
+
+        chunks = EXPORT_FORMATS[export_format](export_rows(user_id))
+        headers = {
+            "Content-Disposition": "attachment; filename=my-parking-history."
+            + export_format,
+            "X-Accel-Buffering": "no",
+        }
+        if request.args.get("gzip") in ("1", "true"):
+            chunks = gzip_stream(chunks)
+            headers["Content-Encoding"] = "gzip"
+
+        return Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_MIMETYPES[export_format],
+            headers=headers,
+        )
 
-        # Get all user reservations
-        reservations = (
-            Reservation.query.filter_by(user_id=user_id)
-            .order_by(Reservation.created_at.desc())
-            .all()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@analytics_bp.route("/export/user-data/jobs", methods=["POST"])
+@jwt_required()
+def enqueue_user_data_export():
+    """Queue an emailed CSV export on the interactive queue.
+
+    Returns 202 with the task id and a status URL to poll.
+    """
+    try:
+        current_user = get_jwt_identity()
+        if current_user.get("type") != "user":
+            return jsonify({"error": "User access required"}), 403
+
+        user = db.session.get(User, current_user["id"])
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        import tasks  # registers the shared tasks
+
+        export = get_celery().tasks["tasks.export_user_data_csv"]
+        result = export.delay(user.id, user.email)
+        cache.set(
+            f"export-job:{result.id}",
+            user.id,
+            timeout=current_app.config.get("EXPORT_JOB_TIMEOUT", 86400),
         )
 
-        # Prepare data for CSV export
-        export_data = []
-        for reservation in reservations:
-            export_data.append(
+        return (
+            jsonify(
                 {
-                    "reservation_id": reservation.id,
-                    "parking_lot": reservation.parking_spot.parking_lot.prime_location_name,
-                    "spot_number": reservation.parking_spot.spot_number,
-                    "vehicle_number": reservation.vehicle_number,
-                    "reservation_date": reservation.created_at.strftime(
-                        "%Y-%m-%d %H:%M:%S"
-                    ),
-                    "parking_start": (
-                        reservation.parking_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                        if reservation.parking_timestamp
-                        else ""
+                    "task_id": result.id,
+                    "status_url": url_for(
+                        "analytics.get_user_data_export_job", task_id=result.id
                     ),
-                    "parking_end": (
-                        reservation.leaving_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                        if reservation.leaving_timestamp
-                        else ""
-                    ),
-                    "duration_hours": reservation.get_duration_hours(),
-                    "cost": reservation.parking_cost,
-                    "status": reservation.status,
-                    "remarks": reservation.remarks or "",
                 }
-            )
+            ),
+            202,
+        )
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@analytics_bp.route("/export/user-data/jobs/<task_id>", methods=["GET"])
+@jwt_required()
+def get_user_data_export_job(task_id):
+    """State of an export job queued by the current user"""
+    try:
+        current_user = get_jwt_identity()
+        if cache.get(f"export-job:{task_id}") != current_user.get("id") or (
+            current_user.get("type") != "user"
+        ):
+            return jsonify({"error": "Export job not found"}), 404
+
+        result = get_celery().AsyncResult(task_id)
+        job = {"task_id": task_id, "state": result.state}
+        if result.ready():
+            job["result"] = str(result.result)
+
+        return jsonify(job), 200
 
-        return jsonify({"export_data": export_data}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@analytics_bp.route("/export/download/<token>", methods=["GET"])
+def download_user_data_export(token):
+    """Serve an emailed export file; the signed token is the credential"""
+    try:
+        from tasks import export_folder, export_serializer
+
+        try:
+            data = export_serializer().loads(
+                token, max_age=current_app.config.get("EXPORT_LINK_TTL", 7200)
+            )
+        except SignatureExpired:
+            return jsonify({"error": "Download link has expired"}), 410
+        except BadSignature:
+            return jsonify({"error": "Invalid download link"}), 404
+
+        path = os.path.join(export_folder(), os.path.basename(data["file"]))
+        if not os.path.exists(path):
+            return jsonify({"error": "Export is no longer available"}), 404
+
+        return send_file(
+            path,
+            mimetype="application/gzip",
+            as_attachment=True,
+            download_name="my-parking-history.csv.gz",
+        )
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+EXPORT_FIELDS = [
+    "reservation_id",
+    "parking_lot",
+    "spot_number",
+    "vehicle_number",
+    "reservation_date",
+    "parking_start",
+    "parking_end",
+    "duration_hours",
+    "cost",
+    "status",
+    "remarks",
+]
+
+
+def export_rows(user_id, batch_size=1000):
+    """Yield a user's reservations as export dicts, newest first.
+
+    Reads plain columns from one joined query in batches of batch_size,
+    so no ORM objects are kept and no relationship is loaded per row.
+    """
+    statement = (
+        db.select(
+            Reservation.id,
+            ParkingLot.prime_location_name,
+            ParkingSpot.spot_number,
+            Reservation.vehicle_number,
+            Reservation.created_at,
+            Reservation.parking_timestamp,
+            Reservation.leaving_timestamp,
+            Reservation.parking_cost,
+            Reservation.status,
+            Reservation.remarks,
+        )
+        .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+        .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
+        .where(Reservation.user_id == user_id)
+        .order_by(Reservation.created_at.desc())
+        .execution_options(yield_per=batch_size)
+    )
+
+    now = datetime.utcnow()
+    for row in db.session.execute(statement):
+        end = row.leaving_timestamp or now
+        yield {
+            "reservation_id": row.id,
+            "parking_lot": row.prime_location_name,
+            "spot_number": row.spot_number,
+            "vehicle_number": row.vehicle_number,
+            "reservation_date": row.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "parking_start": (
+                row.parking_timestamp.strftime("%Y-%m-%d %H:%M:%S")
+                if row.parking_timestamp
+                else ""
+            ),
+            "parking_end": (
+                row.leaving_timestamp.strftime("%Y-%m-%d %H:%M:%S")
+                if row.leaving_timestamp
+                else ""
+            ),
+            "duration_hours": (
+                round((end - row.parking_timestamp).total_seconds() / 3600, 2)
+                if row.parking_timestamp
+                else 0
+            ),
+            "cost": row.parking_cost,
+            "status": row.status,
+            "remarks": row.remarks or "",
+        }
+
+
+def csv_stream(rows, rows_per_chunk=500):
+    """Encode export rows as CSV text chunks, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_stream(rows, rows_per_chunk=500):
+    """Encode export rows as newline-delimited JSON chunks"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row) + "\n")
+        if len(lines) == rows_per_chunk:
+            yield "".join(lines)
+            lines = []
+    yield "".join(lines)
+
+
+def gzip_stream(chunks):
+    """Compress a stream of text chunks into one gzip member"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {"csv": csv_stream, "ndjson": ndjson_stream}
+EXPORT_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination for the listing endpoints
+
+Listings ordered newest first on (created_at, id) can be paged with
+`?after=<cursor>` instead of `?page=`. Each page is a range read on a
+(created_at, id) index seek, so deep pages cost the same as the first one
+and no COUNT(*) is issued. The cursor is an opaque token for the last row
+of the previous page; pass `after=` empty to start from the newest row.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import tuple_
+
+MAX_PER_PAGE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when an `after` token cannot be decoded"""
+
+
+def cursor_requested():
+    return "after" in request.args
+
+
+def encode_cursor(row):
+    payload = json.dumps([row.created_at.isoformat(), row.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+
+
+def clamp_per_page(per_page):
+    """The page size cursor_page actually uses for a requested per_page"""
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def cursor_page(query, model, per_page):
+    """Return (items, next_cursor) for the page after request.args["after"].
+
+    next_cursor is None on the last page.
+    """
+    per_page = clamp_per_page(per_page)
+    after = request.args.get("after")
+
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if after:
+        query = query.filter(
+            tuple_(model.created_at, model.id) < tuple_(*decode_cursor(after))
+        )
+
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > per_page else None
+    return items, next_cursor
@@ -1,10 +1,18 @@
-from flask import Blueprint, request, jsonify
+import json
+import queue
+import time
+
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, ParkingLot, ParkingSpot, Reservation
-from flask_caching import Cache
+from app.availability import broker
+from app.caching import cached_response
 
 parking_bp = Blueprint("parking", __name__)
 
+SEARCH_SORTS = ("relevance", "price", "availability")
+MAX_SEARCH_RESULTS = 100
+
 
 @parking_bp.route("/lots", methods=["GET"])
 def get_parking_lots():
@@ -29,25 +37,14 @@ def get_parking_lot_details(lot_id):
     try:
         lot = ParkingLot.query.get_or_404(lot_id)
 
-        # Get spot statistics
-        total_spots = ParkingSpot.query.filter_by(lot_id=lot_id, is_active=True).count()
-        available_spots = ParkingSpot.query.filter_by(
-            lot_id=lot_id, status="A", is_active=True
-        ).count()
-        occupied_spots = ParkingSpot.query.filter_by(
-            lot_id=lot_id, status="O", is_active=True
-        ).count()
-
         lot_dict = lot.to_dict()
-        lot_dict.update(
-            {
-                "total_spots": total_spots,
-                "available_spots": available_spots,
-                "occupied_spots": occupied_spots,
-                "occupancy_rate": round(
-                    (occupied_spots / total_spots * 100) if total_spots > 0 else 0, 2
-                ),
-            }
+        lot_dict["occupancy_rate"] = round(
+            (
+                (lot.occupied_spots / lot.total_spots * 100)
+                if lot.total_spots > 0
+                else 0
+            ),
+            2,
         )
 
         return jsonify({"parking_lot": lot_dict}), 200
@@ -78,90 +75,178 @@ def get_parking_spots(lot_id):
 
 
 @parking_bp.route("/availability", methods=["GET"])
+@cached_response("availability")
 def get_availability():
     """Get real-time parking availability across all lots"""
     try:
-        # Get availability summary for all lots
-        lots = ParkingLot.query.filter_by(is_active=True).all()
+        return jsonify({"availability": availability_snapshot()}), 200
 
-        availability_data = []
-        for lot in lots:
-            available_count = ParkingSpot.query.filter_by(
-                lot_id=lot.id, status="A", is_active=True
-            ).count()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            total_count = ParkingSpot.query.filter_by(
-                lot_id=lot.id, is_active=True
-            ).count()
 
-            availability_data.append(
-                {
-                    "lot_id": lot.id,
-                    "lot_name": lot.prime_location_name,
-                    "address": lot.address,
-                    "total_spots": total_count,
-                    "available_spots": available_count,
-                    "occupied_spots": total_count - available_count,
-                    "availability_percentage": round(
-                        (available_count / total_count * 100) if total_count > 0 else 0,
-                        2,
-                    ),
-                    "price_per_hour": lot.price_per_hour,
-                }
-            )
-
-        return jsonify({"availability": availability_data}), 200
+@parking_bp.route("/availability/stream", methods=["GET"])
+def stream_availability():
+    """Stream availability as Server-Sent Events.
 
+    Sends a snapshot of every active lot first, then one `availability`
+    event per lot whose counters change. No database work is done while
+    the stream is open. Each stream ends after AVAILABILITY_STREAM_TTL
+    seconds so it does not hold a worker thread indefinitely; the `retry`
+    field tells EventSource when to reconnect for a fresh snapshot.
+    """
+    # Subscribe before reading the snapshot so no change falls in between
+    subscriber = broker.subscribe()
+    try:
+        snapshot = availability_snapshot()
     except Exception as e:
+        broker.unsubscribe(subscriber)
         return jsonify({"error": str(e)}), 500
 
+    keepalive = current_app.config.get("AVAILABILITY_KEEPALIVE", 15)
+    ttl = current_app.config.get("AVAILABILITY_STREAM_TTL", 300)
+    retry_ms = current_app.config.get("AVAILABILITY_RETRY_MS", 3000)
+
+    def events():
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            yield sse("snapshot", snapshot)
+            deadline = time.monotonic() + ttl
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    message = subscriber.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse("availability", availability_entry(**message))
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def availability_snapshot():
+    """Availability of every active lot, read from the lot counters"""
+    lots = ParkingLot.query.filter_by(is_active=True).all()
+    return [
+        availability_entry(
+            lot.id,
+            lot.total_spots,
+            lot.available_spots,
+            lot.occupied_spots,
+            lot_name=lot.prime_location_name,
+            address=lot.address,
+            price_per_hour=lot.price_per_hour,
+        )
+        for lot in lots
+    ]
+
+
+def availability_entry(lot_id, total_spots, available_spots, occupied_spots, **details):
+    return {
+        "lot_id": lot_id,
+        **details,
+        "total_spots": total_spots,
+        "available_spots": available_spots,
+        "occupied_spots": occupied_spots,
+        "availability_percentage": round(
+            (available_spots / total_spots * 100) if total_spots > 0 else 0, 2
+        ),
+    }
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
 @parking_bp.route("/search", methods=["GET"])
 def search_parking():
-    """Search parking lots by location or name"""
+    """Search parking lots by location or name.
+
+    Text, min_spots and max_price filters, sorting and limit/offset all run
+    in a single query; total_found comes from a window count over the same
+    result set, or from a separate count when offset is past the last match.
+    sort is relevance (default), price or availability. Without limit every
+    match is returned; limit is capped at MAX_SEARCH_RESULTS.
+    """
     try:
         query = request.args.get("q", "").strip()
         min_spots = request.args.get("min_spots", type=int)
         max_price = request.args.get("max_price", type=float)
+        sort = request.args.get("sort", "relevance")
+        limit = request.args.get("limit", type=int)
+        if limit is not None:
+            limit = min(max(limit, 1), MAX_SEARCH_RESULTS)
+        offset = max(request.args.get("offset", 0, type=int), 0)
+
+        if sort not in SEARCH_SORTS:
+            return (
+                jsonify({"error": f"sort must be one of {', '.join(SEARCH_SORTS)}"}),
+                400,
+            )
 
         # Build query
-        lots_query = ParkingLot.query.filter_by(is_active=True)
+        lots_query = db.session.query(ParkingLot).filter(ParkingLot.is_active == True)
+        order_by = []
 
         if query:
-            search_filter = db.or_(
-                ParkingLot.prime_location_name.ilike(f"%{query}%"),
-                ParkingLot.address.ilike(f"%{query}%"),
-                ParkingLot.pin_code.ilike(f"%{query}%"),
-            )
-            lots_query = lots_query.filter(search_filter)
+            matches = ParkingLot.text_matches(query)
+            if matches is not None:
+                # Indexed full-text search, best matches first
+                lots_query = lots_query.join(matches, matches.c.lot_id == ParkingLot.id)
+                order_by.append(matches.c.rank)
+            else:
+                search_filter = db.or_(
+                    ParkingLot.prime_location_name.ilike(f"%{query}%"),
+                    ParkingLot.address.ilike(f"%{query}%"),
+                    ParkingLot.pin_code.ilike(f"%{query}%"),
+                )
+                lots_query = lots_query.filter(search_filter)
 
         if max_price:
             lots_query = lots_query.filter(ParkingLot.price_per_hour <= max_price)
 
-        lots = lots_query.all()
-
-        # Filter by available spots if specified
         if min_spots:
-            filtered_lots = []
-            for lot in lots:
-                available_count = ParkingSpot.query.filter_by(
-                    lot_id=lot.id, status="A", is_active=True
-                ).count()
-                if available_count >= min_spots:
-                    filtered_lots.append(lot)
-            lots = filtered_lots
-
-        # Prepare response data
-        results = []
-        for lot in lots:
-            lot_dict = lot.to_dict()
-            available_count = ParkingSpot.query.filter_by(
-                lot_id=lot.id, status="A", is_active=True
-            ).count()
-            lot_dict["available_spots"] = available_count
-            results.append(lot_dict)
+            lots_query = lots_query.filter(ParkingLot.available_spots >= min_spots)
+
+        if sort == "price":
+            order_by.insert(0, ParkingLot.price_per_hour)
+        elif sort == "availability":
+            order_by.insert(0, ParkingLot.available_spots.desc())
+
+        rows = (
+            lots_query.add_columns(db.func.count().over().label("total_found"))
+            .order_by(*order_by, ParkingLot.id)
+            .limit(limit)
+            .offset(offset)
+            .all()
+        )
+        if rows:
+            total_found = rows[0].total_found
+        elif offset:
+            # The window count has no row to ride on past the last match
+            total_found = lots_query.count()
+        else:
+            total_found = 0
 
-        return jsonify({"results": results, "total_found": len(results)}), 200
+        return (
+            jsonify(
+                {
+                    "results": [lot.to_dict() for lot, _ in rows],
+                    "total_found": total_found,
+                    "limit": limit,
+                    "offset": offset,
+                }
+            ),
+            200,
+        )
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -176,12 +261,16 @@ def get_reservation_status(reservation_id):
 
         # Check if user has access to this reservation
         if current_user.get("type") == "user":
-            reservation = Reservation.query.filter_by(
-                id=reservation_id, user_id=current_user["id"]
-            ).first()
+            reservation = (
+                Reservation.with_details()
+                .filter_by(id=reservation_id, user_id=current_user["id"])
+                .first()
+            )
         else:
             # Admin can view any reservation
-            reservation = Reservation.query.get(reservation_id)
+            reservation = (
+                Reservation.with_details().filter_by(id=reservation_id).first()
+            )
 
         if not reservation:
             return jsonify({"error": "Reservation not found"}), 404
@@ -210,33 +299,21 @@ def quick_reserve(lot_id):
             return jsonify({"error": "Vehicle number is required"}), 400
 
         # Check if user already has an active reservation
-        existing_reservation = Reservation.query.filter_by(
-            user_id=user_id, status__in=["reserved", "active"]
+        existing_reservation = Reservation.query.filter(
+            Reservation.user_id == user_id,
+            Reservation.status.in_(["reserved", "active"]),
         ).first()
         if existing_reservation:
             return jsonify({"error": "You already have an active reservation"}), 400
 
-        # Find first available spot
-        available_spot = ParkingSpot.query.filter_by(
-            lot_id=lot_id, status="A", is_active=True
-        ).first()
-
-        if not available_spot:
-            return jsonify({"error": "No available spots in this parking lot"}), 400
-
-        # Create reservation
-        reservation = Reservation(
-            user_id=user_id,
-            spot_id=available_spot.id,
-            vehicle_number=vehicle_number,
-            status="reserved",
-            remarks=data.get("remarks", ""),
+        # Claim the first available spot
+        reservation = Reservation.reserve_first_available(
+            user_id, lot_id, vehicle_number, remarks=data.get("remarks", "")
         )
 
-        # Update spot status
-        available_spot.status = "O"
+        if not reservation:
+            return jsonify({"error": "No available spots in this parking lot"}), 400
 
-        db.session.add(reservation)
         db.session.commit()
 
         return (
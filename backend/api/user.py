@@ -1,7 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, ParkingLot, ParkingSpot, Reservation
+from models import (
+    db,
+    User,
+    ParkingLot,
+    ParkingSpot,
+    Reservation,
+    ReservationHourlyRollup,
+)
 from datetime import datetime
+from api.pagination import (
+    clamp_per_page,
+    cursor_page,
+    cursor_requested,
+    InvalidCursor,
+)
 
 user_bp = Blueprint("user", __name__)
 
@@ -29,13 +42,16 @@ def get_dashboard():
         user_id = current_user["id"]
 
         # Get user's current active reservation
-        active_reservation = Reservation.query.filter_by(
-            user_id=user_id, status="active"
-        ).first()
+        active_reservation = (
+            Reservation.with_details()
+            .filter_by(user_id=user_id, status="active")
+            .first()
+        )
 
         # Get user's reservation history
         reservations = (
-            Reservation.query.filter_by(user_id=user_id)
+            Reservation.with_details()
+            .filter_by(user_id=user_id)
             .order_by(Reservation.created_at.desc())
             .limit(10)
             .all()
@@ -131,17 +147,7 @@ def get_available_parking_lots():
     try:
         lots = ParkingLot.query.filter_by(is_active=True).all()
 
-        lots_data = []
-        for lot in lots:
-            lot_dict = lot.to_dict()
-            # Add available spots count
-            available_spots = ParkingSpot.query.filter_by(
-                lot_id=lot.id, status="A", is_active=True
-            ).count()
-            lot_dict["available_spots"] = available_spots
-            lots_data.append(lot_dict)
-
-        return jsonify({"parking_lots": lots_data}), 200
+        return jsonify({"parking_lots": [lot.to_dict() for lot in lots]}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -170,28 +176,14 @@ def create_reservation():
         if existing_reservation:
             return jsonify({"error": "You already have an active reservation"}), 400
 
-        # Find first available spot in the lot
-        available_spot = ParkingSpot.query.filter_by(
-            lot_id=lot_id, status="A", is_active=True
-        ).first()
-
-        if not available_spot:
-            return jsonify({"error": "No available spots in this parking lot"}), 400
-
-        # Create reservation
-        reservation = Reservation(
-            user_id=user_id,
-            spot_id=available_spot.id,
-            vehicle_number=vehicle_number,
-            status="reserved",
-            remarks=data.get("remarks", ""),
+        # Claim the first available spot in the lot
+        reservation = Reservation.reserve_first_available(
+            user_id, lot_id, vehicle_number, remarks=data.get("remarks", "")
         )
 
-        # Update spot status
-        available_spot.status = "O"  # Occupied
-        available_spot.updated_at = datetime.utcnow()
+        if not reservation:
+            return jsonify({"error": "No available spots in this parking lot"}), 400
 
-        db.session.add(reservation)
         db.session.commit()
 
         return (
@@ -218,9 +210,11 @@ def park_vehicle(reservation_id):
         current_user = get_jwt_identity()
         user_id = current_user["id"]
 
-        reservation = Reservation.query.filter_by(
-            id=reservation_id, user_id=user_id
-        ).first()
+        reservation = (
+            Reservation.with_details()
+            .filter_by(id=reservation_id, user_id=user_id)
+            .first()
+        )
 
         if not reservation:
             return jsonify({"error": "Reservation not found"}), 404
@@ -259,9 +253,11 @@ def release_parking_spot(reservation_id):
         current_user = get_jwt_identity()
         user_id = current_user["id"]
 
-        reservation = Reservation.query.filter_by(
-            id=reservation_id, user_id=user_id
-        ).first()
+        reservation = (
+            Reservation.with_details()
+            .filter_by(id=reservation_id, user_id=user_id)
+            .first()
+        )
 
         if not reservation:
             return jsonify({"error": "Reservation not found"}), 404
@@ -275,10 +271,17 @@ def release_parking_spot(reservation_id):
         reservation.parking_cost = reservation.calculate_cost()
         reservation.updated_at = datetime.utcnow()
 
-        # Update spot status
-        spot = ParkingSpot.query.get(reservation.spot_id)
-        spot.status = "A"  # Available
-        spot.updated_at = datetime.utcnow()
+        # Update spot status and the lot's hourly rollup
+        ParkingSpot.release(reservation.spot_id)
+        ReservationHourlyRollup.record(
+            reservation.parking_spot.lot_id,
+            reservation.leaving_timestamp,
+            completed=1,
+            revenue=reservation.parking_cost,
+            parked_seconds=(
+                reservation.leaving_timestamp - reservation.parking_timestamp
+            ).total_seconds(),
+        )
 
         db.session.commit()
 
@@ -310,10 +313,24 @@ def get_user_reservations():
         per_page = request.args.get("per_page", 10, type=int)
         status = request.args.get("status")
 
-        query = Reservation.query.filter_by(user_id=user_id)
+        query = Reservation.with_details().filter_by(user_id=user_id)
         if status:
             query = query.filter_by(status=status)
 
+        if cursor_requested():
+            per_page = clamp_per_page(per_page)
+            reservations, next_cursor = cursor_page(query, Reservation, per_page)
+            return (
+                jsonify(
+                    {
+                        "reservations": [r.to_dict() for r in reservations],
+                        "next_cursor": next_cursor,
+                        "per_page": per_page,
+                    }
+                ),
+                200,
+            )
+
         reservations = query.order_by(Reservation.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -331,6 +348,9 @@ def get_user_reservations():
             200,
         )
 
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -344,9 +364,11 @@ def get_reservation_details(reservation_id):
         current_user = get_jwt_identity()
         user_id = current_user["id"]
 
-        reservation = Reservation.query.filter_by(
-            id=reservation_id, user_id=user_id
-        ).first()
+        reservation = (
+            Reservation.with_details()
+            .filter_by(id=reservation_id, user_id=user_id)
+            .first()
+        )
 
         if not reservation:
             return jsonify({"error": "Reservation not found"}), 404
@@ -1,15 +1,15 @@
 import os
-from flask import Flask, jsonify
+
+import click
+from flask import Flask, current_app, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_caching import Cache
 from flask_mail import Mail
 
-from models import db, Admin
+from models import db, Admin, Reservation, ReservationHourlyRollup
 from config import config
 
-# from config.celery_config import make_celery
-
 # Initialize extensions
 jwt = JWTManager()
 cache = Cache()
@@ -17,33 +17,64 @@ mail = Mail()
 
 
 def create_app(config_name=None):
-    """Application factory pattern"""
+    """Application factory pattern
+
+    Building an app has no side effects on the database: tables and the
+    default admin are created by `flask --app app init-db`.
+    """
     if config_name is None:
         config_name = os.environ.get("FLASK_ENV", "development")
 
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    # Read replicas become extra binds, which must exist before db.init_app
+    from app.replicas import configure_replica_binds, register_read_routing
+
+    configure_replica_binds(app)
+
     # Initialize extensions with app
     db.init_app(app)
     jwt.init_app(app)
     cache.init_app(app)
     mail.init_app(app)
 
+    # WAL and tuned pragmas on SQLite connections (production profile)
+    from app.sqlite import register_sqlite_pragmas
+
+    register_sqlite_pragmas(app)
+
+    # Query counts and DB time per request, when switched on
+    from app.instrumentation import register_sql_instrumentation
+
+    register_sql_instrumentation(app)
+
+    # Bump the cached response version whenever parking data changes
+    from app.caching import register_cache_invalidation
+
+    register_cache_invalidation(db.session)
+
+    # Push committed spot counter changes to availability streams
+    from app.availability import broker, register_availability_publishing
+
+    broker.init_app(app)
+    register_availability_publishing(db.session)
+
+    # Serve reads of the read-only blueprints from replicas when configured
+    register_read_routing(app)
+
     # Enable CORS
     CORS(app, origins=app.config["CORS_ORIGINS"])
 
     # Register blueprints
     register_blueprints(app)
 
-    # Create tables and default admin
-    with app.app_context():
-        db.create_all()
-        create_default_admin(app)
-
     # Error handlers
     register_error_handlers(app)
 
+    # Management commands
+    register_commands(app)
+
     return app
 
 
@@ -62,6 +93,20 @@ def register_blueprints(app):
     app.register_blueprint(analytics_bp, url_prefix="/api/analytics")
 
 
+def get_celery(app=None):
+    """Celery app of a Flask app, created on first use.
+
+    Tasks enqueued through it go to that app's broker, routed by queue.
+    Celery is only imported when something is enqueued or run.
+    """
+    app = app or current_app._get_current_object()
+    if "celery" not in app.extensions:
+        from config.celery_config import make_celery
+
+        app.extensions["celery"] = make_celery(app)
+    return app.extensions["celery"]
+
+
 def register_error_handlers(app):
     """Register error handlers"""
 
@@ -107,11 +152,40 @@ def create_default_admin(app):
         db.session.rollback()
 
 
-# Create app instance
-app = create_app()
+def register_commands(app):
+    """Register management commands"""
 
-# Create Celery instance
-# celery = make_celery(app)
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create missing tables and the default admin.
 
-if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+        On a database whose reservations predate the hourly rollup, the
+        rollup is built from their history so admin analytics start right.
+        """
+        db.create_all()
+        create_default_admin(app)
+        if (
+            db.session.query(ReservationHourlyRollup).first() is None
+            and db.session.query(Reservation.id).first() is not None
+        ):
+            from tasks import backfill_reservation_rollup
+
+            click.echo(backfill_reservation_rollup())
+        click.echo("Database initialized")
+
+    @app.cli.command("sync-replicas")
+    @click.option(
+        "--interval", type=float, default=0, help="Repeat every N seconds (0: once)"
+    )
+    def sync_replicas_command(interval):
+        """Copy the primary SQLite file over the replica files"""
+        import time
+
+        from app.replicas import sync_sqlite_replicas
+
+        while True:
+            for path in sync_sqlite_replicas(app):
+                click.echo(f"Replica refreshed: {path}")
+            if not interval:
+                break
+            time.sleep(interval)
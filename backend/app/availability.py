@@ -0,0 +1,106 @@
+"""
+Live parking availability fan-out
+
+Spot counter changes committed by the reservation and release paths are
+published as per-lot events. Subscribers (one per open SSE connection)
+each get a bounded queue in this process. When AVAILABILITY_REDIS_URL is
+set, events go through a Redis channel instead so that every worker
+process sees changes committed by any other.
+"""
+
+import json
+import queue
+import threading
+
+from sqlalchemy import event
+
+CHANNEL = "parking:availability"
+
+
+class AvailabilityBroker:
+    """In-process pub/sub for lot availability, optionally bridged by Redis"""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.redis = None
+        self.listener = None
+
+    def init_app(self, app):
+        url = app.config.get("AVAILABILITY_REDIS_URL")
+        if url and self.redis is None:
+            import redis
+
+            self.redis = redis.Redis.from_url(url)
+            self.listener = threading.Thread(
+                target=self.listen, name="availability-listener", daemon=True
+            )
+            self.listener.start()
+        app.extensions["availability"] = self
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.max_pending)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, message):
+        if self.redis is not None:
+            try:
+                self.redis.publish(CHANNEL, json.dumps(message))
+                return
+            except Exception as e:
+                print(f"Redis publish failed, delivering locally: {e}")
+        self.deliver(message)
+
+    def deliver(self, message):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A slow client only needs the latest state of each lot
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def listen(self):
+        """Relay Redis channel messages to local subscribers"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for item in pubsub.listen():
+                    self.deliver(json.loads(item["data"]))
+            except Exception as e:
+                print(f"Availability listener error: {e}")
+                threading.Event().wait(1)
+
+
+broker = AvailabilityBroker()
+
+
+def register_availability_publishing(session):
+    """Publish lot counters changed by a transaction once it commits"""
+    if event.contains(session, "after_commit", _after_commit):
+        return
+
+    event.listen(session, "after_commit", _after_commit)
+    event.listen(session, "after_rollback", _after_rollback)
+
+
+def _after_commit(session):
+    for lot_id, counters in session.info.pop("lot_counters", {}).items():
+        broker.publish({"lot_id": lot_id, **counters})
+
+
+def _after_rollback(session):
+    session.info.pop("lot_counters", None)
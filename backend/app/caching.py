@@ -0,0 +1,261 @@
+"""
+Versioned response caching for the aggregate endpoints
+
+Cached responses are stored under keys that embed a global data version.
+Committing a change to reservations, spots, lots or users bumps the
+version, so every cached dashboard is superseded at once without having
+to track which keys it affects; stale entries simply expire.
+
+Misses are single-flight: one request recomputes a response under a lock
+(a Redis lock when the cache is Redis, a process-local lock otherwise)
+while concurrent requests are served the last computed copy, or wait for
+the new one when there is none yet.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, make_response, request
+from flask_caching.backends.rediscache import RedisCache
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+
+from app import cache
+from app.replicas import read_replica
+
+DATA_VERSION_KEY = "data-version"
+
+# Tables whose changes can alter a cached response
+WATCHED_TABLES = {"parking_lots", "parking_spots", "reservations", "users"}
+
+# Endpoint names registered through cached_response, for the stats report
+CACHED_ENDPOINTS = []
+
+# Per-key locks used when the cache backend is not shared between processes;
+# an entry only lives while its recompute runs
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def data_version():
+    """Current data version, 0 until the first change is committed"""
+    try:
+        return cache.get(DATA_VERSION_KEY) or 0
+    except Exception as e:
+        print(f"Cache unavailable: {e}")
+        return None
+
+
+def bump_data_version():
+    """Invalidate every versioned response by moving to a new version"""
+    try:
+        # Create the key without an expiry so the version never restarts
+        cache.add(DATA_VERSION_KEY, 0, timeout=0)
+        cache.cache.inc(DATA_VERSION_KEY)
+    except Exception as e:
+        print(f"Could not bump cache version: {e}")
+
+
+def record(name, outcome):
+    try:
+        cache.cache.inc(f"cache-stats:{name}:{outcome}")
+    except Exception:
+        pass
+
+
+def cache_stats():
+    """Hit, stale and miss counters for every cached endpoint"""
+    stats = {}
+    for name in CACHED_ENDPOINTS:
+        counts = {
+            outcome: cache.get(f"cache-stats:{name}:{outcome}") or 0
+            for outcome in ("hits", "stale", "misses")
+        }
+        served = sum(counts.values())
+        cached = counts["hits"] + counts["stale"]
+        counts["hit_rate"] = round(cached / served * 100, 2) if served else 0
+        stats[name] = counts
+    return {"version": data_version(), "endpoints": stats}
+
+
+@contextmanager
+def single_flight(key):
+    """Try to become the one request recomputing `key`.
+
+    Yields (leader, lock); followers can watch the lock to learn when the
+    leader has finished.
+    """
+    timeout = current_app.config.get("CACHE_LOCK_TIMEOUT", 30)
+    backend = cache.cache
+
+    if isinstance(backend, RedisCache):
+        lock = backend._write_client.lock(
+            f"{backend.key_prefix}lock:{key}", timeout=timeout
+        )
+        try:
+            acquired = lock.acquire(blocking=False)
+        except Exception as e:
+            print(f"Cache lock unavailable: {e}")
+            lock, acquired = None, None
+    else:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(key, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+
+    try:
+        # Without a working lock every request computes for itself
+        yield acquired is not False, lock
+    finally:
+        if acquired:
+            if not isinstance(backend, RedisCache):
+                # Drop the entry so keys seen once do not keep a lock forever;
+                # waiting followers still hold it and see it released
+                with _local_locks_guard:
+                    if _local_locks.get(key) is lock:
+                        del _local_locks[key]
+            try:
+                lock.release()
+            except Exception:
+                pass
+
+
+def wait_for(key, lock):
+    """Poll for a value another request is computing until its lock is freed"""
+    deadline = time.monotonic() + current_app.config.get("CACHE_LOCK_TIMEOUT", 30)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        body = cached(key)
+        if body is not None or not lock.locked():
+            return body
+    return None
+
+
+def cached_response(name, per_user=False, timeout=None):
+    """Cache successful JSON responses of a view under the data version.
+
+    The key covers the path and query string, plus the JWT identity when
+    per_user is set; place the decorator below jwt_required so access
+    checks still run on every request. Only 200 responses are cached and
+    the view is called directly whenever the cache is unreachable.
+
+    The last computed response is also kept under an unversioned key for
+    CACHE_STALE_TIMEOUT seconds and served while a recompute is running.
+    """
+    CACHED_ENDPOINTS.append(name)
+
+    def decorator(f):
+        def wrapper(*args, **kwargs):
+            version = data_version()
+            if version is None:
+                return f(*args, **kwargs)
+
+            scope = request.full_path
+            if per_user:
+                identity = get_jwt_identity() or {}
+                scope += f":{identity.get('type')}:{identity.get('id')}"
+            key = f"response:{name}:v{version}:{scope}"
+            stale_key = f"response:{name}:stale:{scope}"
+
+            body = cached(key)
+            if body is None:
+                with single_flight(stale_key) as (leader, lock):
+                    if leader:
+                        # The previous leader may have finished meanwhile
+                        body = cached(key)
+                        if body is None:
+                            return compute(
+                                name, key, stale_key, timeout, f, args, kwargs
+                            )
+                    else:
+                        body = cached(stale_key)
+                        if body is not None:
+                            record(name, "stale")
+                            return json_response(body)
+                        body = wait_for(key, lock)
+                        if body is None:
+                            return compute(
+                                name, key, stale_key, timeout, f, args, kwargs
+                            )
+
+            record(name, "hits")
+            return json_response(body)
+
+        wrapper.__name__ = f.__name__
+        return wrapper
+
+    return decorator
+
+
+def cached(key):
+    try:
+        return cache.get(key)
+    except Exception:
+        return None
+
+
+def compute(name, key, stale_key, timeout, f, args, kwargs):
+    """Run the view and store a successful response under both keys"""
+    record(name, "misses")
+    response = make_response(f(*args, **kwargs))
+    if read_replica():
+        # Replica data may predate the version it would be cached under
+        lag = current_app.config["READ_REPLICA_LAG"]
+        timeout = min(timeout or current_app.config["CACHE_DEFAULT_TIMEOUT"], lag)
+    if response.status_code == 200:
+        body = response.get_data(as_text=True)
+        try:
+            cache.set(key, body, timeout=timeout)
+            cache.set(
+                stale_key,
+                body,
+                timeout=current_app.config.get("CACHE_STALE_TIMEOUT", 3600),
+            )
+        except Exception as e:
+            print(f"Could not cache {name}: {e}")
+    return response
+
+
+def json_response(body):
+    return current_app.response_class(body, mimetype="application/json")
+
+
+def register_cache_invalidation(session):
+    """Bump the data version after commits that touched watched tables"""
+    if event.contains(session, "after_commit", _after_commit):
+        return
+
+    event.listen(session, "before_flush", _before_flush)
+    event.listen(session, "do_orm_execute", _do_orm_execute)
+    event.listen(session, "after_commit", _after_commit)
+    event.listen(session, "after_rollback", _after_rollback)
+
+
+def _touches_watched_table(instances):
+    return any(
+        getattr(instance, "__tablename__", None) in WATCHED_TABLES
+        for instance in instances
+    )
+
+
+def _before_flush(session, flush_context, instances):
+    if _touches_watched_table(session.new | session.dirty | session.deleted):
+        session.info["data_changed"] = True
+
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk UPDATE/INSERT/DELETE statements bypass the flush
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in WATCHED_TABLES:
+        orm_execute_state.session.info["data_changed"] = True
+
+
+def _after_commit(session):
+    if session.info.pop("data_changed", False):
+        bump_data_version()
+
+
+def _after_rollback(session):
+    session.info.pop("data_changed", None)
@@ -0,0 +1,150 @@
+"""
+Per-request SQL instrumentation
+
+When SQL_INSTRUMENTATION is on, cursor events on every engine count the
+statements a request sends and the time spent in them. The totals are
+returned in a Server-Timing header, which browser dev tools display, and
+written as one JSON log line per request. A statement sent at least
+SQL_REPEAT_THRESHOLD times by one request is reported as a likely N+1
+pattern (a lazy load inside a loop, usually) at WARNING level.
+
+Only a SQL_INSTRUMENTATION_SAMPLE_RATE fraction of requests is measured;
+for the others the listeners return straight away, and with the setting
+off no listeners are installed at all.
+"""
+
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+from models import db
+
+# Longest statement text quoted in a log line
+MAX_LOGGED_STATEMENT = 300
+
+# The column list of an ORM SELECT, which says little about where it came from
+SELECT_COLUMNS = re.compile(r"^SELECT .+? FROM ")
+
+
+class RequestQueries:
+    """Statements sent while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        """(statement, count) pairs sent at least `threshold` times"""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+def register_sql_instrumentation(app):
+    """Measure the queries of sampled requests on all of the app's engines"""
+    if not app.config.get("SQL_INSTRUMENTATION"):
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+    app.before_request(start_measuring)
+    app.after_request(report_queries)
+
+
+def request_queries():
+    """Measurements of the current request, None when it is not sampled"""
+    return g.get("sql_queries") if has_app_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    if request_queries() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    queries = request_queries()
+    started = conn.info.get("query_started")
+    if queries is None or not started:
+        return
+    queries.seconds += time.perf_counter() - started.pop()
+    queries.count += 1
+    queries.statements[statement] += 1
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; count it here so
+    # its start time does not stay behind on the pooled connection
+    context = exception_context.execution_context
+    if exception_context.connection is None or context is None:
+        return
+    _after_cursor_execute(
+        exception_context.connection,
+        getattr(context, "cursor", None),
+        exception_context.statement,
+        exception_context.parameters,
+        exception_context.execution_context,
+        False,
+    )
+
+
+def start_measuring():
+    if random.random() < current_app.config["SQL_INSTRUMENTATION_SAMPLE_RATE"]:
+        g.sql_queries = RequestQueries()
+
+
+def summarize(statement):
+    """One-line statement text for logs, without the SELECT column list"""
+    statement = SELECT_COLUMNS.sub("SELECT ... FROM ", " ".join(statement.split()))
+    return statement[:MAX_LOGGED_STATEMENT]
+
+
+def report_queries(response):
+    queries = request_queries()
+    if queries is None:
+        return response
+
+    total_ms = (time.perf_counter() - queries.started) * 1000
+    db_ms = queries.seconds * 1000
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={db_ms:.1f};desc="{queries.count} queries", app;dur={total_ms:.1f}',
+    )
+
+    repeated = queries.repeated(current_app.config["SQL_REPEAT_THRESHOLD"])
+    level = logging.WARNING if repeated else logging.INFO
+    if current_app.logger.isEnabledFor(level):
+        current_app.logger.log(
+            level,
+            json.dumps(
+                {
+                    "event": "sql",
+                    "method": request.method,
+                    "path": request.path,
+                    "endpoint": request.endpoint,
+                    "status": response.status_code,
+                    "queries": queries.count,
+                    "db_ms": round(db_ms, 2),
+                    "total_ms": round(total_ms, 2),
+                    "repeated": [
+                        {"statement": summarize(statement), "count": count}
+                        for statement, count in repeated
+                    ],
+                }
+            ),
+        )
+    return response
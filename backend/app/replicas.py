@@ -0,0 +1,138 @@
+"""
+Read replica routing
+
+Each URL in READ_REPLICA_URLS becomes a `replica_<n>` bind. GET requests to
+the blueprints in READ_REPLICA_BLUEPRINTS read from a randomly chosen
+replica; writes always go to the primary (see models.RoutingSession).
+
+Replicas lag the primary by up to READ_REPLICA_LAG seconds, so a user who
+has just written keeps reading from the primary for that long
+(read-your-writes), and responses computed on a replica are cached for no
+longer than that.
+
+Locally, a SQLite replica is a copy of the primary file refreshed by
+`flask --app app sync-replicas --interval 5`.
+"""
+
+import random
+import sqlite3
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from app import cache
+from models import db
+
+REPLICA_BIND_PREFIX = "replica_"
+
+# Methods that never write, so they can be served by a replica
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def configure_replica_binds(app):
+    """Add a bind per READ_REPLICA_URLS entry; call before db.init_app"""
+    urls = app.config.get("READ_REPLICA_URLS") or []
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for n, url in enumerate(urls):
+        binds[f"{REPLICA_BIND_PREFIX}{n}"] = url
+    app.config["SQLALCHEMY_BINDS"] = binds
+    app.extensions["read_replicas"] = [
+        key for key in binds if key.startswith(REPLICA_BIND_PREFIX)
+    ]
+
+
+def register_read_routing(app):
+    """Route eligible reads to replicas and remember who just wrote"""
+    if not app.extensions.get("read_replicas"):
+        return
+    app.before_request(route_reads_to_replica)
+    app.after_request(remember_writer)
+
+
+def read_replica():
+    """Replica bind the current session reads from, None for the primary"""
+    return db.session.info.get("read_bind")
+
+
+def current_identity():
+    try:
+        return get_jwt_identity() or None
+    except RuntimeError:
+        # No JWT was verified for this request
+        return None
+
+
+def recent_write_key(identity):
+    return f"recent-write:{identity.get('type')}:{identity.get('id')}"
+
+
+def wrote_recently(identity):
+    try:
+        return bool(cache.get(recent_write_key(identity)))
+    except Exception:
+        # Without the marker we cannot tell, and the primary is always right
+        return True
+
+
+def route_reads_to_replica():
+    if (
+        request.method not in SAFE_METHODS
+        or request.blueprint not in current_app.config["READ_REPLICA_BLUEPRINTS"]
+    ):
+        return
+
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        # Leave invalid tokens to the view's own checks
+        return
+    identity = current_identity()
+    if identity and wrote_recently(identity):
+        return
+
+    replicas = current_app.extensions["read_replicas"]
+    db.session.info["read_bind"] = random.choice(replicas)
+
+
+def remember_writer(response):
+    if request.method in SAFE_METHODS or response.status_code >= 400:
+        return response
+
+    identity = current_identity()
+    if identity:
+        try:
+            cache.set(
+                recent_write_key(identity),
+                1,
+                timeout=current_app.config["READ_REPLICA_LAG"],
+            )
+        except Exception as e:
+            print(f"Could not record recent write: {e}")
+    return response
+
+
+def copy_sqlite_database(source_path, target_path):
+    """Consistent online copy of a SQLite file, safe while it is written"""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def sync_sqlite_replicas(app):
+    """Copy the primary SQLite file over every SQLite replica file"""
+    with app.app_context():
+        primary = db.engines[None].url
+        replicas = [db.engines[key].url for key in app.extensions["read_replicas"]]
+    if primary.get_backend_name() != "sqlite":
+        raise ValueError("Replica sync only copies SQLite databases")
+
+    copied = []
+    for url in replicas:
+        if url.get_backend_name() == "sqlite" and url.database != primary.database:
+            copy_sqlite_database(primary.database, url.database)
+            copied.append(url.database)
+    return copied
@@ -0,0 +1,40 @@
+"""
+SQLite connection tuning
+
+Every new connection to a SQLite engine runs the PRAGMAs listed in the
+SQLITE_PRAGMAS setting. The production profile switches the database to
+WAL, so readers keep going while a reservation is being written and
+writers only queue behind each other, and relaxes fsyncs to checkpoints
+(synchronous=NORMAL), which WAL keeps crash safe. busy_timeout makes a
+writer wait for the lock rather than fail with "database is locked".
+"""
+
+from sqlalchemy import event
+
+from models import db
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Run `PRAGMA name=value` for each setting on a DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def register_sqlite_pragmas(app):
+    """Apply the app's SQLITE_PRAGMAS to each of its SQLite engines"""
+    pragmas = dict(app.config.get("SQLITE_PRAGMAS") or {})
+    if not pragmas:
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", on_connect)
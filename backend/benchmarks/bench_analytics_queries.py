@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Analytics histogram benchmark: per-bucket query loops vs grouped aggregates
+
+Seeds a SQLite database with a large reservation history, then compares the
+previous one-query-per-bucket histograms (7 daily, 24 hourly, 6 monthly and
+24 peak-hour queries) with the single GROUP BY queries now used by
+api/analytics.py. The daily and hourly histograms read the hourly rollup,
+which is backfilled after seeding. Also reports statement counts and latency
+of the full analytics endpoints.
+
+    python benchmarks/bench_analytics_queries.py --reservations 1000000
+"""
+
+import argparse
+import random
+import sys
+import time as clock
+from datetime import datetime, timedelta
+from itertools import islice
+
+from bench_support import make_app, QueryCounter, timed
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func
+
+from models import db, ParkingSpot, Reservation
+from tasks import backfill_reservation_rollup
+from api.analytics import (
+    daily_reservation_trend,
+    hourly_reservation_distribution,
+    monthly_spending_trend,
+    lot_peak_hours,
+)
+
+
+def seed(app, reservations, users=10000, lots=50, spots_per_lot=100):
+    """Insert lots, spots, users and a year of completed reservations"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        conn = db.session.connection()
+        conn.exec_driver_sql(
+            "INSERT INTO parking_lots (prime_location_name, address, pin_code, "
+            "number_of_spots, price_per_hour, is_active, total_spots, "
+            "available_spots, occupied_spots) VALUES (?, ?, ?, ?, ?, 1, ?, ?, 0)",
+            [
+                (f"Lot {n}", f"{n} Main St", "10000", spots_per_lot, 3.0)
+                + (spots_per_lot, spots_per_lot)
+                for n in range(1, lots + 1)
+            ],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO parking_spots (lot_id, spot_number, status, is_active) "
+            "VALUES (?, ?, 'A', 1)",
+            [
+                (lot, f"SPOT-{i:03d}")
+                for lot in range(1, lots + 1)
+                for i in range(1, spots_per_lot + 1)
+            ],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO users (username, email, password_hash, first_name, "
+            "last_name, is_active) VALUES (?, ?, 'x', 'Bench', 'User', 1)",
+            [(f"bench_{n}", f"bench_{n}@example.com") for n in range(1, users + 1)],
+        )
+
+        def rows():
+            for _ in range(reservations):
+                created = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+                parked = created + timedelta(minutes=rng.randint(1, 30))
+                left = parked + timedelta(minutes=rng.randint(15, 600))
+                yield (
+                    rng.randint(1, users),
+                    rng.randint(1, lots * spots_per_lot),
+                    created,
+                    parked,
+                    left,
+                    round((left - parked).total_seconds() / 1200, 2),
+                    "completed",
+                    created,
+                    left,
+                )
+
+        generated = rows()
+        while True:
+            batch = list(islice(generated, 50000))
+            if not batch:
+                break
+            conn.exec_driver_sql(
+                "INSERT INTO reservations (user_id, spot_id, reservation_timestamp, "
+                "parking_timestamp, leaving_timestamp, parking_cost, status, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        db.session.commit()
+
+
+# Previous implementations, kept here for comparison only
+
+
+def legacy_daily_reservation_trend(today):
+    trend = []
+    for i in range(7):
+        date = today - timedelta(days=i)
+        count = Reservation.query.filter(
+            func.date(Reservation.created_at) == date
+        ).count()
+        trend.append({"date": date.isoformat(), "reservations": count})
+    return trend
+
+
+def legacy_hourly_reservation_distribution(today):
+    hourly_data = []
+    for hour in range(24):
+        count = Reservation.query.filter(
+            func.date(Reservation.created_at) == today,
+            func.extract("hour", Reservation.created_at) == hour,
+        ).count()
+        hourly_data.append({"hour": hour, "reservations": count})
+    return hourly_data
+
+
+def legacy_monthly_spending_trend(user_id):
+    monthly_spending = []
+    for i in range(6):
+        start_date = datetime.utcnow().replace(day=1) - timedelta(days=30 * i)
+        end_date = (
+            start_date.replace(month=start_date.month % 12 + 1, day=1)
+            if start_date.month < 12
+            else start_date.replace(year=start_date.year + 1, month=1, day=1)
+        )
+        spent = (
+            db.session.query(func.sum(Reservation.parking_cost))
+            .filter(
+                Reservation.user_id == user_id,
+                Reservation.status == "completed",
+                Reservation.leaving_timestamp >= start_date,
+                Reservation.leaving_timestamp < end_date,
+            )
+            .scalar()
+            or 0
+        )
+        monthly_spending.append(
+            {"month": start_date.strftime("%Y-%m"), "amount": round(spent, 2)}
+        )
+    return monthly_spending
+
+
+def legacy_lot_peak_hours(lot_id):
+    peak_hours = []
+    for hour in range(24):
+        count = (
+            db.session.query(func.count(Reservation.id))
+            .join(ParkingSpot)
+            .filter(
+                ParkingSpot.lot_id == lot_id,
+                func.extract("hour", Reservation.parking_timestamp) == hour,
+            )
+            .scalar()
+            or 0
+        )
+        peak_hours.append({"hour": hour, "reservations": count})
+    return peak_hours
+
+
+def compare(app, label, legacy, grouped, repeat):
+    with app.app_context():
+        engine = db.engine
+        with QueryCounter(engine) as before:
+            legacy()
+        with QueryCounter(engine) as after:
+            grouped()
+        legacy_seconds, _ = timed(legacy, repeat)
+        grouped_seconds, _ = timed(grouped, repeat)
+
+    print(
+        f"{label:<24} queries {before.count:>3} -> {after.count:<3} "
+        f"latency {legacy_seconds * 1000:>9.1f} ms -> {grouped_seconds * 1000:.1f} ms"
+    )
+
+
+def endpoint(app, label, path, identity, repeat):
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+        headers = {"Authorization": f"Bearer {create_access_token(identity=identity)}"}
+
+    with QueryCounter(engine) as counter:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    seconds, _ = timed(lambda: client.get(path, headers=headers), repeat)
+    print(
+        f"{label:<24} queries {counter.count:>3}        latency {seconds * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics histogram benchmark")
+    parser.add_argument("--reservations", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Measure the queries themselves, not the response cache
+    app = make_app(CACHE_TYPE="NullCache")
+    started = clock.perf_counter()
+    seed(app, args.reservations)
+    print(
+        f"Seeded {args.reservations} reservations in {clock.perf_counter() - started:.1f}s"
+    )
+    started = clock.perf_counter()
+    with app.app_context():
+        print(backfill_reservation_rollup())
+    print(f"Backfilled rollup in {clock.perf_counter() - started:.1f}s")
+
+    today = datetime.utcnow().date()
+    print("\nHistograms (per-bucket loop -> grouped query)")
+    compare(
+        app,
+        "daily trend",
+        lambda: legacy_daily_reservation_trend(today),
+        lambda: daily_reservation_trend(today),
+        args.repeat,
+    )
+    compare(
+        app,
+        "hourly distribution",
+        lambda: legacy_hourly_reservation_distribution(today),
+        lambda: hourly_reservation_distribution(today),
+        args.repeat,
+    )
+    compare(
+        app,
+        "monthly spending",
+        lambda: legacy_monthly_spending_trend(1),
+        lambda: monthly_spending_trend(1),
+        args.repeat,
+    )
+    compare(
+        app,
+        "lot peak hours",
+        lambda: legacy_lot_peak_hours(1),
+        lambda: lot_peak_hours(1),
+        args.repeat,
+    )
+
+    print("\nEndpoints")
+    admin = {"id": 1, "username": "admin", "type": "admin"}
+    endpoint(app, "admin dashboard", "/api/analytics/dashboard", admin, args.repeat)
+    endpoint(
+        app,
+        "user dashboard",
+        "/api/analytics/dashboard",
+        {"id": 1, "username": "bench_1", "type": "user"},
+        args.repeat,
+    )
+    endpoint(
+        app, "lot analytics", "/api/analytics/lots/1/analytics", admin, args.repeat
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Monthly report benchmark: per-user query loop vs set-based aggregation
+
+Seeds many users with a year of reservations and runs tasks.monthly_report
+with email delivery stubbed out, reporting statements issued, wall time
+and peak Python memory. The previous per-user implementation (one query
+per user plus lazy spot/lot loads per reservation) is run for comparison.
+
+    python benchmarks/bench_monthly_report.py --users 100000 --reservations 1000000
+"""
+
+import argparse
+import sys
+import time as clock
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bench_support import make_app, QueryCounter
+from bench_analytics_queries import seed
+
+from models import db, Reservation, User
+import tasks
+
+
+def legacy_monthly_report():
+    """Statistics part of the previous implementation, without email"""
+    today = datetime.utcnow()
+    first_day_this_month = today.replace(day=1)
+    first_day_last_month = (first_day_this_month - timedelta(days=1)).replace(day=1)
+
+    reports = 0
+    for user in User.query.filter_by(is_active=True).all():
+        reservations = Reservation.query.filter(
+            Reservation.user_id == user.id,
+            Reservation.created_at >= first_day_last_month,
+            Reservation.created_at < first_day_this_month,
+        ).all()
+        if not reservations:
+            continue
+        lot_usage = {}
+        for reservation in reservations:
+            lot_name = reservation.parking_spot.parking_lot.prime_location_name
+            lot_usage[lot_name] = lot_usage.get(lot_name, 0) + 1
+        for reservation in reservations[:10]:
+            reservation.parking_spot.parking_lot.prime_location_name
+        reports += 1
+    return f"{reports} reports"
+
+
+def run(app, label, job):
+    with app.app_context():
+        db.session.expunge_all()
+        tracemalloc.start()
+        started = clock.perf_counter()
+        with QueryCounter(db.engine) as counter:
+            result = job()
+        elapsed = clock.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(
+        f"{label:<12} {result:<36} queries {counter.count:>7}   "
+        f"{elapsed:7.1f} s   peak {peak / 2**20:6.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly report benchmark")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--reservations", type=int, default=1_000_000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    app = make_app()
+    started = clock.perf_counter()
+    seed(app, args.reservations, users=args.users)
+    print(
+        f"Seeded {args.users} users, {args.reservations} reservations "
+        f"in {clock.perf_counter() - started:.1f}s\n"
+    )
+
+    # Render every report but skip SMTP
+    tasks.send_email = lambda **kwargs: True
+    tasks.print = lambda *args, **kwargs: None
+
+    run(app, "set-based", tasks.monthly_report)
+    if not args.skip_legacy:
+        run(app, "per-user", legacy_monthly_report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Listing pagination benchmark: OFFSET + COUNT vs keyset cursors
+
+Seeds a large reservation history and times /api/admin/reservations at
+page 1 and a deep page, in offset mode (?page=) and cursor mode (?after=).
+The deep cursor is the one a client would hold after paging that far.
+
+    python benchmarks/bench_pagination.py --reservations 500000 --page 10000
+"""
+
+import argparse
+import sys
+import time as clock
+
+from bench_support import make_app, QueryCounter, timed
+from bench_analytics_queries import seed
+
+from flask_jwt_extended import create_access_token
+
+from models import db, Reservation
+from api.pagination import encode_cursor
+
+
+def cursor_before_page(app, page, per_page, status=None):
+    """Cursor of the last row of the page preceding `page`"""
+    if page == 1:
+        return ""
+    with app.app_context():
+        query = Reservation.query
+        if status:
+            query = query.filter_by(status=status)
+        row = (
+            query.order_by(Reservation.created_at.desc(), Reservation.id.desc())
+            .offset((page - 1) * per_page - 1)
+            .first()
+        )
+        return encode_cursor(row)
+
+
+def measure(app, label, path, repeat):
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+        token = create_access_token(
+            identity={"id": 1, "username": "admin", "type": "admin"}
+        )
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with QueryCounter(engine) as counter:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    seconds, _ = timed(lambda: client.get(path, headers=headers), repeat)
+    print(f"{label:<38} queries {counter.count:>2}   latency {seconds * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Listing pagination benchmark")
+    parser.add_argument("--reservations", type=int, default=500_000)
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.page * args.per_page > args.reservations:
+        parser.error("--page * --per-page must not exceed --reservations")
+
+    app = make_app()
+    started = clock.perf_counter()
+    seed(app, args.reservations)
+    print(
+        f"Seeded {args.reservations} reservations in {clock.perf_counter() - started:.1f}s\n"
+    )
+
+    base = f"/api/admin/reservations?per_page={args.per_page}"
+    for status in (None, "completed"):
+        path = f"{base}&status={status}" if status else base
+        suffix = f" (status={status})" if status else ""
+        for page in (1, args.page):
+            measure(
+                app, f"offset page {page}{suffix}", f"{path}&page={page}", args.repeat
+            )
+            cursor = cursor_before_page(app, page, args.per_page, status)
+            measure(
+                app,
+                f"cursor page {page}{suffix}",
+                f"{path}&after={cursor}",
+                args.repeat,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
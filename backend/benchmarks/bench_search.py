@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Parking lot search benchmark: ILIKE scans vs FTS5/trigram indexes
+
+Seeds a large parking_lots table with generated names and addresses,
+then times the previous three-column `ILIKE '%q%'` filter against the
+indexed text_matches() lookup for a few typical search box inputs.
+
+    python benchmarks/bench_search.py --lots 100000
+"""
+
+import argparse
+import random
+import sys
+import time as clock
+from itertools import islice
+
+from bench_support import make_app, timed
+
+from models import db, ParkingLot
+
+AREAS = [
+    "Indiranagar",
+    "Koramangala",
+    "Whitefield",
+    "Jayanagar",
+    "Malleshwaram",
+    "Hebbal",
+    "Yelahanka",
+    "Banashankari",
+    "Marathahalli",
+    "Electronic City",
+]
+KINDS = ["Market", "Mall", "Metro Station", "Tech Park", "Hospital", "Stadium"]
+STREETS = ["Main Road", "Cross Street", "Ring Road", "Avenue", "Layout"]
+
+# Selective lookups, a prefix typed mid-word, a substring and a broad term
+QUERIES = [
+    "koramangala mall 421",
+    "hebbal metro stat",
+    "560034",
+    "whitefield tech 77",
+    "angala market 1",
+    "koramangala",
+]
+
+
+def seed(app, lots):
+    rng = random.Random(11)
+
+    def rows():
+        for n in range(1, lots + 1):
+            area = rng.choice(AREAS)
+            yield (
+                f"{area} {rng.choice(KINDS)} {n}",
+                f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {area}",
+                f"560{rng.randint(0, 99):03d}",
+                50,
+                round(rng.uniform(1, 10), 2),
+            )
+
+    with app.app_context():
+        conn = db.session.connection()
+        generated = rows()
+        while True:
+            batch = list(islice(generated, 20000))
+            if not batch:
+                break
+            conn.exec_driver_sql(
+                "INSERT INTO parking_lots (prime_location_name, address, pin_code, "
+                "number_of_spots, price_per_hour, is_active, total_spots, "
+                "available_spots, occupied_spots) VALUES (?, ?, ?, ?, ?, 1, 50, 50, 0)",
+                batch,
+            )
+        db.session.commit()
+
+
+def legacy_search(text, limit):
+    return (
+        ParkingLot.query.filter_by(is_active=True)
+        .filter(
+            db.or_(
+                ParkingLot.prime_location_name.ilike(f"%{text}%"),
+                ParkingLot.address.ilike(f"%{text}%"),
+                ParkingLot.pin_code.ilike(f"%{text}%"),
+            )
+        )
+        .limit(limit)
+        .all()
+    )
+
+
+def indexed_search(text, limit):
+    matches = ParkingLot.text_matches(text)
+    return (
+        ParkingLot.query.filter_by(is_active=True)
+        .join(matches, matches.c.lot_id == ParkingLot.id)
+        .order_by(matches.c.rank)
+        .limit(limit)
+        .all()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parking lot search benchmark")
+    parser.add_argument("--lots", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    started = clock.perf_counter()
+    seed(app, args.lots)
+    print(
+        f"Seeded and indexed {args.lots} lots in {clock.perf_counter() - started:.1f}s\n"
+    )
+
+    # ILIKE can stop after the first 20 hits of a broad term, but returns
+    # them unranked; the indexed search always ranks every match
+    with app.app_context():
+        for limit in (20, None):
+            print(f"{'query':<24} {'ILIKE scan':>12} {'indexed':>12}   limit {limit}")
+            for text in QUERIES:
+                legacy_seconds, _ = timed(
+                    lambda: legacy_search(text, limit), args.repeat
+                )
+                indexed_seconds, found = timed(
+                    lambda: indexed_search(text, limit), args.repeat
+                )
+                print(
+                    f"{text:<24} {legacy_seconds * 1000:>9.1f} ms "
+                    f"{indexed_seconds * 1000:>9.1f} ms   {len(found)} results"
+                )
+            print()
+
+    client = app.test_client()
+    for text in QUERIES[:2]:
+        seconds, response = timed(
+            lambda: client.get("/api/parking/search", query_string={"q": text}),
+            args.repeat,
+        )
+        found = response.get_json()["total_found"]
+        print(f"endpoint q={text:<24} {seconds * 1000:9.1f} ms   {found} results")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
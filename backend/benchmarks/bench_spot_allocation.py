@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark for spot allocation
+
+Many threads reserve spots in the same lot at once, like a morning rush
+across gunicorn workers. Reports reservations/second and checks that no
+spot was handed to two reservations. Exits non-zero on a double allocation.
+
+    python benchmarks/bench_spot_allocation.py --threads 16 --spots 500
+    python benchmarks/bench_spot_allocation.py --strategy legacy
+"""
+
+import argparse
+import queue
+import sys
+import threading
+import time
+
+from bench_support import make_app
+
+from sqlalchemy.exc import OperationalError
+
+from models import db, User, ParkingLot, ParkingSpot, Reservation
+
+
+def seed(app, spots, users):
+    """Create one lot with the given spots and the requesting users"""
+    with app.app_context():
+        lot = ParkingLot(
+            prime_location_name="Rush Hour Plaza",
+            address="1 Benchmark Way",
+            pin_code="00000",
+            number_of_spots=spots,
+            price_per_hour=4.0,
+            total_spots=spots,
+            available_spots=spots,
+        )
+        db.session.add(lot)
+        db.session.flush()
+
+        db.session.execute(
+            db.insert(ParkingSpot),
+            [
+                {"lot_id": lot.id, "spot_number": f"SPOT-{i:04d}", "status": "A"}
+                for i in range(1, spots + 1)
+            ],
+        )
+        db.session.execute(
+            db.insert(User),
+            [
+                {
+                    "username": f"rush_{i}",
+                    "email": f"rush_{i}@example.com",
+                    "password_hash": "x",
+                    "first_name": "Rush",
+                    "last_name": str(i),
+                }
+                for i in range(1, users + 1)
+            ],
+        )
+        db.session.commit()
+        return lot.id
+
+
+def reserve_atomic(user_id, lot_id):
+    """Current allocation path"""
+    return Reservation.reserve_first_available(user_id, lot_id, f"KA-{user_id}")
+
+
+def reserve_legacy(user_id, lot_id):
+    """Previous read-then-write allocation, kept for comparison"""
+    spot = ParkingSpot.query.filter_by(
+        lot_id=lot_id, status="A", is_active=True
+    ).first()
+    if not spot:
+        return None
+    reservation = Reservation(
+        user_id=user_id, spot_id=spot.id, vehicle_number=f"KA-{user_id}"
+    )
+    spot.status = "O"
+    db.session.add(reservation)
+    return reservation
+
+
+def run(app, lot_id, users, threads, reserve):
+    """Fire one reservation request per user across the worker threads"""
+    pending = queue.Queue()
+    for user_id in range(1, users + 1):
+        pending.put(user_id)
+
+    stats = {"booked": 0, "full": 0, "retries": 0}
+    lock = threading.Lock()
+    start_gate = threading.Barrier(threads)
+
+    def worker():
+        start_gate.wait()
+        while True:
+            try:
+                user_id = pending.get_nowait()
+            except queue.Empty:
+                return
+            while True:
+                with app.app_context():
+                    try:
+                        reservation = reserve(user_id, lot_id)
+                        db.session.commit()
+                    except OperationalError:
+                        db.session.rollback()
+                        with lock:
+                            stats["retries"] += 1
+                        continue
+                with lock:
+                    stats["booked" if reservation else "full"] += 1
+                break
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def verify(app, lot_id):
+    """Return (double allocated spot ids, counter mismatch description)"""
+    with app.app_context():
+        doubles = (
+            db.session.query(Reservation.spot_id)
+            .group_by(Reservation.spot_id)
+            .having(db.func.count(Reservation.id) > 1)
+            .all()
+        )
+        occupied = ParkingSpot.query.filter_by(lot_id=lot_id, status="O").count()
+        reservations = Reservation.query.count()
+        lot = db.session.get(ParkingLot, lot_id)
+
+        problems = []
+        if occupied != reservations:
+            problems.append(f"{occupied} occupied spots vs {reservations} reservations")
+        if lot.occupied_spots != occupied:
+            problems.append(
+                f"lot counter says {lot.occupied_spots} occupied, actual {occupied}"
+            )
+        return [row.spot_id for row in doubles], problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spot allocation contention benchmark")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--spots", type=int, default=200)
+    parser.add_argument(
+        "--users", type=int, default=None, help="Requests to fire (default 2x spots)"
+    )
+    parser.add_argument("--strategy", choices=["atomic", "legacy"], default="atomic")
+    args = parser.parse_args()
+
+    users = args.users or args.spots * 2
+    app = make_app(SQLALCHEMY_ENGINE_OPTIONS={"pool_size": args.threads})
+    lot_id = seed(app, args.spots, users)
+
+    reserve = reserve_atomic if args.strategy == "atomic" else reserve_legacy
+    stats = run(app, lot_id, users, args.threads, reserve)
+    doubles, problems = verify(app, lot_id)
+
+    print(f"Strategy: {args.strategy}")
+    print(f"Threads: {args.threads}, spots: {args.spots}, requests: {users}")
+    print(f"Booked: {stats['booked']}, rejected (lot full): {stats['full']}")
+    print(f"Lock retries: {stats['retries']}")
+    print(f"Elapsed: {stats['seconds']:.3f}s")
+    print(f"Throughput: {users / stats['seconds']:.1f} reservations/second")
+    print(f"Double allocations: {len(doubles)}")
+    for problem in problems:
+        print(f"Inconsistency: {problem}")
+
+    return 1 if doubles or problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
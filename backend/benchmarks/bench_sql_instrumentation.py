@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Overhead of the per-request SQL instrumentation
+
+Serves the same requests with SQL_INSTRUMENTATION off, on for every
+request, and on for a sample, and reports the mean latency of each
+endpoint and the overhead relative to off. Log lines are written at INFO,
+so they are dropped as they would be with a WARNING production logger.
+
+    python benchmarks/bench_sql_instrumentation.py --requests 500
+"""
+
+import argparse
+import sys
+import time as clock
+
+from bench_support import make_app
+from bench_analytics_queries import seed
+
+from flask_jwt_extended import create_access_token
+
+MODES = {
+    "off": {"SQL_INSTRUMENTATION": False},
+    "on": {"SQL_INSTRUMENTATION": True},
+    "sampled 10%": {
+        "SQL_INSTRUMENTATION": True,
+        "SQL_INSTRUMENTATION_SAMPLE_RATE": 0.1,
+    },
+}
+
+PATHS = [
+    "/api/parking/lots",
+    "/api/admin/users?per_page=50",
+    "/api/admin/reservations?per_page=50",
+]
+
+
+def mean_latency(app, path, requests):
+    client = app.test_client()
+    with app.app_context():
+        token = create_access_token(
+            identity={"id": 1, "username": "admin", "type": "admin"}
+        )
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    started = clock.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    return (clock.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL instrumentation overhead")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--reservations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    latencies = {}
+    for mode, settings in MODES.items():
+        app = make_app(**settings)
+        seed(app, args.reservations, users=1000)
+        latencies[mode] = {
+            path: mean_latency(app, path, args.requests) for path in PATHS
+        }
+
+    for path in PATHS:
+        print(path)
+        baseline = latencies["off"][path]
+        for mode in MODES:
+            seconds = latencies[mode][path]
+            print(
+                f"  {mode:<12} {seconds * 1000:7.2f} ms"
+                f"   {(seconds / baseline - 1) * 100:+6.1f}%"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
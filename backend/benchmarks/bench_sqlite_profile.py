@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write benchmark for the SQLite profiles
+
+Several worker processes with several threads each, like gunicorn workers,
+share one SQLite file for a fixed time. Each operation is either a read
+(active lots and a user's recent reservations) or, with probability
+--write-ratio, a write (reserve a spot and release it again, two commits).
+Runs once with SQLite's defaults and once with the production profile,
+then reports operations/second, 95th percentile latencies and lock errors
+for both.
+
+    python benchmarks/bench_sqlite_profile.py --processes 4 --threads 4
+    python benchmarks/bench_sqlite_profile.py --write-ratio 0.5 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+import threading
+import time
+
+from bench_support import make_app
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from config import ProductionConfig
+from models import db, User, ParkingLot, ParkingSpot, Reservation
+
+PROFILES = {
+    "default": {},
+    "production": {
+        "SQLITE_PRAGMAS": ProductionConfig.SQLITE_PRAGMAS,
+        "SQLALCHEMY_ENGINE_OPTIONS": ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+    },
+}
+
+
+def seed(app, lots, spots, users):
+    """Create lots with free spots and the users booking them"""
+    with app.app_context():
+        db.session.execute(
+            db.insert(ParkingLot),
+            [
+                {
+                    "prime_location_name": f"Lot {n}",
+                    "address": f"{n} Benchmark Way",
+                    "pin_code": "00000",
+                    "number_of_spots": spots,
+                    "price_per_hour": 4.0,
+                    "total_spots": spots,
+                    "available_spots": spots,
+                }
+                for n in range(1, lots + 1)
+            ],
+        )
+        db.session.execute(
+            db.insert(ParkingSpot),
+            [
+                {"lot_id": lot, "spot_number": f"SPOT-{n:04d}", "status": "A"}
+                for lot in range(1, lots + 1)
+                for n in range(1, spots + 1)
+            ],
+        )
+        db.session.execute(
+            db.insert(User),
+            [
+                {
+                    "username": f"user_{n}",
+                    "email": f"user_{n}@example.com",
+                    "password_hash": "x",
+                    "first_name": "Bench",
+                    "last_name": str(n),
+                }
+                for n in range(1, users + 1)
+            ],
+        )
+        db.session.commit()
+
+
+def read(rng, lots, users):
+    ParkingLot.query.filter_by(is_active=True).all()
+    Reservation.query.filter_by(user_id=rng.randint(1, users)).order_by(
+        Reservation.id.desc()
+    ).limit(20).all()
+
+
+def write(rng, lots, users):
+    user_id = rng.randint(1, users)
+    reservation = Reservation.reserve_first_available(
+        user_id, rng.randint(1, lots), f"KA-{user_id}"
+    )
+    db.session.commit()
+    if reservation is not None:
+        ParkingSpot.release(reservation.spot_id)
+        db.session.commit()
+
+
+def p95(samples):
+    if not samples:
+        return 0.0
+    return sorted(samples)[int(len(samples) * 0.95)]
+
+
+def worker_process(args, start_at, results):
+    """One gunicorn-like worker: its own app and pool, several threads"""
+    app = create_app("benchmark")
+    stats = {"reads": 0, "writes": 0, "locked": 0, "reads_ms": [], "writes_ms": []}
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        counts = {"reads": 0, "writes": 0, "locked": 0, "reads_ms": [], "writes_ms": []}
+        time.sleep(max(0, start_at - time.time()))
+        stop_at = start_at + args.seconds
+        while time.time() < stop_at:
+            kind = "writes" if rng.random() < args.write_ratio else "reads"
+            operation = write if kind == "writes" else read
+            with app.app_context():
+                try:
+                    started = time.perf_counter()
+                    operation(rng, args.lots, args.users)
+                    counts[kind] += 1
+                    counts[f"{kind}_ms"].append((time.perf_counter() - started) * 1000)
+                except OperationalError:
+                    db.session.rollback()
+                    counts["locked"] += 1
+        with lock:
+            for key, value in counts.items():
+                stats[key] += value
+
+    threads = [
+        threading.Thread(target=worker, args=(random.random(),))
+        for _ in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        db.engine.dispose()
+    results.put(stats)
+
+
+def run(profile, args):
+    """Run all worker processes against a fresh database; returns totals"""
+    app = make_app(**PROFILES[profile])
+    seed(app, args.lots, args.spots, args.users)
+    with app.app_context():
+        db.engine.dispose()
+
+    # Fork so the children inherit the benchmark config registered above
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    start_at = time.time() + 1
+    processes = [
+        context.Process(target=worker_process, args=(args, start_at, results))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    totals = {"reads": 0, "writes": 0, "locked": 0, "reads_ms": [], "writes_ms": []}
+    for _ in processes:
+        for key, value in results.get().items():
+            totals[key] += value
+    for process in processes:
+        process.join()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite profile benchmark")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--lots", type=int, default=10)
+    parser.add_argument("--spots", type=int, default=100)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--profile", choices=["both"] + list(PROFILES), default="both")
+    args = parser.parse_args()
+
+    profiles = list(PROFILES) if args.profile == "both" else [args.profile]
+    print(
+        f"{args.processes} processes x {args.threads} threads, "
+        f"{args.write_ratio:.0%} writes, {args.seconds:g}s per profile"
+    )
+    throughput = {}
+    for profile in profiles:
+        totals = run(profile, args)
+        operations = totals["reads"] + totals["writes"]
+        throughput[profile] = operations / args.seconds
+        print(
+            f"{profile:<11} {throughput[profile]:9.1f} ops/s   "
+            f"reads {totals['reads']:6d} (p95 {p95(totals['reads_ms']):6.1f} ms)   "
+            f"writes {totals['writes']:6d} (p95 {p95(totals['writes_ms']):6.1f} ms)   "
+            f"lock errors {totals['locked']}"
+        )
+
+    if len(throughput) == 2 and throughput["default"]:
+        print(f"Speedup: {throughput['production'] / throughput['default']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
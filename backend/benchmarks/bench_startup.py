@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Process startup benchmark
+
+Times cold starts of the entry points in fresh interpreters: importing the
+app package, building a web app, and building a worker app with the task
+modules loaded. Then lists the packages that are slowest to import
+during a web app boot, as reported by `python -X importtime`.
+
+    python benchmarks/bench_startup.py --repeat 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time as clock
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = [
+    ("import app", "import app"),
+    ("web app", "from app import create_app; create_app('testing')"),
+    (
+        "worker app",
+        "from app import create_app, get_celery; import tasks; "
+        "get_celery(create_app('testing')).tasks",
+    ),
+]
+
+
+def cold_start(code):
+    started = clock.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND, check=True)
+    return clock.perf_counter() - started
+
+
+def slowest_imports(code, limit):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            # Whole packages only, wherever they were first imported from
+            name = name.strip()
+            if cumulative.strip().isdigit() and "." not in name:
+                timings.append((int(cumulative) / 1000, name))
+    return sorted(timings, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process startup benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # The interpreter alone, to subtract from the figures below
+    baseline = min(cold_start("pass") for _ in range(args.repeat))
+    print(f"{'python -c pass':<16} best {baseline * 1000:7.1f} ms")
+
+    for label, code in ENTRY_POINTS:
+        samples = [cold_start(code) for _ in range(args.repeat)]
+        print(
+            f"{label:<16} best {min(samples) * 1000:7.1f} ms   "
+            f"median {statistics.median(samples) * 1000:7.1f} ms"
+        )
+
+    print("\nSlowest packages of a web app boot (cumulative)")
+    for milliseconds, name in slowest_imports(ENTRY_POINTS[1][1], args.top):
+        print(f"{milliseconds:9.1f} ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
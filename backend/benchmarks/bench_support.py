@@ -0,0 +1,69 @@
+"""
+Shared helpers for the benchmark scripts in this directory
+"""
+
+import atexit
+import os
+import sys
+import tempfile
+import time
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from config import config, TestingConfig
+
+from app import create_app
+from models import db
+
+
+def make_app(db_path=None, **settings):
+    """Create an app bound to a throwaway SQLite file with fresh tables"""
+
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix="parking-bench-", suffix=".db")
+        os.close(fd)
+        atexit.register(os.remove, db_path)
+
+    attrs = {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"}
+    attrs.update(settings)
+    config["benchmark"] = type("BenchmarkConfig", (TestingConfig,), attrs)
+
+    app = create_app("benchmark")
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    app.config["BENCH_DB_PATH"] = db_path
+    return app
+
+
+class QueryCounter:
+    """Count statements sent to an engine while the context is open"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _before_cursor_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+def timed(fn, repeat=5):
+    """Run fn repeatedly and return (best seconds, last result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
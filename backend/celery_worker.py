@@ -4,36 +4,31 @@ Celery worker script for Vehicle Parking App V2
 """
 
 import os
-from app import create_app
-from config.celery_config import make_celery
+from app import create_app, get_celery
 
 # Create Flask app and Celery instance
 app = create_app()
-celery = make_celery(app)
+celery = get_celery(app)
 
 # Import tasks to register them
-from tasks import daily_reminder, monthly_report, export_user_data_csv
+from tasks import (
+    daily_reminder,
+    monthly_report,
+    dispatch_monthly_reports,
+    monthly_report_chunk,
+    monthly_report_summary,
+    export_user_data_csv,
+    reconcile_spot_counters,
+)
 
 if __name__ == "__main__":
-    # Configure Celery beat schedule
-    celery.conf.beat_schedule = {
-        "daily-reminder": {
-            "task": "tasks.daily_reminder",
-            "schedule": 60.0,  # Every 60 seconds for testing (change to crontab for production)
-        },
-        "monthly-report": {
-            "task": "tasks.monthly_report",
-            "schedule": 300.0,  # Every 5 minutes for testing (change to crontab for production)
-        },
-    }
-
-    celery.conf.timezone = "UTC"
-
     print("Starting Celery worker...")
     print("Available tasks:")
     print("  - daily_reminder")
     print("  - monthly_report")
+    print("  - dispatch_monthly_reports (monthly_report_chunk, monthly_report_summary)")
     print("  - export_user_data_csv")
+    print("  - reconcile_spot_counters")
 
     # Start the worker
     celery.start()
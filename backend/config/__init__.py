@@ -11,6 +11,31 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    # PRAGMAs run on every new SQLite connection (see app/sqlite.py)
+    SQLITE_PRAGMAS = {}
+
+    # Read replicas: comma separated database URLs. GET requests to these
+    # blueprints read from a replica, except for users who wrote within the
+    # last READ_REPLICA_LAG seconds, the longest a replica may fall behind
+    READ_REPLICA_URLS = [
+        url for url in os.environ.get("READ_REPLICA_URLS", "").split(",") if url
+    ]
+    READ_REPLICA_BLUEPRINTS = ["parking", "analytics", "admin"]
+    READ_REPLICA_LAG = int(os.environ.get("READ_REPLICA_LAG") or 30)
+
+    # Per-request query counts and DB time (SQL_INSTRUMENTATION=1), reported
+    # in Server-Timing headers and JSON log lines for this fraction of
+    # requests. Requests sending the same statement SQL_REPEAT_THRESHOLD
+    # times are logged as likely N+1s.
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "").lower() in [
+        "true",
+        "on",
+        "1",
+    ]
+    SQL_INSTRUMENTATION_SAMPLE_RATE = float(
+        os.environ.get("SQL_INSTRUMENTATION_SAMPLE_RATE") or 1.0
+    )
+    SQL_REPEAT_THRESHOLD = 5
 
     # JWT Configuration
     JWT_SECRET_KEY = (
@@ -24,6 +49,17 @@ class Config:
     CACHE_TYPE = "redis"
     CACHE_REDIS_URL = REDIS_URL
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
+    CACHE_STALE_TIMEOUT = 3600  # stale copy served while recomputing
+    CACHE_LOCK_TIMEOUT = 30  # longest a single recompute may hold its lock
+
+    # Availability stream: Redis pub/sub fan-out across worker processes,
+    # in-process only when unset
+    AVAILABILITY_REDIS_URL = os.environ.get("AVAILABILITY_REDIS_URL")
+    AVAILABILITY_KEEPALIVE = 15  # seconds between SSE keepalive comments
+    # Streams end after this many seconds so each holds a worker thread only
+    # briefly; clients reconnect after AVAILABILITY_RETRY_MS for a new snapshot
+    AVAILABILITY_STREAM_TTL = int(os.environ.get("AVAILABILITY_STREAM_TTL") or 300)
+    AVAILABILITY_RETRY_MS = 3000
 
     # Celery Configuration
     CELERY_BROKER_URL = (
@@ -38,6 +74,32 @@ class Config:
     CELERY_TIMEZONE = "UTC"
     CELERY_ENABLE_UTC = True
 
+    # User-triggered jobs get their own queue so they never wait behind bulk
+    # jobs; run one worker per queue (see start.sh) to size each separately
+    CELERY_QUEUES = ["interactive", "bulk", "notifications"]
+    CELERY_TASK_DEFAULT_QUEUE = "interactive"
+    CELERY_TASK_ROUTES = {
+        "tasks.export_user_data_csv": {"queue": "interactive"},
+        "tasks.daily_reminder": {"queue": "notifications"},
+        "tasks.monthly_report": {"queue": "bulk"},
+        "tasks.dispatch_monthly_reports": {"queue": "bulk"},
+        "tasks.monthly_report_chunk": {"queue": "bulk"},
+        "tasks.monthly_report_summary": {"queue": "bulk"},
+        "tasks.reconcile_spot_counters": {"queue": "bulk"},
+        "tasks.backfill_user_activity": {"queue": "bulk"},
+        "tasks.backfill_reservation_rollup": {"queue": "bulk"},
+    }
+    # Reserve one message at a time so a long job cannot hold others back
+    CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+    # Late-acked jobs are redelivered if unacked this long; keep it above
+    # the longest bulk job
+    CELERY_BROKER_TRANSPORT_OPTIONS = {"visibility_timeout": 6 * 3600}
+
+    # Monthly reports fan out over user id ranges of this width; chunk
+    # outcomes are kept long enough to resume a failed run that month
+    MONTHLY_REPORT_CHUNK_SIZE = 5000
+    MONTHLY_REPORT_LEDGER_TIMEOUT = 40 * 24 * 3600
+
     # Email Configuration
     MAIL_SERVER = os.environ.get("MAIL_SERVER") or "smtp.gmail.com"
     MAIL_PORT = int(os.environ.get("MAIL_PORT") or 587)
@@ -47,15 +109,30 @@ class Config:
     MAIL_DEFAULT_SENDER = (
         os.environ.get("MAIL_DEFAULT_SENDER") or "noreply@parkingapp.com"
     )
+    # Messages sent over one SMTP connection by the bulk notification tasks
+    MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE") or 100)
 
     # Google Chat Webhook (for notifications)
     GOOGLE_CHAT_WEBHOOK_URL = os.environ.get("GOOGLE_CHAT_WEBHOOK_URL")
+    GOOGLE_CHAT_MAX_WORKERS = 8  # concurrent webhook posts
+    GOOGLE_CHAT_RETRIES = 3  # retries on 429/5xx and connection errors
+    GOOGLE_CHAT_BACKOFF = 0.5  # seconds, doubled on each retry
+    GOOGLE_CHAT_TIMEOUT = 10
+    GOOGLE_CHAT_DIGEST_SIZE = 50  # per-user lines coalesced into one message
 
     # File Upload Configuration
     UPLOAD_FOLDER = os.path.join(
         os.path.dirname(os.path.abspath(__file__)), "..", "uploads"
     )
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    EXPORT_JOB_TIMEOUT = 24 * 3600  # how long a queued export can be polled
+    # Emailed exports: reused while unchanged for EXPORT_FILE_TTL seconds,
+    # attached up to EXPORT_ATTACHMENT_MAX_BYTES, otherwise linked
+    EXPORT_FILE_TTL = 3600
+    EXPORT_ATTACHMENT_MAX_BYTES = 2 * 1024 * 1024
+    EXPORT_LINK_TTL = 2 * 3600
+    # Base URL of the API used in links sent by email
+    PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL") or "http://localhost:5000"
 
     # CORS Configuration
     CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "http://localhost:8080").split(",")
@@ -83,6 +160,22 @@ class ProductionConfig(Config):
     SQLALCHEMY_ECHO = False
     CACHE_DEFAULT_TIMEOUT = 900  # 15 minutes for production
 
+    # File-backed SQLite shared by several multi-threaded gunicorn workers
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",  # readers do not block the writer
+        "synchronous": "NORMAL",  # fsync at checkpoints, still safe in WAL
+        "busy_timeout": 5000,  # ms a writer waits for the lock
+        "cache_size": -64000,  # negative means KiB, so 64 MB per connection
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    }
+    # At least one pooled connection per worker thread, a few spare for bursts
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE") or 16),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW") or 8),
+        "pool_timeout": 10,
+    }
+
 
 class TestingConfig(Config):
     """Testing configuration"""
@@ -90,8 +183,11 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     CACHE_TYPE = "simple"
+    CELERY_BROKER_URL = "memory://"
+    CELERY_RESULT_BACKEND = "cache+memory://"
     CELERY_TASK_ALWAYS_EAGER = True
     CELERY_TASK_EAGER_PROPAGATES = True
+    CELERY_TASK_STORE_EAGER_RESULT = True
 
 
 # Configuration dictionary
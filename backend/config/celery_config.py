@@ -1,5 +1,25 @@
 from celery import Celery
-from flask import Flask
+from celery.schedules import crontab
+from flask import Flask, has_app_context
+from kombu import Queue
+
+# Periodic tasks run by `celery beat`
+BEAT_SCHEDULE = {
+    "daily-reminder": {
+        "task": "tasks.daily_reminder",
+        "schedule": crontab(hour=18, minute=0),  # 6 PM daily
+    },
+    "monthly-report": {
+        "task": "tasks.dispatch_monthly_reports",
+        "schedule": crontab(
+            hour=9, minute=0, day_of_month=1
+        ),  # 9 AM on 1st of every month
+    },
+    "reconcile-spot-counters": {
+        "task": "tasks.reconcile_spot_counters",
+        "schedule": crontab(minute=30),  # Every hour at half past
+    },
+}
 
 
 def make_celery(app: Flask) -> Celery:
@@ -17,6 +37,15 @@ def make_celery(app: Flask) -> Celery:
         accept_content=app.config["CELERY_ACCEPT_CONTENT"],
         timezone=app.config["CELERY_TIMEZONE"],
         enable_utc=app.config["CELERY_ENABLE_UTC"],
+        task_always_eager=app.config.get("CELERY_TASK_ALWAYS_EAGER", False),
+        task_eager_propagates=app.config.get("CELERY_TASK_EAGER_PROPAGATES", False),
+        task_store_eager_result=app.config.get("CELERY_TASK_STORE_EAGER_RESULT", False),
+        task_queues=[Queue(name) for name in app.config["CELERY_QUEUES"]],
+        task_default_queue=app.config["CELERY_TASK_DEFAULT_QUEUE"],
+        task_routes=app.config["CELERY_TASK_ROUTES"],
+        worker_prefetch_multiplier=app.config["CELERY_WORKER_PREFETCH_MULTIPLIER"],
+        broker_transport_options=app.config["CELERY_BROKER_TRANSPORT_OPTIONS"],
+        beat_schedule=BEAT_SCHEDULE,
     )
 
     # Set up task context
@@ -24,6 +53,9 @@ def make_celery(app: Flask) -> Celery:
         """Make celery tasks work with Flask app context."""
 
         def __call__(self, *args, **kwargs):
+            # Tasks called directly from inside an app keep using that app
+            if has_app_context():
+                return self.run(*args, **kwargs)
             with app.app_context():
                 return self.run(*args, **kwargs)
 
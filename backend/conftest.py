@@ -0,0 +1,155 @@
+"""
+Shared pytest fixtures for the backend tests
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import config, TestingConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App bound to a fresh SQLite file so several connections can share it"""
+    from app import create_app
+    from models import db
+
+    config["pytest"] = type(
+        "PytestConfig",
+        (TestingConfig,),
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'parking_test.db'}",
+            "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        },
+    )
+    app = create_app("pytest")
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    """Return a function that fills the database with realistic data"""
+    return lambda **sizes: seed_database(app, **sizes)
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Return a function building JWT headers for a user or admin id"""
+    from flask_jwt_extended import create_access_token
+
+    def build(user_type, identity_id=1):
+        with app.app_context():
+            token = create_access_token(
+                identity={
+                    "id": identity_id,
+                    "username": f"{user_type}_{identity_id}",
+                    "type": user_type,
+                }
+            )
+        return {"Authorization": f"Bearer {token}"}
+
+    return build
+
+
+def seed_database(app, lots=5, spots_per_lot=40, users=50, reservations=2000, seed=7):
+    """Bulk insert lots, spots, users and historical reservations.
+
+    Counters on parking_lots are kept consistent with the spot statuses and
+    the hourly reservation rollup and each user's last reservation time are
+    rebuilt from the inserted history.
+    Returns the generation time so callers can build time-relative queries.
+    """
+    from models import db, User, ParkingLot, ParkingSpot, Reservation
+    from tasks import backfill_reservation_rollup, backfill_user_activity
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.session.execute(
+            db.insert(ParkingLot),
+            [
+                {
+                    "prime_location_name": f"Lot {n}",
+                    "address": f"{n} Market Street",
+                    "pin_code": f"{10000 + n}",
+                    "number_of_spots": spots_per_lot,
+                    "price_per_hour": float(2 + n % 5),
+                    "total_spots": spots_per_lot,
+                    "available_spots": spots_per_lot,
+                    "occupied_spots": 0,
+                    "created_at": now - timedelta(days=90),
+                }
+                for n in range(1, lots + 1)
+            ],
+        )
+        db.session.execute(
+            db.insert(ParkingSpot),
+            [
+                {"lot_id": lot_id, "spot_number": f"SPOT-{i:03d}", "status": "A"}
+                for lot_id in range(1, lots + 1)
+                for i in range(1, spots_per_lot + 1)
+            ],
+        )
+        db.session.execute(
+            db.insert(User),
+            [
+                {
+                    "username": f"user_{n}",
+                    "email": f"user_{n}@example.com",
+                    "password_hash": "x",
+                    "first_name": "User",
+                    "last_name": str(n),
+                    "created_at": now - timedelta(days=120, minutes=n),
+                }
+                for n in range(1, users + 1)
+            ],
+        )
+
+        rows = []
+        for _ in range(reservations):
+            created = now - timedelta(minutes=rng.randint(60, 60 * 24 * 60))
+            parked = created + timedelta(minutes=rng.randint(1, 30))
+            left = parked + timedelta(minutes=rng.randint(15, 600))
+            rows.append(
+                {
+                    "user_id": rng.randint(1, users),
+                    "spot_id": rng.randint(1, lots * spots_per_lot),
+                    "reservation_timestamp": created,
+                    "parking_timestamp": parked,
+                    "leaving_timestamp": left,
+                    "parking_cost": round(
+                        (left - parked).total_seconds() / 3600 * 3, 2
+                    ),
+                    "status": "completed",
+                    "vehicle_number": f"KA-{rng.randint(1000, 9999)}",
+                    "created_at": created,
+                    "updated_at": left,
+                }
+            )
+        db.session.execute(db.insert(Reservation), rows)
+        db.session.commit()
+
+        backfill_reservation_rollup()
+        backfill_user_activity()
+
+    return now
@@ -13,6 +13,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
 from models import Admin, User, ParkingLot, ParkingSpot, Reservation
+from tasks import (
+    reconcile_spot_counters,
+    backfill_reservation_rollup,
+    backfill_user_activity,
+)
 
 
 def init_database():
@@ -134,6 +139,8 @@ def init_database():
                 number_of_spots=lot_data["number_of_spots"],
                 price_per_hour=lot_data["price_per_hour"],
                 description=lot_data["description"],
+                total_spots=lot_data["number_of_spots"],
+                available_spots=lot_data["number_of_spots"],
             )
             db.session.add(lot)
             db.session.flush()  # To get the lot ID
@@ -150,6 +157,7 @@ def init_database():
 
         # Commit all changes
         db.session.commit()
+        print(backfill_reservation_rollup())
 
         print("\nDatabase initialization completed successfully!")
         print(
@@ -186,9 +194,45 @@ def reset_database():
             reservation.updated_at = datetime.utcnow()
 
         db.session.commit()
+        print(reconcile_spot_counters())
+        print(backfill_reservation_rollup())
         print("Database reset completed!")
 
 
+def backfill_rollup():
+    """Rebuild the hourly reservation rollup from history"""
+    app = create_app()
+
+    with app.app_context():
+        print(backfill_reservation_rollup())
+
+
+def backfill_activity():
+    """Fill each user's last reservation time from history"""
+    app = create_app()
+
+    with app.app_context():
+        print(backfill_user_activity())
+
+
+def rebuild_search_index():
+    """Create the parking lot search index if missing and reindex all lots"""
+    app = create_app()
+
+    with app.app_context():
+        ParkingLot.rebuild_search_index()
+        db.session.commit()
+        print(f"Search index rebuilt for {ParkingLot.query.count()} parking lots")
+
+
+def reconcile_counters():
+    """Repair drift in the per-lot spot counters"""
+    app = create_app()
+
+    with app.app_context():
+        print(reconcile_spot_counters())
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -201,11 +245,39 @@ if __name__ == "__main__":
     parser.add_argument(
         "--init", action="store_true", help="Initialize database with sample data"
     )
+    parser.add_argument(
+        "--reconcile-counters",
+        action="store_true",
+        help="Repair drift in the per-lot spot counters",
+    )
+    parser.add_argument(
+        "--backfill-rollup",
+        action="store_true",
+        help="Rebuild the hourly reservation rollup from history",
+    )
+    parser.add_argument(
+        "--backfill-user-activity",
+        action="store_true",
+        help="Fill each user's last reservation time used by the daily reminder",
+    )
+    parser.add_argument(
+        "--rebuild-search-index",
+        action="store_true",
+        help="Create the parking lot search index and reindex every lot",
+    )
 
     args = parser.parse_args()
 
     if args.reset:
         reset_database()
+    elif args.reconcile_counters:
+        reconcile_counters()
+    elif args.backfill_rollup:
+        backfill_rollup()
+    elif args.backfill_user_activity:
+        backfill_activity()
+    elif args.rebuild_search_index:
+        rebuild_search_index()
     elif args.init:
         init_database()
     else:
@@ -1,12 +1,39 @@
+import re
 from flask_sqlalchemy import SQLAlchemy
-from flask_user import UserMixin
+from flask_sqlalchemy.session import Session
+from sqlalchemy import DDL, column, event, literal_column, table
+from sqlalchemy.orm import joinedload
+from sqlalchemy.dialects import postgresql, sqlite
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
 
+class RoutingSession(Session):
+    """Session that can send its reads to a read replica.
 
-class User(db.Model, UserMixin):
+    While `info["read_bind"]` names a replica bind, SELECTs go to that
+    engine. Flushes and INSERT/UPDATE/DELETE statements always go to the
+    primary and clear the replica, so a request reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        read_bind = self.info.get("read_bind")
+        if read_bind and bind is None:
+            if not self._flushing and getattr(clause, "is_select", False):
+                return self._db.engines[read_bind]
+            if self._flushing or clause is not None:
+                # A write: the rest of the session stays on the primary
+                self.info.pop("read_bind")
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# Upper bound on retries when a spot claim loses a race with another writer
+SPOT_CLAIM_ATTEMPTS = 5
+
+
+class User(db.Model):
     """User model for customers who can reserve parking spots"""
 
     __tablename__ = "users"
@@ -24,11 +51,28 @@ class User(db.Model, UserMixin):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    # Reminder bookkeeping: set when the user books, and when the daily
+    # reminder job has nudged them since that booking
+    last_reservation_at = db.Column(db.DateTime, nullable=True)
+    last_reminded_at = db.Column(db.DateTime, nullable=True)
+
     # Relationships
     reservations = db.relationship(
         "Reservation", backref="user", lazy=True, cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # Keyset pagination of the admin user listing seeks on (created_at, id)
+        db.Index("ix_users_created", "created_at"),
+        # Users due a reminder: active, not reminded yet, idle since a cutoff
+        db.Index(
+            "ix_users_reminder_due",
+            "is_active",
+            "last_reminded_at",
+            "last_reservation_at",
+        ),
+    )
+
     def set_password(self, password):
         """Set password hash"""
         self.password_hash = generate_password_hash(password)
@@ -104,6 +148,12 @@ class ParkingLot(db.Model):
     price_per_hour = db.Column(db.Float, nullable=False, default=0.0)
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+
+    # Denormalized counters over active spots, kept in step with every spot
+    # status flip so listings never have to COUNT(*) per lot
+    total_spots = db.Column(db.Integer, nullable=False, default=0)
+    available_spots = db.Column(db.Integer, nullable=False, default=0)
+    occupied_spots = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -122,6 +172,110 @@ class ParkingLot(db.Model):
         """Get count of occupied spots"""
         return ParkingSpot.query.filter_by(lot_id=self.id, status="O").count()
 
+    @staticmethod
+    def adjust_spot_counters(lot_id, total=0, available=0, occupied=0):
+        """Shift a lot's spot counters inside the current transaction.
+
+        Uses a relative UPDATE so concurrent writers never overwrite each
+        other's increments. The resulting counters are remembered on the
+        session so they can be published to availability subscribers once
+        the transaction commits.
+        """
+        counters = (
+            db.session.execute(
+                db.update(ParkingLot)
+                .where(ParkingLot.id == lot_id)
+                .values(
+                    total_spots=ParkingLot.total_spots + total,
+                    available_spots=ParkingLot.available_spots + available,
+                    occupied_spots=ParkingLot.occupied_spots + occupied,
+                )
+                .returning(
+                    ParkingLot.total_spots,
+                    ParkingLot.available_spots,
+                    ParkingLot.occupied_spots,
+                )
+            )
+            .mappings()
+            .first()
+        )
+        if counters:
+            db.session.info.setdefault("lot_counters", {})[lot_id] = dict(counters)
+
+    @staticmethod
+    def text_matches(text):
+        """Lots matching a search string as a (lot_id, rank) subquery.
+
+        Word prefixes are matched through the FTS5 index and ranked by
+        bm25; substrings of three or more characters are matched through the
+        trigram index and ranked after them. Returns None when the database
+        has no search indexes (anything but SQLite).
+        """
+        if db.session.get_bind().dialect.name != "sqlite":
+            return None
+
+        candidates = []
+        terms = re.findall(r"\w+", text)
+        if terms:
+            fts = table("parking_lots_fts", column("rowid"), column("rank"))
+            candidates.append(
+                db.select(fts.c.rowid.label("lot_id"), fts.c.rank.label("rank")).where(
+                    literal_column("parking_lots_fts").op("MATCH")(
+                        " ".join(f'"{term}"*' for term in terms)
+                    )
+                )
+            )
+        if len(text) >= 3:
+            trigram = table("parking_lots_trigram", column("rowid"), column("rank"))
+            candidates.append(
+                db.select(
+                    trigram.c.rowid.label("lot_id"),
+                    # bm25 ranks are negative; keep substring hits after word hits
+                    (trigram.c.rank + 1000000).label("rank"),
+                ).where(
+                    literal_column("parking_lots_trigram").op("MATCH")(
+                        '"' + text.replace('"', '""') + '"'
+                    )
+                )
+            )
+        if not candidates:
+            return None
+
+        union = db.union_all(*candidates).subquery()
+        return (
+            db.select(union.c.lot_id, db.func.min(union.c.rank).label("rank"))
+            .group_by(union.c.lot_id)
+            .subquery()
+        )
+
+    @staticmethod
+    def rebuild_search_index():
+        """Create missing search tables and triggers and reindex every lot"""
+        for statement in LOT_SEARCH_DDL:
+            db.session.execute(db.text(statement))
+        for index in ("parking_lots_fts", "parking_lots_trigram"):
+            db.session.execute(
+                db.text(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+            )
+
+    @staticmethod
+    def spot_counts_query():
+        """Actual per-lot spot counts, computed from parking_spots in one pass"""
+        return (
+            db.session.query(
+                ParkingSpot.lot_id,
+                db.func.count(ParkingSpot.id).label("total_spots"),
+                db.func.sum(db.case((ParkingSpot.status == "A", 1), else_=0)).label(
+                    "available_spots"
+                ),
+                db.func.sum(db.case((ParkingSpot.status == "O", 1), else_=0)).label(
+                    "occupied_spots"
+                ),
+            )
+            .filter(ParkingSpot.is_active == True)
+            .group_by(ParkingSpot.lot_id)
+        )
+
     def to_dict(self):
         """Convert parking lot to dictionary"""
         return {
@@ -133,13 +287,59 @@ class ParkingLot(db.Model):
             "price_per_hour": self.price_per_hour,
             "description": self.description,
             "is_active": self.is_active,
-            "available_spots": self.get_available_spots_count(),
-            "occupied_spots": self.get_occupied_spots_count(),
+            "total_spots": self.total_spots,
+            "available_spots": self.available_spots,
+            "occupied_spots": self.occupied_spots,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
 
+# SQLite FTS5 indexes over the searchable lot columns. Both use the lots
+# table as external content and are kept in sync by triggers, so raw SQL
+# writes are indexed too. The update trigger only fires for the indexed
+# columns, leaving the hot spot counter updates untouched.
+LOT_SEARCH_COLUMNS = "prime_location_name, address, pin_code"
+LOT_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS parking_lots_fts USING fts5("
+    f"{LOT_SEARCH_COLUMNS}, content='parking_lots', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS parking_lots_trigram USING fts5("
+    f"{LOT_SEARCH_COLUMNS}, content='parking_lots', content_rowid='id', "
+    "tokenize='trigram')",
+]
+for index in ("parking_lots_fts", "parking_lots_trigram"):
+    insert = (
+        f"INSERT INTO {index}(rowid, {LOT_SEARCH_COLUMNS}) "
+        "VALUES (new.id, new.prime_location_name, new.address, new.pin_code);"
+    )
+    delete = (
+        f"INSERT INTO {index}({index}, rowid, {LOT_SEARCH_COLUMNS}) "
+        "VALUES ('delete', old.id, old.prime_location_name, old.address, old.pin_code);"
+    )
+    LOT_SEARCH_DDL += [
+        f"CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON parking_lots "
+        f"BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON parking_lots "
+        f"BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF "
+        f"{LOT_SEARCH_COLUMNS} ON parking_lots BEGIN {delete} {insert} END",
+    ]
+
+for statement in LOT_SEARCH_DDL:
+    event.listen(
+        ParkingLot.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
+for index in ("parking_lots_fts", "parking_lots_trigram"):
+    event.listen(
+        ParkingLot.__table__,
+        "after_drop",
+        DDL(f"DROP TABLE IF EXISTS {index}").execute_if(dialect="sqlite"),
+    )
+
+
 class ParkingSpot(db.Model):
     """Individual parking spot within a parking lot"""
 
@@ -162,11 +362,78 @@ class ParkingSpot(db.Model):
         "Reservation", backref="parking_spot", lazy=True, cascade="all, delete-orphan"
     )
 
-    # Unique constraint for spot number within a lot
+    # Unique constraint for spot number within a lot, plus the index behind
+    # availability lookups and spot claims
     __table_args__ = (
         db.UniqueConstraint("lot_id", "spot_number", name="unique_spot_per_lot"),
+        db.Index("ix_parking_spots_lot_status_active", "lot_id", "status", "is_active"),
     )
 
+    @staticmethod
+    def claim_available(lot_id):
+        """Atomically claim the first available spot in a lot.
+
+        The candidate lookup and the status flip happen in one UPDATE guarded
+        by status='A', so two concurrent requests can never be handed the
+        same spot. Where the database supports it the candidate is picked
+        with FOR UPDATE SKIP LOCKED, letting contenders move on to the next
+        free spot instead of queueing behind each other. Returns the claimed
+        spot id, or None when the lot has no free spot.
+        """
+        candidate = (
+            db.select(ParkingSpot.id)
+            .where(
+                ParkingSpot.lot_id == lot_id,
+                ParkingSpot.status == "A",
+                ParkingSpot.is_active == True,
+            )
+            .order_by(ParkingSpot.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        claim = (
+            db.update(ParkingSpot)
+            .where(ParkingSpot.id == candidate, ParkingSpot.status == "A")
+            .values(status="O", updated_at=datetime.utcnow())
+            .returning(ParkingSpot.id)
+            .execution_options(synchronize_session=False)
+        )
+
+        for _ in range(SPOT_CLAIM_ATTEMPTS):
+            spot_id = db.session.execute(claim).scalar()
+            if spot_id is not None:
+                ParkingLot.adjust_spot_counters(lot_id, available=-1, occupied=1)
+                return spot_id
+
+            # The guard lost a race with another writer; retry only while
+            # the lot still has something left to claim
+            still_free = db.session.execute(
+                db.select(candidate.label("spot_id"))
+            ).scalar()
+            if still_free is None:
+                return None
+        return None
+
+    @staticmethod
+    def release(spot_id):
+        """Atomically flip an occupied spot back to available.
+
+        Returns False when the spot was not occupied, in which case the lot
+        counters are left untouched.
+        """
+        released = db.session.execute(
+            db.update(ParkingSpot)
+            .where(ParkingSpot.id == spot_id, ParkingSpot.status == "O")
+            .values(status="A", updated_at=datetime.utcnow())
+            .returning(ParkingSpot.lot_id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if released is None:
+            return False
+        ParkingLot.adjust_spot_counters(released, available=1, occupied=-1)
+        return True
+
     def to_dict(self):
         """Convert parking spot to dictionary"""
         return {
@@ -203,6 +470,70 @@ class Reservation(db.Model):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    # Indexes matching the filters used by the API and background tasks
+    __table_args__ = (
+        db.Index(
+            "ix_reservations_user_status_leaving",
+            "user_id",
+            "status",
+            "leaving_timestamp",
+        ),
+        db.Index("ix_reservations_user_created", "user_id", "created_at"),
+        db.Index("ix_reservations_spot_status", "spot_id", "status"),
+        db.Index("ix_reservations_status_leaving", "status", "leaving_timestamp"),
+        db.Index("ix_reservations_created", "created_at"),
+        db.Index("ix_reservations_status_created", "status", "created_at"),
+    )
+
+    @classmethod
+    def with_details(cls):
+        """Reservation query that joins spot, lot and user in one round trip.
+
+        to_dict() reads all three, so list endpoints should start from this
+        query to keep their statement count independent of the page size.
+        """
+        return cls.query.options(
+            joinedload(cls.parking_spot).joinedload(ParkingSpot.parking_lot),
+            joinedload(cls.user),
+        )
+
+    @classmethod
+    def reserve_first_available(cls, user_id, lot_id, vehicle_number, remarks=""):
+        """Claim a free spot in a lot and add a reservation for it.
+
+        Returns None when the lot is full. The caller owns the transaction
+        and must commit (or roll back) the session.
+        """
+        spot_id = ParkingSpot.claim_available(lot_id)
+        if spot_id is None:
+            return None
+
+        now = datetime.utcnow()
+        reservation = cls(
+            user_id=user_id,
+            spot_id=spot_id,
+            vehicle_number=vehicle_number,
+            status="reserved",
+            remarks=remarks,
+            reservation_timestamp=now,
+            created_at=now,
+            updated_at=now,
+        )
+        db.session.add(reservation)
+        ReservationHourlyRollup.record(lot_id, now, reservations=1)
+
+        # Booking makes the user eligible for a fresh reminder once idle again
+        db.session.execute(
+            db.update(User)
+            .where(User.id == user_id)
+            .values(
+                last_reservation_at=now,
+                last_reminded_at=None,
+                updated_at=User.updated_at,
+            )
+        )
+        return reservation
+
     def calculate_cost(self):
         """Calculate parking cost based on time and lot price"""
         if self.parking_timestamp and self.leaving_timestamp:
@@ -261,3 +592,130 @@ class Reservation(db.Model):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+class ReservationHourlyRollup(db.Model):
+    """Per-lot hourly reservation activity, maintained as reservations change.
+
+    New reservations are counted in the hour they were created; completions,
+    revenue and parked time in the hour the vehicle left, matching the
+    timestamps the analytics endpoints bucket on.
+    """
+
+    __tablename__ = "reservation_hourly_rollup"
+
+    lot_id = db.Column(db.Integer, db.ForeignKey("parking_lots.id"), primary_key=True)
+    hour_bucket = db.Column(db.DateTime, primary_key=True)
+    reservation_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    parked_seconds = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (db.Index("ix_reservation_hourly_rollup_hour", "hour_bucket"),)
+
+    @staticmethod
+    def bucket(timestamp):
+        """Truncate a timestamp to the start of its hour"""
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def upsert(cls, rows):
+        """Add each row's counts onto its (lot_id, hour_bucket) entry"""
+        dialect = (
+            postgresql if db.session.get_bind().dialect.name == "postgresql" else sqlite
+        )
+        insert = dialect.insert(cls)
+        statement = insert.on_conflict_do_update(
+            index_elements=[cls.lot_id, cls.hour_bucket],
+            set_={
+                "reservation_count": cls.reservation_count
+                + insert.excluded.reservation_count,
+                "completed_count": cls.completed_count
+                + insert.excluded.completed_count,
+                "revenue": cls.revenue + insert.excluded.revenue,
+                "parked_seconds": cls.parked_seconds + insert.excluded.parked_seconds,
+            },
+        )
+        db.session.execute(statement, rows)
+
+    @classmethod
+    def record(
+        cls,
+        lot_id,
+        timestamp,
+        reservations=0,
+        completed=0,
+        revenue=0.0,
+        parked_seconds=0.0,
+    ):
+        """Record activity for a lot inside the current transaction"""
+        cls.upsert(
+            [
+                {
+                    "lot_id": lot_id,
+                    "hour_bucket": cls.bucket(timestamp),
+                    "reservation_count": reservations,
+                    "completed_count": completed,
+                    "revenue": revenue or 0.0,
+                    "parked_seconds": parked_seconds,
+                }
+            ]
+        )
+
+    @classmethod
+    def forget_spots(cls, spot_ids):
+        """Subtract the activity of the reservations on spots about to be
+        deleted, bucketed the same way it was recorded"""
+        reservations = db.session.execute(
+            db.select(
+                ParkingSpot.lot_id,
+                Reservation.created_at,
+                Reservation.status,
+                Reservation.parking_timestamp,
+                Reservation.leaving_timestamp,
+                Reservation.parking_cost,
+            )
+            .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+            .where(Reservation.spot_id.in_(spot_ids))
+        )
+
+        buckets = {}
+
+        def entry(lot_id, timestamp):
+            key = (lot_id, cls.bucket(timestamp))
+            if key not in buckets:
+                buckets[key] = {
+                    "lot_id": key[0],
+                    "hour_bucket": key[1],
+                    "reservation_count": 0,
+                    "completed_count": 0,
+                    "revenue": 0.0,
+                    "parked_seconds": 0.0,
+                }
+            return buckets[key]
+
+        for row in reservations:
+            if row.created_at is not None:
+                entry(row.lot_id, row.created_at)["reservation_count"] -= 1
+            if (
+                row.status == "completed"
+                and row.leaving_timestamp is not None
+                and row.parking_timestamp is not None
+            ):
+                completed = entry(row.lot_id, row.leaving_timestamp)
+                completed["completed_count"] -= 1
+                completed["revenue"] -= row.parking_cost or 0.0
+                completed["parked_seconds"] -= (
+                    row.leaving_timestamp - row.parking_timestamp
+                ).total_seconds()
+
+        if buckets:
+            cls.upsert(list(buckets.values()))
+            # A rebuild has no bucket without activity; drop emptied ones
+            db.session.execute(
+                db.delete(cls).where(
+                    cls.lot_id.in_({lot_id for lot_id, _ in buckets}),
+                    cls.reservation_count == 0,
+                    cls.completed_count == 0,
+                )
+            )
@@ -116,7 +116,11 @@ def init_database():
         ]
 
         for lot_data in lots_data:
-            lot = ParkingLot(**lot_data)
+            lot = ParkingLot(
+                **lot_data,
+                total_spots=lot_data["number_of_spots"],
+                available_spots=lot_data["number_of_spots"],
+            )
             db.session.add(lot)
 
         # Commit all changes
@@ -1,51 +1,31 @@
-from celery import Celery
-from celery.schedules import crontab
+from celery import chord, group, shared_task
 from datetime import datetime, timedelta
-from models import db, User, Reservation, ParkingLot
+from models import (
+    db,
+    User,
+    Reservation,
+    ParkingLot,
+    ParkingSpot,
+    ReservationHourlyRollup,
+)
+from sqlalchemy import func, or_
 from flask_mail import Message
 from flask import current_app
-import requests
-import csv
-import io
+from itsdangerous import URLSafeTimedSerializer
+from tasks.chat import digests, get_dispatcher
+import smtplib
+import time
+import glob
+import hashlib
 import os
+import tempfile
 
 
-def make_celery(app):
-    """Create Celery instance"""
-    celery = Celery(
-        app.import_name,
-        backend=app.config["CELERY_RESULT_BACKEND"],
-        broker=app.config["CELERY_BROKER_URL"],
-    )
-
-    celery.conf.update(app.config)
-
-    class ContextTask(celery.Task):
-        def __call__(self, *args, **kwargs):
-            with app.app_context():
-                return self.run(*args, **kwargs)
-
-    celery.Task = ContextTask
-    return celery
-
-
-# Celery beat schedule
-celery_beat_schedule = {
-    "daily-reminder": {
-        "task": "tasks.daily_reminder",
-        "schedule": crontab(hour=18, minute=0),  # 6 PM daily
-    },
-    "monthly-report": {
-        "task": "tasks.monthly_report",
-        "schedule": crontab(
-            hour=9, minute=0, day_of_month=1
-        ),  # 9 AM on 1st of every month
-    },
-}
-
+def send_email(to_email, subject, body, html_body=None, attachments=None):
+    """Send email using Flask-Mail
 
-def send_email(to_email, subject, body, html_body=None):
-    """Send email using Flask-Mail"""
+    attachments is an optional list of (filename, content_type, data).
+    """
     try:
         from app import mail
 
@@ -56,6 +36,8 @@ def send_email(to_email, subject, body, html_body=None):
             html=html_body,
             sender=current_app.config["MAIL_DEFAULT_SENDER"],
         )
+        for filename, content_type, data in attachments or []:
+            msg.attach(filename, content_type, data)
         mail.send(msg)
         return True
     except Exception as e:
@@ -63,332 +45,759 @@ def send_email(to_email, subject, body, html_body=None):
         return False
 
 
+def send_bulk_email(messages, batch_size=None, retries=1):
+    """Send many emails, reusing one SMTP connection per batch.
+
+    `messages` is an iterable of dicts with to_email, subject, body and an
+    optional html_body; it is consumed lazily, MAIL_BATCH_SIZE messages per
+    connection. A dropped connection is reopened and the message retried up
+    to `retries` times. Returns a (to_email, error) pair for every message,
+    with error None when the server accepted it.
+    """
+    from app import mail
+
+    batch_size = batch_size or current_app.config.get("MAIL_BATCH_SIZE", 100)
+    sender = current_app.config["MAIL_DEFAULT_SENDER"]
+
+    results = []
+    batch = []
+    for item in messages:
+        batch.append(
+            Message(
+                subject=item["subject"],
+                recipients=[item["to_email"]],
+                body=item["body"],
+                html=item.get("html_body"),
+                sender=sender,
+            )
+        )
+        if len(batch) == batch_size:
+            results.extend(send_email_batch(mail, batch, retries))
+            batch = []
+    if batch:
+        results.extend(send_email_batch(mail, batch, retries))
+    return results
+
+
+def send_email_batch(mail, batch, retries):
+    """Send a list of messages over a single SMTP connection"""
+    results = []
+    try:
+        with mail.connect() as connection:
+            for msg in batch:
+                error = send_over_connection(connection, msg, retries)
+                results.append((msg.recipients[0], error))
+    except OSError as e:
+        # Connecting failed, or reconnecting did; a failed QUIT after the
+        # last message leaves nothing unsent
+        if len(results) < len(batch):
+            print(f"Error sending email batch: {e}")
+            results.extend((msg.recipients[0], str(e)) for msg in batch[len(results) :])
+    return results
+
+
+def send_over_connection(connection, msg, retries):
+    """Send one message, reconnecting when the server has gone away"""
+    for attempt in range(retries + 1):
+        try:
+            connection.send(msg)
+            return None
+        except (
+            smtplib.SMTPRecipientsRefused,
+            smtplib.SMTPSenderRefused,
+            smtplib.SMTPDataError,
+        ) as e:
+            # Rejected by the server; the connection is still usable
+            return str(e)
+        except OSError as e:
+            error = e
+            stale, connection.host = connection.host, None
+            try:
+                stale.close()
+            except Exception:
+                pass
+            # Reopen before returning too, so the rest of the batch is not
+            # sent through a closed connection
+            connection.host = connection.configure_host()
+        except Exception as e:
+            return str(e)
+    return str(error)
+
+
 def send_google_chat_notification(message):
     """Send notification via Google Chat webhook"""
     try:
-        webhook_url = current_app.config.get("GOOGLE_CHAT_WEBHOOK_URL")
-        if not webhook_url:
+        dispatcher = get_dispatcher()
+        if dispatcher is None:
             return False
 
-        payload = {"text": message}
-        response = requests.post(webhook_url, json=payload)
-        return response.status_code == 200
+        return dispatcher.post(message)
     except Exception as e:
         print(f"Error sending Google Chat notification: {e}")
         return False
 
 
+def send_google_chat_digest(title, lines):
+    """Coalesce per-item lines into digest messages posted concurrently.
+
+    Returns the number of digest messages delivered.
+    """
+    try:
+        dispatcher = get_dispatcher()
+        if dispatcher is None:
+            return 0
+
+        size = current_app.config.get("GOOGLE_CHAT_DIGEST_SIZE", 50)
+        return sum(dispatcher.post_all(digests(title, lines, size)))
+    except Exception as e:
+        print(f"Error sending Google Chat digest: {e}")
+        return 0
+
+
 # Celery tasks
-def daily_reminder():
-    """Send daily reminders to users"""
+# Long jobs are acknowledged only once they finish, so the job of a worker
+# that dies mid-run is redelivered instead of lost
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def daily_reminder(batch_size=500):
+    """Send daily reminders to users.
+
+    Users are due when they have not booked for 7 days and have not been
+    reminded since their last booking. They are read in chunks through
+    ix_users_reminder_due and stamped with last_reminded_at as each chunk
+    is sent, which takes them out of the due range; the work therefore
+    scales with the number of users due, not with the reservation history.
+    Users whose email fails are not stamped and are tried again next run.
+    """
     try:
         # Get users who haven't made a reservation in the last 7 days
         week_ago = datetime.utcnow() - timedelta(days=7)
 
-        inactive_users = User.query.filter(
-            ~User.id.in_(
-                db.session.query(Reservation.user_id)
-                .filter(Reservation.created_at >= week_ago)
-                .distinct()
-            ),
-            User.is_active == True,
-        ).all()
-
         # Check if any new parking lots were created
         new_lots = ParkingLot.query.filter(ParkingLot.created_at >= week_ago).all()
 
-        for user in inactive_users:
-            # Prepare message
-            if new_lots:
-                message = f"Hi {user.first_name}! We have new parking lots available. Check them out and book a spot if needed!"
-                lots_info = "\n".join(
-                    [
-                        f"- {lot.prime_location_name} at {lot.address}"
-                        for lot in new_lots
-                    ]
-                )
-                message += f"\n\nNew locations:\n{lots_info}"
-            else:
-                message = f"Hi {user.first_name}! It's been a while since your last parking reservation. Need a spot? Book now!"
-
-            # Send email notification
-            email_sent = send_email(
-                to_email=user.email,
-                subject="Parking Reminder - Book Your Spot!",
-                body=message,
+        due = (
+            db.select(User.id, User.username, User.email, User.first_name)
+            .where(
+                User.is_active == True,
+                User.last_reminded_at.is_(None),
+                or_(
+                    User.last_reservation_at.is_(None),
+                    User.last_reservation_at < week_ago,
+                ),
             )
+            .limit(batch_size)
+        )
 
-            # Send Google Chat notification (if configured)
-            chat_sent = send_google_chat_notification(
-                f"Daily Reminder sent to {user.username} ({user.email})"
+        reminded = 0
+        failed = []
+        while True:
+            # Users whose email failed stay due; skip them for the rest of the run
+            pending = due.where(User.id.notin_(failed)) if failed else due
+            users = db.session.execute(pending).all()
+            if not users:
+                break
+
+            messages = []
+            for user in users:
+                # Prepare message
+                if new_lots:
+                    message = f"Hi {user.first_name}! We have new parking lots available. Check them out and book a spot if needed!"
+                    lots_info = "\n".join(
+                        [
+                            f"- {lot.prime_location_name} at {lot.address}"
+                            for lot in new_lots
+                        ]
+                    )
+                    message += f"\n\nNew locations:\n{lots_info}"
+                else:
+                    message = f"Hi {user.first_name}! It's been a while since your last parking reservation. Need a spot? Book now!"
+
+                messages.append(
+                    {
+                        "to_email": user.email,
+                        "subject": "Parking Reminder - Book Your Spot!",
+                        "body": message,
+                    }
+                )
+
+            # Send email notifications over one connection per batch
+            results = send_bulk_email(messages)
+
+            sent = []
+            lines = []
+            for user, (_, error) in zip(users, results):
+                print(f"Reminder sent to {user.username}: Email={error is None}")
+                if error is None:
+                    sent.append(user.id)
+                    lines.append(f"- {user.username} ({user.email})")
+                else:
+                    failed.append(user.id)
+
+            if not sent:
+                # Nothing went out (mail server down?); leave everyone still
+                # due for the next run instead of trying each of them now
+                print("Daily reminder stopped: no email in the chunk was sent")
+                break
+
+            # One Google Chat digest per chunk rather than a post per user
+            chat_sent = send_google_chat_digest(
+                f"Daily Reminder sent to {len(sent)} users:", lines
             )
+            print(f"Daily reminder digests posted to Google Chat: {chat_sent}")
 
-            print(
-                f"Reminder sent to {user.username}: Email={email_sent}, Chat={chat_sent}"
+            # Stamp the users reminded so a rerun or the next chunk never
+            # repeats them
+            db.session.execute(
+                db.update(User)
+                .where(User.id.in_(sent))
+                .values(last_reminded_at=datetime.utcnow(), updated_at=User.updated_at)
             )
+            db.session.commit()
+            reminded += len(sent)
 
-        return f"Daily reminders sent to {len(inactive_users)} users"
+        if failed:
+            return (
+                f"Daily reminders sent to {reminded} users, "
+                f"{len(failed)} failed and stay due"
+            )
+        return f"Daily reminders sent to {reminded} users"
 
     except Exception as e:
+        db.session.rollback()
         print(f"Error in daily_reminder task: {e}")
         return f"Error: {str(e)}"
 
 
-def monthly_report():
-    """Generate and send monthly activity reports"""
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def monthly_report(batch_size=1000):
+    """Generate and send monthly activity reports.
+
+    Per-user statistics come from one grouped query over last month's
+    reservations and the rows for the report tables from one windowed
+    query; both are streamed in user id order and merged, so the job
+    issues the same two queries however many users there are.
+    dispatch_monthly_reports spreads the same work over several workers.
+    """
     try:
-        # Get last month's date range
-        today = datetime.utcnow()
-        first_day_this_month = today.replace(day=1)
-        last_day_last_month = first_day_this_month - timedelta(days=1)
-        first_day_last_month = last_day_last_month.replace(day=1)
-
-        # Get all active users
-        users = User.query.filter_by(is_active=True).all()
-
-        for user in users:
-            # Get user's reservations from last month
-            reservations = Reservation.query.filter(
-                Reservation.user_id == user.id,
-                Reservation.created_at >= first_day_last_month,
-                Reservation.created_at < first_day_this_month,
-            ).all()
-
-            if not reservations:
-                continue  # Skip users with no activity
-
-            # Calculate statistics
-            total_reservations = len(reservations)
-            completed_reservations = len(
-                [r for r in reservations if r.status == "completed"]
-            )
-            total_spent = sum(
-                [r.parking_cost or 0 for r in reservations if r.status == "completed"]
-            )
+        outcome = send_monthly_reports(report_month(), batch_size=batch_size)
+        return f"Monthly reports sent to {outcome['reports']} users"
 
-            # Find most used parking lot
-            lot_usage = {}
-            for reservation in reservations:
-                lot_name = reservation.parking_spot.parking_lot.prime_location_name
-                lot_usage[lot_name] = lot_usage.get(lot_name, 0) + 1
+    except Exception as e:
+        print(f"Error in monthly_report task: {e}")
+        return f"Error: {str(e)}"
 
-            most_used_lot = (
-                max(lot_usage.items(), key=lambda x: x[1]) if lot_usage else ("N/A", 0)
-            )
 
-            # Calculate total parking duration
-            total_duration = sum(
-                [
-                    r.get_duration_hours()
-                    for r in reservations
-                    if r.status == "completed"
-                    and r.parking_timestamp
-                    and r.leaving_timestamp
-                ]
-            )
+@shared_task
+def dispatch_monthly_reports(month=None, chunk_size=None, resume=False):
+    """Fan the monthly reports out as a chord of user id range chunks.
 
-            # Generate HTML report
-            html_report = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    .header {{ background-color: #f4f4f4; padding: 20px; text-align: center; }}
-                    .content {{ padding: 20px; }}
-                    .stat-box {{ 
-                        display: inline-block; 
-                        margin: 10px; 
-                        padding: 15px; 
-                        border: 1px solid #ddd; 
-                        border-radius: 5px; 
-                        text-align: center; 
-                        min-width: 150px;
-                    }}
-                    .stat-number {{ font-size: 24px; font-weight: bold; color: #007bff; }}
-                    .stat-label {{ font-size: 14px; color: #666; }}
-                    table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
-                    th, td {{ border: 1px solid #ddd; padding: 12px; text-align: left; }}
-                    th {{ background-color: #f4f4f4; }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h1>Monthly Parking Report</h1>
-                    <h3>{last_day_last_month.strftime("%B %Y")}</h3>
-                    <p>Hello {user.first_name} {user.last_name}!</p>
-                </div>
-                
-                <div class="content">
-                    <h2>Your Parking Summary</h2>
-                    
-                    <div class="stat-box">
-                        <div class="stat-number">{total_reservations}</div>
-                        <div class="stat-label">Total Reservations</div>
-                    </div>
-                    
-                    <div class="stat-box">
-                        <div class="stat-number">{completed_reservations}</div>
-                        <div class="stat-label">Completed Parkings</div>
-                    </div>
-                    
-                    <div class="stat-box">
-                        <div class="stat-number">${total_spent:.2f}</div>
-                        <div class="stat-label">Total Spent</div>
-                    </div>
-                    
-                    <div class="stat-box">
-                        <div class="stat-number">{total_duration:.1f}h</div>
-                        <div class="stat-label">Total Parking Time</div>
-                    </div>
-                    
-                    <h3>Most Used Parking Lot</h3>
-                    <p><strong>{most_used_lot[0]}</strong> ({most_used_lot[1]} times)</p>
-                    
-                    <h3>Recent Reservations</h3>
-                    <table>
-                        <tr>
-                            <th>Date</th>
-                            <th>Location</th>
-                            <th>Duration</th>
-                            <th>Cost</th>
-                            <th>Status</th>
-                        </tr>
-            """
-
-            for reservation in reservations[:10]:  # Show last 10 reservations
-                html_report += f"""
-                        <tr>
-                            <td>{reservation.created_at.strftime('%Y-%m-%d')}</td>
-                            <td>{reservation.parking_spot.parking_lot.prime_location_name}</td>
-                            <td>{reservation.get_duration_hours():.1f} hours</td>
-                            <td>${reservation.parking_cost or 0:.2f}</td>
-                            <td>{reservation.status.title()}</td>
-                        </tr>
-                """
-
-            html_report += """
-                    </table>
-                    
-                    <p style="margin-top: 30px; font-size: 12px; color: #666;">
-                        Thank you for using our parking service!<br>
-                        This is an automated report. Please do not reply to this email.
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-
-            # Send email
-            email_sent = send_email(
-                to_email=user.email,
-                subject=f"Your Parking Report - {last_day_last_month.strftime('%B %Y')}",
-                body=f"Please view this email in HTML format for the best experience.",
-                html_body=html_report,
-            )
+    Each chunk task records its outcome and timing in the cache, and
+    monthly_report_summary collects them once every chunk has run. With
+    resume=True only the chunks of `month` that have not completed are
+    dispatched again, so a failed run can be finished without re-sending
+    reports that already went out; chunks where only some emails failed
+    resend just those.
+    """
+    try:
+        from app import cache
 
-            print(f"Monthly report sent to {user.username}: {email_sent}")
+        month = month or report_month()
+        chunk_size = chunk_size or current_app.config.get(
+            "MONTHLY_REPORT_CHUNK_SIZE", 5000
+        )
+        chunks = report_chunks(chunk_size)
 
-        return f"Monthly reports sent to {len(users)} users"
+        # (first user id, last user id, only these user ids or None for all)
+        runs = [(first, last, None) for first, last in chunks]
+        if resume and chunks:
+            entries = cache.get_many(*[report_ledger_key(month, *c) for c in chunks])
+            runs = []
+            for (first, last), entry in zip(chunks, entries):
+                if entry and entry["status"] == "partial":
+                    # Resend only the reports whose email failed
+                    runs.append((first, last, entry["failed_user_ids"]))
+                elif not entry or entry["status"] != "done":
+                    runs.append((first, last, None))
+
+        if not runs:
+            return f"No monthly report chunks to run for {month}"
+
+        header = group(
+            monthly_report_chunk.s(month, first_user_id, last_user_id, only=only)
+            for first_user_id, last_user_id, only in runs
+        )
+        result = chord(header)(monthly_report_summary.s(month))
+        return f"Monthly reports for {month} dispatched in {len(runs)} chunks ({result.id})"
 
     except Exception as e:
-        print(f"Error in monthly_report task: {e}")
+        print(f"Error in dispatch_monthly_reports task: {e}")
         return f"Error: {str(e)}"
 
 
-def export_user_data_csv(user_id, email):
-    """Export user data to CSV and send via email"""
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def monthly_report_chunk(
+    month, first_user_id, last_user_id, batch_size=1000, only=None
+):
+    """Send the reports of users first_user_id..last_user_id.
+
+    Failures are returned rather than raised so the chord callback still
+    runs and can list the chunks to resume. A chunk where some emails
+    failed is recorded as partial, with the ids of those users; `only`
+    limits a resumed run to them.
+    """
+    started = time.perf_counter()
+    entry = {
+        "first_user_id": first_user_id,
+        "last_user_id": last_user_id,
+        "status": "done",
+    }
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return "User not found"
+        entry.update(
+            send_monthly_reports(
+                month,
+                users=(first_user_id, last_user_id),
+                batch_size=batch_size,
+                only=only,
+            )
+        )
+        if entry["failed"]:
+            entry["status"] = "partial"
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in monthly_report_chunk {first_user_id}-{last_user_id}: {e}")
+        entry.update(status="failed", error=str(e))
+    entry["seconds"] = round(time.perf_counter() - started, 3)
 
-        # Get all user reservations
-        reservations = (
-            Reservation.query.filter_by(user_id=user_id)
-            .order_by(Reservation.created_at.desc())
-            .all()
+    try:
+        from app import cache
+
+        cache.set(
+            report_ledger_key(month, first_user_id, last_user_id),
+            entry,
+            timeout=current_app.config.get("MONTHLY_REPORT_LEDGER_TIMEOUT", 0),
+        )
+    except Exception as e:
+        print(f"Could not record monthly report chunk: {e}")
+    return entry
+
+
+@shared_task
+def monthly_report_summary(results, month):
+    """Chord callback: totals, per-chunk timing and the chunks to resume"""
+    for entry in sorted(results, key=lambda entry: entry["first_user_id"]):
+        print(
+            f"Monthly report chunk {entry['first_user_id']}-{entry['last_user_id']}: "
+            f"{entry['status']}, {entry.get('reports', 0)} reports "
+            f"in {entry['seconds']:.2f}s"
+        )
+
+    failed = [
+        [entry["first_user_id"], entry["last_user_id"]]
+        for entry in results
+        if entry["status"] != "done"
+    ]
+    summary = {
+        "month": month,
+        "chunks": len(results),
+        "reports": sum(entry.get("reports", 0) for entry in results),
+        "failed_emails": sum(entry.get("failed", 0) for entry in results),
+        "failed_chunks": sorted(failed),
+        "seconds": round(sum(entry["seconds"] for entry in results), 3),
+        "slowest_chunk_seconds": max(entry["seconds"] for entry in results),
+    }
+    print(
+        f"Monthly reports for {month}: {summary['reports']} sent from "
+        f"{summary['chunks']} chunks in {summary['seconds']:.2f}s of worker time"
+    )
+    if failed:
+        print(
+            f"{len(failed)} chunks failed in whole or part; resume with "
+            f"dispatch_monthly_reports(month={month!r}, resume=True)"
+        )
+
+    try:
+        from app import cache
+
+        cache.set(
+            report_ledger_key(month, "summary"),
+            summary,
+            timeout=current_app.config.get("MONTHLY_REPORT_LEDGER_TIMEOUT", 0),
         )
+    except Exception as e:
+        print(f"Could not record monthly report summary: {e}")
+    return summary
+
+
+def send_monthly_reports(month, users=None, batch_size=1000, only=None):
+    """Render and send the reports of `month`, optionally for a user id range.
+
+    `only` restricts the run to those user ids, e.g. the failed ones of an
+    earlier run. The ids of users whose email failed are returned.
+    """
+    start, end = month_range(month)
+    month_label = start.strftime("%B %Y")
+    only = set(only) if only is not None else None
 
-        # Create CSV content
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Write header
-        writer.writerow(
-            [
-                "Reservation ID",
-                "Parking Lot",
-                "Spot Number",
-                "Vehicle Number",
-                "Reservation Date",
-                "Parking Start",
-                "Parking End",
-                "Duration (Hours)",
-                "Cost ($)",
-                "Status",
-                "Remarks",
-            ]
+    summaries = db.session.execute(
+        monthly_summary_query(start, end, users).execution_options(yield_per=batch_size)
+    )
+    recent = db.session.execute(
+        monthly_recent_query(start, end, users=users).execution_options(
+            yield_per=batch_size
         )
+    )
+
+    # Recipients in send order, to tell which user each result belongs to
+    recipients = []
+
+    def reports():
+        for summary, reservations in merge_by_user(summaries, recent):
+            if only is not None and summary.user_id not in only:
+                continue
+            recipients.append(summary.user_id)
+            yield {
+                "to_email": summary.email,
+                "subject": f"Your Parking Report - {month_label}",
+                "body": "Please view this email in HTML format for the best experience.",
+                "html_body": render_monthly_report(summary, reservations, month_label),
+            }
+
+    # Send emails, reusing one SMTP connection per batch
+    results = send_bulk_email(reports())
+    failed_user_ids = []
+    for user_id, (to_email, error) in zip(recipients, results):
+        print(f"Monthly report sent to {to_email}: {error is None}")
+        if error is not None:
+            failed_user_ids.append(user_id)
+
+    return {
+        "reports": len(results),
+        "failed": len(failed_user_ids),
+        "failed_user_ids": failed_user_ids,
+    }
+
+
+def report_month():
+    """Last month, formatted YYYY-MM"""
+    first_day_this_month = datetime.utcnow().replace(day=1)
+    return (first_day_this_month - timedelta(days=1)).strftime("%Y-%m")
+
 
-        # Write data
-        for reservation in reservations:
-            writer.writerow(
-                [
-                    reservation.id,
-                    reservation.parking_spot.parking_lot.prime_location_name,
-                    reservation.parking_spot.spot_number,
-                    reservation.vehicle_number or "",
-                    reservation.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+def month_range(month):
+    """[start, end) datetimes of a YYYY-MM month"""
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def report_chunks(chunk_size):
+    """Fixed-width user id ranges covering every user.
+
+    Ranges are aligned to multiples of chunk_size so that a resumed run
+    computes the same chunks as the run it continues.
+    """
+    low, high = db.session.query(func.min(User.id), func.max(User.id)).one()
+    if low is None:
+        return []
+    first = (low - 1) // chunk_size * chunk_size + 1
+    return [
+        (start, start + chunk_size - 1) for start in range(first, high + 1, chunk_size)
+    ]
+
+
+def report_ledger_key(month, *chunk):
+    """Cache key of a chunk's outcome, or of the run summary"""
+    return f"monthly-report:{month}:" + "-".join(map(str, chunk))
+
+
+def monthly_summary_query(start, end, users=None):
+    """Per-user totals and most used lot for reservations created in [start, end)
+
+    `users` optionally limits the report to a (first, last) user id range.
+    """
+    completed = Reservation.status == "completed"
+
+    # One grouped pass per (user, lot); window functions roll the groups up
+    # to user totals and rank the lots, so no second aggregate is joined in
+    uses = func.count(Reservation.id)
+    per_lot = (
+        db.select(
+            Reservation.user_id,
+            ParkingSpot.lot_id,
+            uses.label("uses"),
+            func.sum(uses)
+            .over(partition_by=Reservation.user_id)
+            .label("total_reservations"),
+            func.sum(func.count(Reservation.id).filter(completed))
+            .over(partition_by=Reservation.user_id)
+            .label("completed_reservations"),
+            func.sum(func.sum(Reservation.parking_cost).filter(completed))
+            .over(partition_by=Reservation.user_id)
+            .label("total_spent"),
+            func.sum(
+                func.sum(
                     (
-                        reservation.parking_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                        if reservation.parking_timestamp
-                        else ""
-                    ),
+                        func.julianday(Reservation.leaving_timestamp)
+                        - func.julianday(Reservation.parking_timestamp)
+                    )
+                    * 24
+                ).filter(completed)
+            )
+            .over(partition_by=Reservation.user_id)
+            .label("total_duration"),
+            func.row_number()
+            .over(
+                partition_by=Reservation.user_id,
+                order_by=(uses.desc(), ParkingSpot.lot_id),
+            )
+            .label("position"),
+        )
+        .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+        .where(*reservation_range(start, end, users))
+        .group_by(Reservation.user_id, ParkingSpot.lot_id)
+        .subquery()
+    )
+
+    return (
+        db.select(
+            User.id.label("user_id"),
+            User.username,
+            User.email,
+            User.first_name,
+            User.last_name,
+            per_lot.c.total_reservations,
+            per_lot.c.completed_reservations,
+            func.coalesce(per_lot.c.total_spent, 0).label("total_spent"),
+            func.coalesce(per_lot.c.total_duration, 0).label("total_duration"),
+            ParkingLot.prime_location_name.label("most_used_lot"),
+            per_lot.c.uses.label("most_used_lot_uses"),
+        )
+        .select_from(per_lot)
+        .join(User, User.id == per_lot.c.user_id)
+        .join(ParkingLot, ParkingLot.id == per_lot.c.lot_id)
+        .where(per_lot.c.position == 1, User.is_active == True)
+        .order_by(per_lot.c.user_id)
+    )
+
+
+def monthly_recent_query(start, end, per_user=10, users=None):
+    """Latest `per_user` reservations of every user created in [start, end)"""
+    ranked = (
+        db.select(
+            Reservation.user_id,
+            Reservation.created_at,
+            Reservation.parking_timestamp,
+            Reservation.leaving_timestamp,
+            Reservation.parking_cost,
+            Reservation.status,
+            ParkingLot.prime_location_name,
+            func.row_number()
+            .over(
+                partition_by=Reservation.user_id,
+                order_by=(Reservation.created_at.desc(), Reservation.id.desc()),
+            )
+            .label("position"),
+        )
+        .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+        .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
+        .where(*reservation_range(start, end, users))
+        .subquery()
+    )
+    return (
+        db.select(ranked)
+        .where(ranked.c.position <= per_user)
+        .order_by(ranked.c.user_id, ranked.c.position)
+    )
+
+
+def reservation_range(start, end, users=None):
+    """Filters for reservations created in [start, end), by a user id range"""
+    conditions = [Reservation.created_at >= start, Reservation.created_at < end]
+    if users is not None:
+        conditions.append(Reservation.user_id.between(*users))
+    return conditions
+
+
+def merge_by_user(summaries, rows):
+    """Pair each summary with its rows; both streams are ordered by user id"""
+    rows = iter(rows)
+    pending = next(rows, None)
+    for summary in summaries:
+        reservations = []
+        while pending is not None and pending.user_id <= summary.user_id:
+            if pending.user_id == summary.user_id:
+                reservations.append(pending)
+            pending = next(rows, None)
+        yield summary, reservations
+
+
+def render_monthly_report(summary, reservations, month_label):
+    """HTML body of one user's monthly report"""
+    html_report = f"""
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; margin: 20px; }}
+            .header {{ background-color: #f4f4f4; padding: 20px; text-align: center; }}
+            .content {{ padding: 20px; }}
+            .stat-box {{ 
+                display: inline-block; 
+                margin: 10px; 
+                padding: 15px; 
+                border: 1px solid #ddd; 
+                border-radius: 5px; 
+                text-align: center; 
+                min-width: 150px;
+            }}
+            .stat-number {{ font-size: 24px; font-weight: bold; color: #007bff; }}
+            .stat-label {{ font-size: 14px; color: #666; }}
+            table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
+            th, td {{ border: 1px solid #ddd; padding: 12px; text-align: left; }}
+            th {{ background-color: #f4f4f4; }}
+        </style>
+    </head>
+    <body>
+        <div class="header">
+            <h1>Monthly Parking Report</h1>
+            <h3>{month_label}</h3>
+            <p>Hello {summary.first_name} {summary.last_name}!</p>
+        </div>
+        
+        <div class="content">
+            <h2>Your Parking Summary</h2>
+            
+            <div class="stat-box">
+                <div class="stat-number">{summary.total_reservations}</div>
+                <div class="stat-label">Total Reservations</div>
+            </div>
+            
+            <div class="stat-box">
+                <div class="stat-number">{summary.completed_reservations}</div>
+                <div class="stat-label">Completed Parkings</div>
+            </div>
+            
+            <div class="stat-box">
+                <div class="stat-number">${summary.total_spent:.2f}</div>
+                <div class="stat-label">Total Spent</div>
+            </div>
+            
+            <div class="stat-box">
+                <div class="stat-number">{summary.total_duration:.1f}h</div>
+                <div class="stat-label">Total Parking Time</div>
+            </div>
+            
+            <h3>Most Used Parking Lot</h3>
+            <p><strong>{summary.most_used_lot}</strong> ({summary.most_used_lot_uses} times)</p>
+            
+            <h3>Recent Reservations</h3>
+            <table>
+                <tr>
+                    <th>Date</th>
+                    <th>Location</th>
+                    <th>Duration</th>
+                    <th>Cost</th>
+                    <th>Status</th>
+                </tr>
+    """
+
+    for reservation in reservations:
+        html_report += f"""
+                <tr>
+                    <td>{reservation.created_at.strftime('%Y-%m-%d')}</td>
+                    <td>{reservation.prime_location_name}</td>
+                    <td>{reservation_hours(reservation):.1f} hours</td>
+                    <td>${reservation.parking_cost or 0:.2f}</td>
+                    <td>{reservation.status.title()}</td>
+                </tr>
+        """
+
+    html_report += """
+            </table>
+            
+            <p style="margin-top: 30px; font-size: 12px; color: #666;">
+                Thank you for using our parking service!<br>
+                This is an automated report. Please do not reply to this email.
+            </p>
+        </div>
+    </body>
+    </html>
+    """
+
+    return html_report
+
+
+def reservation_hours(reservation):
+    """Parking duration in hours of a reservation row, running if still parked"""
+    if not reservation.parking_timestamp:
+        return 0
+    end = reservation.leaving_timestamp or datetime.utcnow()
+    return (end - reservation.parking_timestamp).total_seconds() / 3600
+
+
+@shared_task
+def export_user_data_csv(user_id, email):
+    """Export user data to a compressed CSV file and send it via email.
+
+    Files up to EXPORT_ATTACHMENT_MAX_BYTES are attached; larger ones are
+    sent as a signed download link valid for EXPORT_LINK_TTL seconds.
+    """
+    try:
+        user = db.session.get(User, user_id)
+        if not user:
+            return "User not found"
+
+        path, total = write_user_export(user_id)
+        generated = datetime.utcfromtimestamp(os.path.getmtime(path))
+        size = os.path.getsize(path)
+
+        attachments = None
+        if size <= current_app.config.get("EXPORT_ATTACHMENT_MAX_BYTES", 2 << 20):
+            with open(path, "rb") as export_file:
+                attachments = [
                     (
-                        reservation.leaving_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                        if reservation.leaving_timestamp
-                        else ""
-                    ),
-                    reservation.get_duration_hours(),
-                    reservation.parking_cost or 0,
-                    reservation.status,
-                    reservation.remarks or "",
+                        "my-parking-history.csv.gz",
+                        "application/gzip",
+                        export_file.read(),
+                    )
                 ]
+            delivery = "The compressed CSV file is attached to this email."
+            delivery_html = f"<p>{delivery}</p>"
+        else:
+            hours = current_app.config.get("EXPORT_LINK_TTL", 7200) // 3600
+            url = export_download_url(path, user_id)
+            delivery = f"Download it within {hours} hours from: {url}"
+            delivery_html = (
+                f'<p><a href="{url}">Download your export</a> '
+                f"(the link expires in {hours} hours).</p>"
             )
 
-        csv_content = output.getvalue()
-        output.close()
-
-        # Create HTML email with CSV attachment
+        # Create HTML email
         html_body = f"""
         <html>
         <body>
             <h2>Your Parking Data Export</h2>
             <p>Hello {user.first_name},</p>
             <p>Your parking data export is ready! The CSV file contains all your parking reservations and details.</p>
-            <p>Export generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC</p>
-            <p>Total reservations: {len(reservations)}</p>
+            {delivery_html}
+            <p>Export generated on: {generated.strftime('%Y-%m-%d %H:%M:%S')} UTC</p>
+            <p>Total reservations: {total}</p>
             <hr>
             <p style="font-size: 12px; color: #666;">
-                This is an automated export. Please save the attached file to your device.
+                This is an automated export. Please save the file to your device.
             </p>
         </body>
         </html>
         """
 
-        # For now, we'll send the CSV content in the email body
-        # In a production environment, you would attach the CSV file
         plain_body = f"""
 Your Parking Data Export
 
 Hello {user.first_name},
 
-Your parking data export is ready! Below is your parking history in CSV format:
+Your parking data export is ready! {delivery}
 
-{csv_content}
-
-Export generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
-Total reservations: {len(reservations)}
+Export generated on: {generated.strftime('%Y-%m-%d %H:%M:%S')} UTC
+Total reservations: {total}
         """
 
         # Send email
@@ -397,6 +806,7 @@ Total reservations: {len(reservations)}
             subject="Your Parking Data Export",
             body=plain_body,
             html_body=html_body,
+            attachments=attachments,
         )
 
         return f"CSV export sent to {email}: {email_sent}"
@@ -404,3 +814,261 @@ Total reservations: {len(reservations)}
     except Exception as e:
         print(f"Error in export_user_data_csv task: {e}")
         return f"Error: {str(e)}"
+
+
+def write_user_export(user_id):
+    """Write a user's reservations to a gzip CSV file; returns (path, rows).
+
+    Rows are streamed from a yield_per query straight into the file. The
+    file name carries a fingerprint of the user's reservations and of the
+    lots they were made at, so an export less than EXPORT_FILE_TTL seconds
+    old is reused as long as nothing it contains has changed. Older exports
+    are kept until their download links (EXPORT_LINK_TTL) have expired.
+    """
+    from api.analytics import csv_stream, export_rows, gzip_stream
+
+    total, last_id, last_update, last_lot_update = (
+        db.session.query(
+            func.count(Reservation.id),
+            func.max(Reservation.id),
+            func.max(Reservation.updated_at),
+            func.max(ParkingLot.updated_at),
+        )
+        .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+        .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
+        .filter(Reservation.user_id == user_id)
+        .one()
+    )
+    fingerprint = hashlib.sha1(
+        f"{total}:{last_id}:{last_update}:{last_lot_update}".encode()
+    )
+
+    folder = export_folder()
+    path = os.path.join(folder, f"user-{user_id}-{fingerprint.hexdigest()[:16]}.csv.gz")
+    ttl = current_app.config.get("EXPORT_FILE_TTL", 3600)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl:
+        return path, total
+
+    # Drop exports no link can reach any more; newer ones may be downloading
+    expired = time.time() - max(ttl, current_app.config.get("EXPORT_LINK_TTL", 7200))
+    for previous in glob.glob(os.path.join(folder, f"user-{user_id}-*.csv.gz")):
+        try:
+            if os.path.getmtime(previous) < expired:
+                os.remove(previous)
+        except FileNotFoundError:
+            pass
+
+    # Write under a unique temporary name and move it into place, so readers
+    # never see a partial file and a download in progress keeps its copy
+    handle, partial = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        with os.fdopen(handle, "wb") as export_file:
+            for chunk in gzip_stream(csv_stream(export_rows(user_id))):
+                export_file.write(chunk)
+        os.replace(partial, path)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    return path, total
+
+
+def export_folder():
+    folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "exports")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def export_serializer():
+    return URLSafeTimedSerializer(
+        current_app.config["SECRET_KEY"], salt="user-data-export"
+    )
+
+
+def export_download_url(path, user_id):
+    """Signed link to an export file, checked by the download endpoint"""
+    token = export_serializer().dumps({"file": os.path.basename(path), "user": user_id})
+    return (
+        f"{current_app.config['PUBLIC_BASE_URL']}/api/analytics/export/download/{token}"
+    )
+
+
+@shared_task
+def reconcile_spot_counters():
+    """Detect and repair drift in the denormalized per-lot spot counters"""
+    try:
+        counts = ParkingLot.spot_counts_query().subquery()
+        total = func.coalesce(counts.c.total_spots, 0)
+        available = func.coalesce(counts.c.available_spots, 0)
+        occupied = func.coalesce(counts.c.occupied_spots, 0)
+
+        # Lots whose stored counters disagree with parking_spots
+        drifted = (
+            db.session.query(
+                ParkingLot.id,
+                ParkingLot.total_spots,
+                ParkingLot.available_spots,
+                ParkingLot.occupied_spots,
+                total.label("actual_total"),
+                available.label("actual_available"),
+                occupied.label("actual_occupied"),
+            )
+            .outerjoin(counts, counts.c.lot_id == ParkingLot.id)
+            .filter(
+                or_(
+                    ParkingLot.total_spots != total,
+                    ParkingLot.available_spots != available,
+                    ParkingLot.occupied_spots != occupied,
+                )
+            )
+            .all()
+        )
+
+        for row in drifted:
+            print(
+                f"Spot counter drift on lot {row.id}: "
+                f"stored=({row.total_spots}, {row.available_spots}, {row.occupied_spots}), "
+                f"actual=({row.actual_total}, {row.actual_available}, {row.actual_occupied})"
+            )
+
+        if drifted:
+            # Recount inside the UPDATE itself so flips that commit between
+            # detection and repair are not overwritten with stale numbers
+            db.session.execute(
+                db.update(ParkingLot)
+                .where(ParkingLot.id.in_([row.id for row in drifted]))
+                .values(
+                    total_spots=_spot_count(),
+                    available_spots=_spot_count("A"),
+                    occupied_spots=_spot_count("O"),
+                )
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+        return f"Spot counters reconciled: {len(drifted)} lots repaired"
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in reconcile_spot_counters task: {e}")
+        return f"Error: {str(e)}"
+
+
+def _spot_count(status=None):
+    """Correlated COUNT of a lot's active spots, optionally by status"""
+    query = db.select(func.count(ParkingSpot.id)).where(
+        ParkingSpot.lot_id == ParkingLot.id, ParkingSpot.is_active == True
+    )
+    if status:
+        query = query.where(ParkingSpot.status == status)
+    return query.scalar_subquery()
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def backfill_user_activity():
+    """Fill users.last_reservation_at from the reservation history"""
+    try:
+        latest = (
+            db.select(func.max(Reservation.created_at))
+            .where(Reservation.user_id == User.id)
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            db.update(User).values(
+                last_reservation_at=latest, updated_at=User.updated_at
+            )
+        )
+        db.session.commit()
+        return f"Last reservation time refreshed for {result.rowcount} users"
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in backfill_user_activity task: {e}")
+        return f"Error: {str(e)}"
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def backfill_reservation_rollup(batch_size=5000):
+    """Rebuild reservation_hourly_rollup from the full reservation history"""
+    try:
+        db.session.execute(db.delete(ReservationHourlyRollup))
+
+        # Creations bucketed by created_at, completions by leaving_timestamp
+        created_hour = func.strftime("%Y-%m-%d %H:00:00", Reservation.created_at)
+        created = (
+            db.session.query(
+                ParkingSpot.lot_id,
+                created_hour.label("hour"),
+                func.count(Reservation.id).label("reservations"),
+            )
+            .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+            .filter(Reservation.created_at.isnot(None))
+            .group_by(ParkingSpot.lot_id, created_hour)
+        )
+
+        leaving_hour = func.strftime("%Y-%m-%d %H:00:00", Reservation.leaving_timestamp)
+        completed = (
+            db.session.query(
+                ParkingSpot.lot_id,
+                leaving_hour.label("hour"),
+                func.count(Reservation.id).label("completed"),
+                func.coalesce(func.sum(Reservation.parking_cost), 0).label("revenue"),
+                func.coalesce(
+                    func.sum(
+                        func.julianday(Reservation.leaving_timestamp)
+                        - func.julianday(Reservation.parking_timestamp)
+                    )
+                    * 86400,
+                    0,
+                ).label("parked_seconds"),
+            )
+            .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+            .filter(
+                Reservation.status == "completed",
+                Reservation.leaving_timestamp.isnot(None),
+                Reservation.parking_timestamp.isnot(None),
+            )
+            .group_by(ParkingSpot.lot_id, leaving_hour)
+        )
+
+        buckets = 0
+        for query, to_row in (
+            (
+                created,
+                lambda r: {"reservation_count": r.reservations},
+            ),
+            (
+                completed,
+                lambda r: {
+                    "completed_count": r.completed,
+                    "revenue": r.revenue,
+                    "parked_seconds": r.parked_seconds,
+                },
+            ),
+        ):
+            batch = []
+            for row in query.yield_per(batch_size):
+                entry = {
+                    "lot_id": row.lot_id,
+                    "hour_bucket": datetime.strptime(row.hour, "%Y-%m-%d %H:%M:%S"),
+                    "reservation_count": 0,
+                    "completed_count": 0,
+                    "revenue": 0.0,
+                    "parked_seconds": 0.0,
+                }
+                entry.update(to_row(row))
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    ReservationHourlyRollup.upsert(batch)
+                    buckets += len(batch)
+                    batch = []
+            if batch:
+                ReservationHourlyRollup.upsert(batch)
+                buckets += len(batch)
+
+        db.session.commit()
+        return f"Reservation rollup rebuilt from {buckets} hourly buckets"
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in backfill_reservation_rollup task: {e}")
+        return f"Error: {str(e)}"
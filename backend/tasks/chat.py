@@ -0,0 +1,111 @@
+"""
+Google Chat webhook delivery
+
+Messages are posted through one pooled requests.Session per app, with a
+timeout, retries with exponential backoff on 429 and 5xx responses, and a
+bounded thread pool so a batch of messages is posted concurrently rather
+than one round trip after another. Per-user notifications are coalesced
+into digest messages by the tasks that produce many of them.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying; anything else is a permanent failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Google Chat rejects text messages much longer than this
+MAX_MESSAGE_LENGTH = 4000
+
+
+class ChatDispatcher:
+    """Post messages to a webhook over pooled connections"""
+
+    def __init__(self, webhook_url, max_workers=8, retries=3, backoff=0.5, timeout=10):
+        self.webhook_url = webhook_url
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, text):
+        """Post one message, retrying transient failures; True on success"""
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2**attempt
+            try:
+                response = self.session.post(
+                    self.webhook_url, json={"text": text}, timeout=self.timeout
+                )
+                if response.status_code == 200:
+                    return True
+                if response.status_code not in RETRY_STATUSES:
+                    print(f"Google Chat rejected message: {response.status_code}")
+                    return False
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                error = f"status {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+
+            if attempt < self.retries:
+                time.sleep(delay)
+
+        print(f"Error sending Google Chat notification: {error}")
+        return False
+
+    def post_all(self, texts):
+        """Post messages concurrently; returns a success flag per message"""
+        texts = list(texts)
+        if len(texts) <= 1:
+            return [self.post(text) for text in texts]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(self.post, texts))
+
+
+def digests(title, lines, size=50):
+    """Group lines into messages of at most `size` lines under a title"""
+    messages = []
+    current = []
+    length = len(title)
+    for line in lines:
+        if current and (
+            len(current) == size or length + len(line) + 1 > MAX_MESSAGE_LENGTH
+        ):
+            messages.append("\n".join([title] + current))
+            current = []
+            length = len(title)
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        messages.append("\n".join([title] + current))
+    return messages
+
+
+def get_dispatcher():
+    """The current app's dispatcher, or None when no webhook is configured"""
+    config = current_app.config
+    webhook_url = config.get("GOOGLE_CHAT_WEBHOOK_URL")
+    if not webhook_url:
+        return None
+
+    dispatcher = current_app.extensions.get("chat_dispatcher")
+    if dispatcher is None or dispatcher.webhook_url != webhook_url:
+        dispatcher = ChatDispatcher(
+            webhook_url,
+            max_workers=config.get("GOOGLE_CHAT_MAX_WORKERS", 8),
+            retries=config.get("GOOGLE_CHAT_RETRIES", 3),
+            backoff=config.get("GOOGLE_CHAT_BACKOFF", 0.5),
+            timeout=config.get("GOOGLE_CHAT_TIMEOUT", 10),
+        )
+        current_app.extensions["chat_dispatcher"] = dispatcher
+    return dispatcher
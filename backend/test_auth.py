@@ -10,14 +10,26 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from models import db, User, Admin
-from app import create_app
+from app import create_app, create_default_admin
 
 
 def test_login():
     """Test user login functionality"""
-    app = create_app()
+    # In-memory database with the demo accounts, leaving instance/ untouched
+    app = create_app("testing")
 
     with app.app_context():
+        db.create_all()
+        create_default_admin(app)
+        demo_user = User(
+            username="john_doe",
+            email="john@example.com",
+            first_name="John",
+            last_name="Doe",
+        )
+        demo_user.set_password("user123")
+        db.session.add(demo_user)
+        db.session.commit()
         print("Testing user authentication...")
 
         # Test john_doe
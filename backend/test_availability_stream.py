@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the Server-Sent Events availability stream
+"""
+
+import json
+
+
+def read_event(chunks):
+    """Return (event, data) of the next SSE message, skipping keepalives"""
+    while True:
+        chunk = next(chunks)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith((":", "retry:")):
+            continue
+        lines = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+        return lines["event"], json.loads(lines["data"])
+
+
+def test_stream_sends_snapshot_then_spot_changes(app, client, seed, auth_headers):
+    from app.availability import broker
+
+    seed(lots=3, spots_per_lot=10, reservations=20)
+    response = client.get("/api/parking/availability/stream", buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+
+    event, snapshot = read_event(chunks)
+    assert event == "snapshot"
+    assert [lot["available_spots"] for lot in snapshot] == [10, 10, 10]
+
+    headers = auth_headers("user", 1)
+    reserved = client.post(
+        "/api/user/reservations",
+        json={"lot_id": 2, "vehicle_number": "KA-0001"},
+        headers=headers,
+    )
+    assert reserved.status_code == 201, reserved.get_json()
+    event, change = read_event(chunks)
+    assert event == "availability"
+    assert change["lot_id"] == 2
+    assert (change["available_spots"], change["occupied_spots"]) == (9, 1)
+
+    reservation_id = reserved.get_json()["reservation"]["id"]
+    client.post(f"/api/user/reservations/{reservation_id}/park", headers=headers)
+    client.post(f"/api/user/reservations/{reservation_id}/release", headers=headers)
+    event, change = read_event(chunks)
+    assert (change["lot_id"], change["available_spots"]) == (2, 10)
+
+    response.close()
+    assert not broker.subscribers
+
+
+def test_rolled_back_changes_are_not_published(app, seed):
+    from app.availability import broker
+    from models import db, ParkingLot
+
+    seed(lots=1, spots_per_lot=5, reservations=1)
+    subscriber = broker.subscribe()
+    try:
+        with app.app_context():
+            ParkingLot.adjust_spot_counters(1, available=-1, occupied=1)
+            db.session.rollback()
+            ParkingLot.adjust_spot_counters(1, available=-2, occupied=2)
+            db.session.commit()
+
+        assert subscriber.get_nowait() == {
+            "lot_id": 1,
+            "total_spots": 5,
+            "available_spots": 3,
+            "occupied_spots": 2,
+        }
+        assert subscriber.empty()
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def test_stream_ends_after_its_ttl(app, client, seed):
+    from app.availability import broker
+
+    seed(lots=1, spots_per_lot=5, reservations=1)
+    app.config["AVAILABILITY_STREAM_TTL"] = 0.2
+    app.config["AVAILABILITY_KEEPALIVE"] = 0.05
+
+    response = client.get("/api/parking/availability/stream", buffered=False)
+    chunks = [
+        chunk.decode() if isinstance(chunk, bytes) else chunk
+        for chunk in response.response
+    ]
+    response.close()
+
+    assert chunks[0] == "retry: 3000\n\n"
+    assert chunks[1].startswith("event: snapshot")
+    assert all(chunk == ": keepalive\n\n" for chunk in chunks[2:])
+    assert not broker.subscribers
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk email sender against a local SMTP sink
+"""
+
+import itertools
+import socket
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from config import config, TestingConfig
+
+
+class SinkHandler:
+    """Accept every message, remembering which connection delivered it"""
+
+    def __init__(self):
+        self.delivered = []
+        self.refuse = set()
+        self.drop_once = set()
+        self.sessions = itertools.count(1)
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        recipient = envelope.rcpt_tos[0]
+        if recipient in self.drop_once:
+            self.drop_once.discard(recipient)
+            server.transport.close()
+            return "421 Closing connection"
+        if not hasattr(session, "number"):
+            session.number = next(self.sessions)
+        self.delivered.append((session.number, recipient))
+        return "250 Message accepted"
+
+    @property
+    def connections(self):
+        return len({session for session, _ in self.delivered})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink():
+    handler = SinkHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+@pytest.fixture
+def mail_app(smtp_sink, tmp_path):
+    """App whose Flask-Mail extension really sends to the sink"""
+    from app import create_app
+
+    _, port = smtp_sink
+    config["pytest-mail"] = type(
+        "PytestMailConfig",
+        (TestingConfig,),
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'parking_test.db'}",
+            "MAIL_SERVER": "127.0.0.1",
+            "MAIL_PORT": port,
+            "MAIL_USE_TLS": False,
+            "MAIL_USERNAME": None,
+            "MAIL_SUPPRESS_SEND": False,
+            "MAIL_BATCH_SIZE": 25,
+        },
+    )
+    return create_app("pytest-mail")
+
+
+def messages(count, prefix="user"):
+    return [
+        {
+            "to_email": f"{prefix}_{n}@example.com",
+            "subject": "Parking Reminder - Book Your Spot!",
+            "body": f"Hi {n}! Need a spot? Book now!",
+        }
+        for n in range(count)
+    ]
+
+
+def test_batches_share_a_connection(mail_app, smtp_sink):
+    import tasks
+
+    handler, _ = smtp_sink
+    with mail_app.app_context():
+        started = time.perf_counter()
+        results = tasks.send_bulk_email(iter(messages(120)))
+        elapsed = time.perf_counter() - started
+
+    print(f"\nbulk: {120 / elapsed:.0f} messages/s")
+    assert [error for _, error in results] == [None] * 120
+    assert [to for _, to in handler.delivered] == [m["to_email"] for m in messages(120)]
+    assert handler.connections == 5
+
+
+def test_bulk_opens_one_connection_per_batch(mail_app, smtp_sink):
+    import tasks
+
+    handler, _ = smtp_sink
+    with mail_app.app_context():
+        started = time.perf_counter()
+        for message in messages(50, "single"):
+            assert tasks.send_email(**message)
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        tasks.send_bulk_email(messages(50, "bulk"), batch_size=50)
+        bulk = time.perf_counter() - started
+
+    print(f"\nsend_email: {50 / single:.0f} messages/s, bulk: {50 / bulk:.0f}")
+    assert handler.connections == 51
+
+
+def test_refused_recipient_is_reported_without_reconnecting(mail_app, smtp_sink):
+    import tasks
+
+    handler, _ = smtp_sink
+    handler.refuse.add("user_3@example.com")
+    with mail_app.app_context():
+        results = dict(tasks.send_bulk_email(messages(10)))
+
+    assert "550" in results.pop("user_3@example.com")
+    assert set(results.values()) == {None}
+    assert len(handler.delivered) == 9
+    assert handler.connections == 1
+
+
+def test_dropped_connection_is_reopened_and_message_retried(mail_app, smtp_sink):
+    import tasks
+
+    handler, _ = smtp_sink
+    handler.drop_once.add("user_4@example.com")
+    with mail_app.app_context():
+        results = tasks.send_bulk_email(messages(10))
+
+    assert [error for _, error in results] == [None] * 10
+    assert sorted(to for _, to in handler.delivered) == sorted(
+        m["to_email"] for m in messages(10)
+    )
+    assert handler.connections == 2
+
+
+def test_unreachable_server_fails_every_message(mail_app, smtp_sink):
+    import tasks
+
+    mail_app.extensions["mail"].port = free_port()
+    with mail_app.app_context():
+        results = tasks.send_bulk_email(messages(30))
+
+    assert len(results) == 30
+    assert all(error for _, error in results)
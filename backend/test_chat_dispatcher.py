@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for the Google Chat dispatcher against a local webhook stub
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tasks.chat import ChatDispatcher, digests
+
+
+class WebhookStub(ThreadingHTTPServer):
+    """Records posted messages; replies with queued statuses, then 200"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.messages = []
+        self.statuses = []
+        self.delay = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/webhook"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        stub = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with stub.lock:
+            stub.in_flight += 1
+            stub.peak = max(stub.peak, stub.in_flight)
+            stub.connections.add(self.client_address)
+            status = stub.statuses.pop(0) if stub.statuses else 200
+            if status == 200:
+                stub.messages.append(body["text"])
+        time.sleep(stub.delay)
+        with stub.lock:
+            stub.in_flight -= 1
+
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    stub = WebhookStub()
+    thread = threading.Thread(target=stub.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+def test_retries_throttled_and_failing_posts(webhook):
+    webhook.statuses = [429, 503]
+    dispatcher = ChatDispatcher(webhook.url, backoff=0.01)
+
+    assert dispatcher.post("hello")
+    assert webhook.messages == ["hello"]
+
+
+def test_gives_up_after_retries(webhook):
+    webhook.statuses = [500] * 3
+    dispatcher = ChatDispatcher(webhook.url, retries=2, backoff=0.01)
+
+    assert not dispatcher.post("hello")
+    assert webhook.messages == []
+
+
+def test_client_errors_are_not_retried(webhook):
+    webhook.statuses = [400, 200]
+    dispatcher = ChatDispatcher(webhook.url, backoff=0.01)
+
+    assert not dispatcher.post("hello")
+    assert webhook.statuses == [200]
+
+
+def test_posts_concurrently_over_pooled_connections(webhook):
+    webhook.delay = 0.05
+    dispatcher = ChatDispatcher(webhook.url, max_workers=4)
+
+    started = time.perf_counter()
+    results = dispatcher.post_all(f"message {n}" for n in range(16))
+    elapsed = time.perf_counter() - started
+
+    assert results == [True] * 16
+    assert sorted(webhook.messages) == sorted(f"message {n}" for n in range(16))
+    assert webhook.peak == 4
+    assert len(webhook.connections) <= 4
+    # 16 posts of 50 ms each, four at a time
+    assert elapsed < 16 * 0.05
+
+
+def test_digests_respect_line_and_length_limits():
+    lines = [f"- user_{n} (user_{n}@example.com)" for n in range(120)]
+
+    messages = digests("Daily Reminder:", lines, size=50)
+    assert [message.count("\n") for message in messages] == [50, 50, 20]
+    assert all(message.startswith("Daily Reminder:\n") for message in messages)
+
+    long_lines = ["x" * 1500] * 5
+    assert [m.count("\n") for m in digests("T", long_lines, size=50)] == [2, 2, 1]
+
+
+def test_daily_reminder_posts_one_digest_per_chunk(app, seed, webhook, monkeypatch):
+    import tasks
+
+    monkeypatch.setattr(
+        tasks,
+        "send_bulk_email",
+        lambda messages, **kwargs: [(m["to_email"], None) for m in messages],
+    )
+    app.config["GOOGLE_CHAT_WEBHOOK_URL"] = webhook.url
+    app.config["GOOGLE_CHAT_DIGEST_SIZE"] = 10
+
+    seed(users=30, reservations=1)
+    with app.app_context():
+        result = tasks.daily_reminder(batch_size=20)
+
+    reminded = int(result.split()[-2])
+    assert reminded >= 29
+    lines = [line for text in webhook.messages for line in text.splitlines()[1:]]
+    assert len(lines) == reminded
+    # Chunks of 20 and the remainder, each split into digests of 10 lines
+    assert len(webhook.messages) == 3
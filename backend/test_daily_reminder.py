@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental daily reminder job
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, User
+from test_query_plans import capture_statements
+
+
+@pytest.fixture
+def reminded(monkeypatch):
+    import tasks
+
+    sent = []
+
+    def send_bulk_email(messages, batch_size=None, retries=1):
+        results = [(message["to_email"], None) for message in messages]
+        sent.extend(to_email for to_email, _ in results)
+        return results
+
+    monkeypatch.setattr(tasks, "send_bulk_email", send_bulk_email)
+    return sent
+
+
+def idle_users():
+    """Emails of active users without a reservation in the last 7 days"""
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    return {
+        user.email
+        for user in User.query.filter_by(is_active=True)
+        if not any(r.created_at >= week_ago for r in user.reservations)
+    }
+
+
+def test_idle_users_are_reminded_once(app, seed, reminded):
+    import tasks
+
+    seed(users=40, reservations=60)
+    with app.app_context():
+        expected = idle_users()
+        first = tasks.daily_reminder(batch_size=7)
+        second = tasks.daily_reminder(batch_size=7)
+
+    assert expected
+    assert sorted(reminded) == sorted(expected)
+    assert first == f"Daily reminders sent to {len(expected)} users"
+    assert second == "Daily reminders sent to 0 users"
+
+
+def test_inactive_users_are_skipped(app, seed, reminded):
+    import tasks
+
+    seed(users=10, reservations=1)
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == 4).values(is_active=False))
+        db.session.commit()
+        tasks.daily_reminder()
+
+    assert "user_4@example.com" not in reminded
+    assert len(reminded) == 9
+
+
+def test_new_reservation_resets_eligibility(app, client, seed, auth_headers, reminded):
+    import tasks
+
+    seed(users=10, reservations=1)
+    with app.app_context():
+        tasks.daily_reminder()
+    reminded.clear()
+
+    response = client.post(
+        "/api/user/reservations",
+        json={"lot_id": 1, "vehicle_number": "KA-0001"},
+        headers=auth_headers("user", 2),
+    )
+    assert response.status_code == 201, response.get_json()
+
+    with app.app_context():
+        user = db.session.get(User, 2)
+        assert user.last_reminded_at is None
+        assert user.last_reservation_at is not None
+
+        # Once the booking is a week old the user is due again, exactly once
+        user.last_reservation_at = datetime.utcnow() - timedelta(days=8)
+        db.session.commit()
+        tasks.daily_reminder()
+        tasks.daily_reminder()
+
+    assert reminded == ["user_2@example.com"]
+
+
+def test_due_users_are_read_in_chunks(app, seed, reminded):
+    import tasks
+
+    seed(users=25, reservations=1)
+    with app.app_context():
+        engine = db.engine
+        with capture_statements(engine) as captured:
+            tasks.daily_reminder(batch_size=10)
+
+    due_reads = [sql for sql, _ in captured if "FROM users" in sql]
+    assert len(reminded) >= 24
+    assert len(due_reads) == 4
+
+
+def test_failed_sends_stay_due(app, seed, monkeypatch):
+    import tasks
+
+    attempts = []
+
+    def send_bulk_email(messages, batch_size=None, retries=1):
+        attempts.extend(message["to_email"] for message in messages)
+        return [
+            (
+                message["to_email"],
+                "refused" if message["to_email"] == "user_3@example.com" else None,
+            )
+            for message in messages
+        ]
+
+    monkeypatch.setattr(tasks, "send_bulk_email", send_bulk_email)
+    seed(users=10, reservations=1)
+    with app.app_context():
+        expected = idle_users()
+        first = tasks.daily_reminder(batch_size=4)
+
+        assert db.session.get(User, 3).last_reminded_at is None
+        assert sorted(attempts) == sorted(expected)
+        assert first == (
+            f"Daily reminders sent to {len(expected) - 1} users, "
+            "1 failed and stay due"
+        )
+
+        attempts.clear()
+        tasks.daily_reminder(batch_size=4)
+
+    assert attempts == ["user_3@example.com"]
+
+
+def test_run_stops_when_nothing_is_sent(app, seed, monkeypatch):
+    import tasks
+
+    attempts = []
+
+    def send_bulk_email(messages, batch_size=None, retries=1):
+        attempts.extend(message["to_email"] for message in messages)
+        return [(message["to_email"], "connection refused") for message in messages]
+
+    monkeypatch.setattr(tasks, "send_bulk_email", send_bulk_email)
+    seed(users=10, reservations=1)
+    with app.app_context():
+        result = tasks.daily_reminder(batch_size=4)
+
+        assert User.query.filter(User.last_reminded_at.isnot(None)).count() == 0
+
+    assert len(attempts) == 4
+    assert result == "Daily reminders sent to 0 users, 4 failed and stay due"
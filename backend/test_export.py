@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming user data export
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+from models import db
+from test_query_plans import capture_statements
+
+EXPORT = "/api/analytics/export/user-data"
+
+
+def exported_json(client, headers):
+    response = client.get(EXPORT, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["export_data"]
+
+
+def test_csv_stream_matches_json_export(client, seed, auth_headers):
+    seed(users=5, reservations=3000)
+    headers = auth_headers("user", 1)
+
+    response = client.get(f"{EXPORT}?format=csv", headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.is_streamed
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    expected = exported_json(client, headers)
+    assert len(rows) == len(expected) > 500
+    assert rows[0] == {key: str(value) for key, value in expected[0].items()}
+
+
+def test_ndjson_stream_with_gzip(client, seed, auth_headers):
+    seed(users=5, reservations=300)
+    headers = auth_headers("user", 2)
+
+    response = client.get(f"{EXPORT}?format=ndjson&gzip=1", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(line) for line in lines] == exported_json(client, headers)
+
+
+@pytest.mark.parametrize("reservations", [100, 2000])
+def test_stream_reads_rows_in_one_query(app, client, seed, auth_headers, reservations):
+    seed(users=2, reservations=reservations)
+
+    with app.app_context():
+        engine = db.engine
+    with capture_statements(engine) as captured:
+        response = client.get(f"{EXPORT}?format=csv", headers=auth_headers("user", 1))
+        response.get_data()
+
+    assert len(captured) == 1
+
+
+def test_unknown_format_is_rejected(client, auth_headers):
+    response = client.get(f"{EXPORT}?format=xlsx", headers=auth_headers("user", 1))
+
+    assert response.status_code == 400
+
+
+JOBS = "/api/analytics/export/user-data/jobs"
+
+
+def test_export_job_is_queued_and_pollable(app, client, seed, auth_headers):
+    seed(users=3, reservations=50)
+    headers = auth_headers("user", 1)
+
+    response = client.post(JOBS, headers=headers)
+    assert response.status_code == 202, response.get_json()
+    job = response.get_json()
+    assert job["status_url"] == f"{JOBS}/{job['task_id']}"
+
+    status = client.get(job["status_url"], headers=headers).get_json()
+    assert status["state"] == "SUCCESS"
+    assert status["result"] == "CSV export sent to user_1@example.com: True"
+
+    # Only the user who queued the job can see it
+    other = client.get(job["status_url"], headers=auth_headers("user", 2))
+    assert other.status_code == 404
+
+
+def test_jobs_are_routed_by_latency_class(app):
+    from app import get_celery
+
+    celery = get_celery(app)
+
+    def queue(name):
+        return celery.amqp.router.route({}, name)["queue"].name
+
+    assert queue("tasks.export_user_data_csv") == "interactive"
+    assert queue("tasks.daily_reminder") == "notifications"
+    assert queue("tasks.monthly_report_chunk") == "bulk"
+    assert celery.tasks["tasks.monthly_report_chunk"].acks_late
+    assert not celery.tasks["tasks.export_user_data_csv"].acks_late
+
+
+def run_export(app, user_id=1):
+    import tasks
+    from app import mail
+
+    with app.app_context():
+        with mail.record_messages() as outbox:
+            result = tasks.export_user_data_csv(user_id, f"user_{user_id}@example.com")
+    assert result == f"CSV export sent to user_{user_id}@example.com: True"
+    return outbox[0]
+
+
+def export_files(app):
+    return sorted((Path(app.config["UPLOAD_FOLDER"]) / "exports").iterdir())
+
+
+def test_export_file_is_attached_compressed(app, client, seed, auth_headers):
+    seed(users=3, reservations=600)
+    message = run_export(app)
+
+    (attachment,) = message.attachments
+    assert attachment.content_type == "application/gzip"
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(attachment.data).decode())))
+    assert rows == [
+        {key: str(value) for key, value in row.items()}
+        for row in exported_json(client, auth_headers("user", 1))
+    ]
+    assert f"Total reservations: {len(rows)}" in message.body
+    assert rows[0]["spot_number"] not in message.body
+
+    (path,) = export_files(app)
+    assert path.read_bytes() == attachment.data
+
+
+def test_unchanged_export_is_reused(app, client, seed, auth_headers):
+    seed(users=3, reservations=100)
+    run_export(app)
+    (first,) = export_files(app)
+    written = first.stat().st_mtime_ns
+
+    run_export(app)
+    assert export_files(app) == [first]
+    assert first.stat().st_mtime_ns == written
+
+    client.post(
+        "/api/user/reservations",
+        json={"lot_id": 1, "vehicle_number": "KA-0001"},
+        headers=auth_headers("user", 1),
+    )
+    run_export(app)
+    # The first export stays for links already sent until they expire
+    (second,) = set(export_files(app)) - {first}
+    assert first.exists()
+
+
+def test_lot_changes_invalidate_the_export(app, seed):
+    from models import ParkingLot
+
+    seed(users=3, reservations=100)
+    run_export(app)
+    (first,) = export_files(app)
+
+    with app.app_context():
+        for lot in ParkingLot.query:
+            lot.prime_location_name = f"Renamed {lot.id}"
+        db.session.commit()
+    message = run_export(app)
+
+    (second,) = set(export_files(app)) - {first}
+    (attachment,) = message.attachments
+    assert b"Renamed" in gzip.decompress(attachment.data)
+
+
+def test_exports_past_their_link_lifetime_are_removed(app, client, seed, auth_headers):
+    seed(users=3, reservations=100)
+    run_export(app)
+    (first,) = export_files(app)
+    expired = time.time() - app.config["EXPORT_LINK_TTL"] - 60
+    os.utime(first, (expired, expired))
+
+    client.post(
+        "/api/user/reservations",
+        json={"lot_id": 1, "vehicle_number": "KA-0001"},
+        headers=auth_headers("user", 1),
+    )
+    run_export(app)
+
+    (second,) = export_files(app)
+    assert second != first
+
+
+def test_large_export_is_sent_as_signed_link(app, client, seed):
+    seed(users=3, reservations=100)
+    app.config["EXPORT_ATTACHMENT_MAX_BYTES"] = 0
+    message = run_export(app)
+
+    assert not message.attachments
+    url = re.search(r"http://\S+/api/analytics/export/download/\S+", message.body)[0]
+    path = url.split("localhost:5000", 1)[1]
+
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.mimetype == "application/gzip"
+    (export,) = export_files(app)
+    assert response.data == export.read_bytes()
+
+    assert client.get(path[:-2] + "xx").status_code == 404
+    app.config["EXPORT_LINK_TTL"] = -1
+    assert client.get(path).status_code == 410
+
+
+def test_failed_export_leaves_no_partial_file(app, seed, monkeypatch):
+    import api.analytics
+    import tasks
+
+    def broken_rows(user_id, batch_size=1000):
+        yield from ()
+        raise OSError("No space left on device")
+
+    seed(users=3, reservations=10)
+    monkeypatch.setattr(api.analytics, "export_rows", broken_rows)
+    with app.app_context():
+        with pytest.raises(OSError):
+            tasks.write_user_export(1)
+
+    assert export_files(app) == []
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Tests for the set-based monthly report job
+"""
+
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Reservation, User
+from test_query_plans import capture_statements
+
+
+def last_month():
+    first_this = datetime.utcnow().replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    return (first_this - timedelta(days=1)).replace(day=1), first_this
+
+
+def expected_reports():
+    """Per-user report figures computed the slow way, from ORM objects"""
+    start, end = last_month()
+    expected = {}
+    for user in User.query.filter_by(is_active=True):
+        reservations = Reservation.query.filter(
+            Reservation.user_id == user.id,
+            Reservation.created_at >= start,
+            Reservation.created_at < end,
+        ).all()
+        if not reservations:
+            continue
+        completed = [r for r in reservations if r.status == "completed"]
+        lots = Counter(r.parking_spot.lot_id for r in reservations)
+        best = min(lots.items(), key=lambda item: (-item[1], item[0]))
+        expected[user.email] = {
+            "total": len(reservations),
+            "completed": len(completed),
+            "spent": round(sum(r.parking_cost or 0 for r in completed), 2),
+            "hours": sum(
+                (r.leaving_timestamp - r.parking_timestamp).total_seconds()
+                for r in completed
+            )
+            / 3600,
+            "lot": f"Lot {best[0]}",
+            "uses": best[1],
+            "rows": min(len(reservations), 10),
+        }
+    return expected
+
+
+@pytest.fixture
+def celery_app(app):
+    """Celery bound to the test app, running chords eagerly in-process"""
+    from celery import _state
+
+    from config.celery_config import make_celery
+
+    previous = _state.get_current_app()
+    app.config.update(
+        CELERY_BROKER_URL="memory://", CELERY_RESULT_BACKEND="cache+memory://"
+    )
+    yield make_celery(app)
+    previous.set_current()
+
+
+@pytest.fixture
+def sent_reports(monkeypatch):
+    import tasks
+
+    sent = {}
+
+    def send_bulk_email(messages, batch_size=None, retries=1):
+        results = []
+        for message in messages:
+            sent[message["to_email"]] = message["html_body"]
+            results.append((message["to_email"], None))
+        return results
+
+    monkeypatch.setattr(tasks, "send_bulk_email", send_bulk_email)
+    return sent
+
+
+def test_reports_match_per_user_figures(app, seed, sent_reports):
+    import tasks
+
+    seed(users=30, reservations=1500)
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == 3).values(is_active=False))
+        db.session.commit()
+        expected = expected_reports()
+        result = tasks.monthly_report()
+
+    assert result == f"Monthly reports sent to {len(expected)} users"
+    assert set(sent_reports) == set(expected)
+    for email, figures in expected.items():
+        html = sent_reports[email]
+        assert f'<div class="stat-number">{figures["total"]}</div>' in html
+        assert f'<div class="stat-number">{figures["completed"]}</div>' in html
+        assert f'${figures["spent"]:.2f}</div>' in html
+        hours = re.search(r"([\d.]+)h</div>", html).group(1)
+        assert float(hours) == pytest.approx(figures["hours"], abs=0.051)
+        assert f'<strong>{figures["lot"]}</strong> ({figures["uses"]} times)' in html
+        assert html.count("<td>$") == figures["rows"]
+
+
+@pytest.mark.parametrize("users", [10, 200])
+def test_report_query_count_does_not_grow_with_users(app, seed, sent_reports, users):
+    import tasks
+
+    seed(users=users, reservations=users * 20)
+    with app.app_context():
+        engine = db.engine
+        with capture_statements(engine) as captured:
+            tasks.monthly_report()
+
+    assert len(captured) == 2
+
+
+def ledger(month, *chunk):
+    from app import cache
+
+    return cache.get(f"monthly-report:{month}:" + "-".join(map(str, chunk)))
+
+
+def test_fan_out_matches_single_process_reports(app, seed, celery_app, sent_reports):
+    import tasks
+
+    seed(users=30, reservations=1500)
+    with app.app_context():
+        expected = expected_reports()
+        month = tasks.report_month()
+        result = tasks.dispatch_monthly_reports.delay(month, chunk_size=7).get()
+
+        assert result.startswith(f"Monthly reports for {month} dispatched in 5 chunks")
+        summary = ledger(month, "summary")
+        chunks = [ledger(month, first, first + 6) for first in range(1, 30, 7)]
+
+    assert set(sent_reports) == set(expected)
+    assert summary["reports"] == len(expected)
+    assert summary["chunks"] == 5
+    assert summary["failed_chunks"] == []
+    assert [chunk["status"] for chunk in chunks] == ["done"] * 5
+    assert sum(chunk["reports"] for chunk in chunks) == len(expected)
+    assert all(chunk["seconds"] >= 0 for chunk in chunks)
+
+
+def test_failed_chunks_are_resumed(app, seed, celery_app, sent_reports, monkeypatch):
+    import tasks
+
+    working = tasks.send_bulk_email
+
+    def flaky(messages, **kwargs):
+        messages = list(messages)
+        if any(m["to_email"] == "user_10@example.com" for m in messages):
+            raise ConnectionError("SMTP server unavailable")
+        return working(messages, **kwargs)
+
+    seed(users=30, reservations=1500)
+    with app.app_context():
+        expected = expected_reports()
+        month = tasks.report_month()
+
+        monkeypatch.setattr(tasks, "send_bulk_email", flaky)
+        tasks.dispatch_monthly_reports.delay(month, chunk_size=7).get()
+        assert ledger(month, "summary")["failed_chunks"] == [[8, 14]]
+        assert ledger(month, 8, 14)["error"] == "SMTP server unavailable"
+        first_run = set(sent_reports)
+
+        monkeypatch.setattr(tasks, "send_bulk_email", working)
+        sent_reports.clear()
+        result = tasks.dispatch_monthly_reports.delay(
+            month, chunk_size=7, resume=True
+        ).get()
+
+        assert "dispatched in 1 chunks" in result
+        assert ledger(month, 8, 14)["status"] == "done"
+        assert (
+            tasks.dispatch_monthly_reports(month, chunk_size=7, resume=True)
+            == f"No monthly report chunks to run for {month}"
+        )
+
+    resumed = {f"user_{n}@example.com" for n in range(8, 15)} & set(expected)
+    assert set(sent_reports) == resumed
+    assert first_run | resumed == set(expected)
+
+
+def test_failed_emails_are_resent_on_resume(
+    app, seed, celery_app, sent_reports, monkeypatch
+):
+    import tasks
+
+    working = tasks.send_bulk_email
+
+    def refusing(messages, **kwargs):
+        results = working(messages, **kwargs)
+        return [
+            (
+                to_email,
+                "550 mailbox full" if to_email == "user_10@example.com" else None,
+            )
+            for to_email, _ in results
+        ]
+
+    seed(users=30, reservations=1500)
+    with app.app_context():
+        month = tasks.report_month()
+        assert "user_10@example.com" in expected_reports()
+
+        monkeypatch.setattr(tasks, "send_bulk_email", refusing)
+        tasks.dispatch_monthly_reports.delay(month, chunk_size=7).get()
+        chunk = ledger(month, 8, 14)
+        assert (chunk["status"], chunk["failed_user_ids"]) == ("partial", [10])
+        assert ledger(month, "summary")["failed_chunks"] == [[8, 14]]
+
+        monkeypatch.setattr(tasks, "send_bulk_email", working)
+        sent_reports.clear()
+        result = tasks.dispatch_monthly_reports.delay(
+            month, chunk_size=7, resume=True
+        ).get()
+
+        assert "dispatched in 1 chunks" in result
+        assert ledger(month, 8, 14)["status"] == "done"
+
+    assert set(sent_reports) == {"user_10@example.com"}
+
+
+def test_beat_schedules_registered_tasks(celery_app):
+    import tasks  # noqa: F401 - registers the shared tasks
+
+    schedule = celery_app.conf.beat_schedule
+    assert {entry["task"] for entry in schedule.values()} == {
+        "tasks.daily_reminder",
+        "tasks.dispatch_monthly_reports",
+        "tasks.reconcile_spot_counters",
+    }
+    for entry in schedule.values():
+        assert entry["task"] in celery_app.tasks
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for keyset (cursor) pagination of the listing endpoints
+"""
+
+import pytest
+
+from models import db, Reservation, User
+from test_query_plans import capture_statements
+
+LISTINGS = [
+    ("admin", "/api/admin/reservations", "reservations"),
+    ("admin", "/api/admin/reservations?status=completed", "reservations"),
+    ("user", "/api/user/reservations", "reservations"),
+    ("admin", "/api/admin/users", "users"),
+]
+
+
+def walk_cursor_pages(client, path, key, headers, per_page):
+    """Follow next_cursor from the first page to the end, returning all ids"""
+    separator = "&" if "?" in path else "?"
+    ids, cursor = [], ""
+    while cursor is not None:
+        response = client.get(
+            f"{path}{separator}per_page={per_page}&after={cursor}", headers=headers
+        )
+        assert response.status_code == 200, response.get_json()
+        data = response.get_json()
+        assert "total" not in data
+        ids += [item["id"] for item in data[key]]
+        cursor = data["next_cursor"]
+    return ids
+
+
+@pytest.mark.parametrize("user_type,path,key", LISTINGS)
+def test_cursor_pages_cover_the_listing_once_in_order(
+    app, client, seed, auth_headers, user_type, path, key
+):
+    seed(users=40, reservations=300)
+    headers = auth_headers(user_type, 1)
+
+    ids = walk_cursor_pages(client, path, key, headers, per_page=7)
+
+    with app.app_context():
+        model = Reservation if key == "reservations" else User
+        query = model.query
+        if "status=completed" in path:
+            query = query.filter_by(status="completed")
+        if user_type == "user":
+            query = query.filter_by(user_id=1)
+        expected = [
+            row.id for row in query.order_by(model.created_at.desc(), model.id.desc())
+        ]
+    assert ids == expected
+    assert len(ids) > 7
+
+
+@pytest.mark.parametrize("user_type,path,key", LISTINGS)
+def test_cursor_pages_report_the_clamped_page_size(
+    client, seed, auth_headers, user_type, path, key
+):
+    seed(users=150, reservations=300)
+    separator = "&" if "?" in path else "?"
+
+    response = client.get(
+        f"{path}{separator}per_page=1000&after=", headers=auth_headers(user_type, 1)
+    )
+    data = response.get_json()
+
+    assert data["per_page"] == 100
+    assert len(data[key]) <= 100
+
+
+def test_cursor_pages_do_not_count_or_sort(app, client, seed, auth_headers):
+    seed(reservations=300)
+    headers = auth_headers("admin")
+    first = client.get("/api/admin/reservations?after=", headers=headers).get_json()
+
+    with app.app_context():
+        engine = db.engine
+    with capture_statements(engine) as captured:
+        response = client.get(
+            f"/api/admin/reservations?after={first['next_cursor']}", headers=headers
+        )
+    assert response.status_code == 200
+
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            assert "count(" not in statement.lower()
+            plan = conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).fetchall()
+            assert not any("TEMP B-TREE" in row[-1] for row in plan), plan
+
+
+def test_offset_mode_is_unchanged(client, seed, auth_headers):
+    seed(reservations=50)
+    data = client.get(
+        "/api/admin/reservations?page=2&per_page=20", headers=auth_headers("admin")
+    ).get_json()
+
+    assert (data["total"], data["pages"], data["current_page"]) == (50, 3, 2)
+    assert len(data["reservations"]) == 20
+
+
+def test_invalid_cursor_is_rejected(client, seed, auth_headers):
+    seed(reservations=10)
+    response = client.get(
+        "/api/admin/reservations?after=not-a-cursor", headers=auth_headers("admin")
+    )
+
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.get_json()["error"]
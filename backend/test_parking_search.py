@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests for the indexed parking lot search
+"""
+
+import pytest
+
+from models import db, ParkingLot
+from test_query_plans import capture_statements
+
+LOTS = [
+    ("Central Market Parking", "12 Market Street, Downtown", "560001"),
+    ("Airport Terminal 2", "Kempegowda Airport Road", "560300"),
+    ("Café Plaza", "7 Marketplace Lane", "560042"),
+    ("Stadium East", "1 Stadium Road", "411001"),
+]
+
+
+@pytest.fixture
+def lots(app):
+    with app.app_context():
+        for name, address, pin_code in LOTS:
+            db.session.add(
+                ParkingLot(
+                    prime_location_name=name,
+                    address=address,
+                    pin_code=pin_code,
+                    number_of_spots=10,
+                    price_per_hour=2.0,
+                )
+            )
+        db.session.commit()
+
+
+def search(client, text):
+    response = client.get("/api/parking/search", query_string={"q": text})
+    assert response.status_code == 200, response.get_json()
+    return [lot["prime_location_name"] for lot in response.get_json()["results"]]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        # Word prefixes, any column, any order
+        ("market", {"Central Market Parking", "Café Plaza"}),
+        ("air term", {"Airport Terminal 2"}),
+        ("5600", {"Central Market Parking", "Café Plaza"}),
+        # Diacritics are folded
+        ("cafe", {"Café Plaza"}),
+        # Substrings inside words fall back to the trigram index
+        ("tadiu", {"Stadium East"}),
+        ("ketpl", {"Café Plaza"}),
+        ("nowhere", set()),
+    ],
+)
+def test_search_matches(client, lots, text, expected):
+    assert set(search(client, text)) == expected
+
+
+def test_word_matches_rank_before_substring_matches(app, client, lots):
+    with app.app_context():
+        db.session.add(
+            ParkingLot(
+                prime_location_name="Northeast Deck",
+                address="4 Ring Road",
+                pin_code="560099",
+            )
+        )
+        db.session.commit()
+
+    assert search(client, "market")[0] == "Central Market Parking"
+    assert search(client, "east") == ["Stadium East", "Northeast Deck"]
+
+
+def test_index_follows_lot_changes(app, client, lots):
+    with app.app_context():
+        lot = ParkingLot.query.filter_by(prime_location_name="Stadium East").one()
+        lot.prime_location_name = "Riverside Arena"
+        db.session.commit()
+
+    assert search(client, "stadium east") == []
+    assert search(client, "riverside") == ["Riverside Arena"]
+
+    with app.app_context():
+        db.session.delete(ParkingLot.query.filter_by(pin_code="411001").one())
+        db.session.commit()
+
+    assert search(client, "arena") == []
+
+
+def test_rebuild_indexes_existing_rows(app, client, lots):
+    with app.app_context():
+        for index in ("parking_lots_fts", "parking_lots_trigram"):
+            db.session.execute(
+                db.text(f"INSERT INTO {index}({index}) VALUES ('delete-all')")
+            )
+        db.session.commit()
+    assert search(client, "airport") == []
+
+    with app.app_context():
+        ParkingLot.rebuild_search_index()
+        db.session.commit()
+    assert search(client, "airport") == ["Airport Terminal 2"]
+
+
+def test_search_does_not_scan_lots(app, client, lots):
+    with app.app_context():
+        engine = db.engine
+    with capture_statements(engine) as captured:
+        search(client, "market")
+
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            plan = conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).fetchall()
+            assert not any(row[-1] == "SCAN parking_lots" for row in plan), plan
+
+
+@pytest.fixture
+def priced_lots(app):
+    """Lots with distinct prices and availability: (name, price, available)"""
+    with app.app_context():
+        for n, (price, available) in enumerate(
+            [(4.0, 10), (2.0, 3), (6.0, 25), (3.0, 0), (5.0, 12)], start=1
+        ):
+            db.session.add(
+                ParkingLot(
+                    prime_location_name=f"Harbour Lot {n}",
+                    address=f"{n} Dock Road",
+                    pin_code="600001",
+                    price_per_hour=price,
+                    total_spots=30,
+                    available_spots=available,
+                    occupied_spots=30 - available,
+                )
+            )
+        db.session.add(
+            ParkingLot(
+                prime_location_name="Closed Harbour Lot",
+                address="9 Dock Road",
+                pin_code="600001",
+                price_per_hour=1.0,
+                is_active=False,
+            )
+        )
+        db.session.commit()
+
+
+def search_page(client, **params):
+    response = client.get("/api/parking/search", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()
+    return [lot["prime_location_name"][-1] for lot in data["results"]], data
+
+
+def test_filters_and_sorting_run_in_sql(client, priced_lots):
+    names, data = search_page(client, q="harbour", min_spots=5, sort="price")
+    assert names == ["1", "5", "3"]
+    assert data["total_found"] == 3
+
+    names, _ = search_page(client, max_price=5, sort="availability")
+    assert names == ["5", "1", "2", "4"]
+
+
+def test_limit_and_offset_report_the_full_total(client, priced_lots):
+    names, data = search_page(client, sort="price", limit=2, offset=2)
+
+    assert names == ["1", "5"]
+    assert (data["total_found"], data["limit"], data["offset"]) == (5, 2, 2)
+
+
+def test_every_match_is_returned_without_a_limit(client, priced_lots):
+    names, data = search_page(client, sort="price")
+
+    assert names == ["2", "4", "1", "5", "3"]
+    assert (data["total_found"], data["limit"]) == (5, None)
+
+
+def test_offset_past_the_end_still_reports_the_total(client, priced_lots):
+    names, data = search_page(client, q="harbour", limit=2, offset=10)
+
+    assert names == []
+    assert data["total_found"] == 5
+
+
+def test_search_is_a_single_query(app, client, priced_lots):
+    with app.app_context():
+        engine = db.engine
+    with capture_statements(engine) as captured:
+        search_page(client, q="dock", min_spots=1, max_price=6, sort="availability")
+
+    assert len(captured) == 1
+
+
+def test_unknown_sort_is_rejected(client, priced_lots):
+    response = client.get("/api/parking/search?sort=distance")
+
+    assert response.status_code == 400
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Query budget tests for every API endpoint
+
+Each route of the five blueprints is called with a JWT for the role it
+serves, against a small and a large seeded database, while the statements
+sent to the engine are counted (including those sent while a streamed
+body is read). A case fails when either count exceeds the endpoint's
+budget or when the two counts differ: the budget does not depend on the
+amount of data, so an N+1 query shows up as soon as there are more rows.
+
+A route without an entry in ENDPOINTS fails test_every_route_has_a_budget.
+Endpoints whose work depends on the request body get further cases in
+VARIANTS.
+"""
+
+import shutil
+
+import pytest
+from sqlalchemy import event
+
+from config import config, TestingConfig
+
+# Databases every endpoint is measured against; the large one has several
+# times the rows of the small one in every table
+SIZES = {
+    "small": dict(lots=3, spots_per_lot=8, users=6, reservations=40),
+    "large": dict(lots=15, spots_per_lot=40, users=60, reservations=1500),
+}
+
+LOGIN_PASSWORD = "budget-password"
+
+
+class Call:
+    """How to call one endpoint, and the most statements it may send.
+
+    `path` and `json` string values are formatted with the ids of the
+    prepared rows (see prepare()) and with whatever `setup` returns.
+    `identity` names the id the JWT is issued for.
+    """
+
+    def __init__(self, path, role, budget, json=None, identity="user_id", setup=None):
+        self.path = path
+        self.role = role
+        self.budget = budget
+        self.json = json
+        self.identity = identity
+        self.setup = setup
+
+
+def export_file_token(app, ids):
+    """Write an export for the user and sign a download link to it"""
+    from tasks import export_serializer, write_user_export
+
+    path, _ = write_user_export(ids["user_id"])
+    return {
+        "token": export_serializer().dumps(
+            {"file": path.rsplit("/", 1)[-1], "user": ids["user_id"]}
+        )
+    }
+
+
+def queued_export_job(app, ids):
+    from app import cache
+
+    cache.set("export-job:budget-job", ids["user_id"])
+    return {"task_id": "budget-job"}
+
+
+NEW_LOT = {
+    "prime_location_name": "Budget Plaza",
+    "address": "1 Budget Road",
+    "pin_code": "56000",
+    "price_per_hour": 3.5,
+    "number_of_spots": 10,
+}
+
+ENDPOINTS = {
+    # auth
+    ("POST", "auth.login"): Call(
+        "/api/auth/login",
+        None,
+        2,
+        json={"username": "budget_user", "password": LOGIN_PASSWORD},
+    ),
+    ("POST", "auth.register"): Call(
+        "/api/auth/register",
+        None,
+        4,
+        json={
+            "username": "newcomer",
+            "email": "newcomer@example.com",
+            "password": "newcomer-password",
+            "first_name": "New",
+            "last_name": "Comer",
+        },
+    ),
+    ("POST", "auth.refresh"): Call("/api/auth/refresh", "refresh", 0),
+    ("POST", "auth.logout"): Call("/api/auth/logout", "user", 0),
+    ("GET", "auth.get_current_user"): Call("/api/auth/me", "user", 1),
+    ("POST", "auth.change_password"): Call(
+        "/api/auth/change-password",
+        "user",
+        2,
+        json={"old_password": LOGIN_PASSWORD, "new_password": "changed-password"},
+        identity="login_user_id",
+    ),
+    # admin
+    ("GET", "admin.get_dashboard"): Call("/api/admin/dashboard", "admin", 8),
+    ("GET", "admin.get_cache_stats"): Call("/api/admin/cache-stats", "admin", 0),
+    ("GET", "admin.get_all_users"): Call("/api/admin/users", "admin", 2),
+    ("GET", "admin.get_parking_lots"): Call("/api/admin/parking-lots", "admin", 1),
+    ("POST", "admin.create_parking_lot"): Call(
+        "/api/admin/parking-lots", "admin", 3, json=NEW_LOT
+    ),
+    ("PUT", "admin.update_parking_lot"): Call(
+        "/api/admin/parking-lots/{lot_id}",
+        "admin",
+        3,
+        json={"price_per_hour": 4.5, "description": "Repriced"},
+    ),
+    ("DELETE", "admin.delete_parking_lot"): Call(
+        "/api/admin/parking-lots/{empty_lot_id}", "admin", 6
+    ),
+    ("GET", "admin.get_parking_spots"): Call(
+        "/api/admin/parking-lots/{lot_id}/spots", "admin", 3
+    ),
+    ("PUT", "admin.update_user_status"): Call(
+        "/api/admin/users/{other_user_id}", "admin", 3, json={"is_active": False}
+    ),
+    ("GET", "admin.get_user_reservations"): Call(
+        "/api/admin/users/{user_id}/reservations", "admin", 2
+    ),
+    ("GET", "admin.get_all_reservations"): Call("/api/admin/reservations", "admin", 2),
+    # user
+    ("GET", "user.get_dashboard"): Call("/api/user/dashboard", "user", 4),
+    ("GET", "user.get_profile"): Call("/api/user/profile", "user", 1),
+    ("PUT", "user.update_profile"): Call(
+        "/api/user/profile", "user", 3, json={"first_name": "Renamed"}
+    ),
+    ("GET", "user.get_available_parking_lots"): Call(
+        "/api/user/parking-lots", "user", 1
+    ),
+    ("POST", "user.create_reservation"): Call(
+        "/api/user/reservations",
+        "user",
+        10,
+        json={"lot_id": 1, "vehicle_number": "KA-0001"},
+        identity="free_user_id",
+    ),
+    ("GET", "user.get_user_reservations"): Call("/api/user/reservations", "user", 2),
+    ("GET", "user.get_reservation_details"): Call(
+        "/api/user/reservations/{reserved_id}", "user", 1
+    ),
+    ("POST", "user.park_vehicle"): Call(
+        "/api/user/reservations/{reserved_id}/park", "user", 3
+    ),
+    ("POST", "user.release_parking_spot"): Call(
+        "/api/user/reservations/{active_id}/release", "user", 6
+    ),
+    # parking
+    ("GET", "parking.get_parking_lots"): Call("/api/parking/lots", None, 1),
+    ("GET", "parking.get_parking_lot_details"): Call(
+        "/api/parking/lots/{lot_id}", None, 1
+    ),
+    ("GET", "parking.get_parking_spots"): Call(
+        "/api/parking/lots/{lot_id}/spots", None, 2
+    ),
+    ("GET", "parking.get_availability"): Call("/api/parking/availability", None, 1),
+    ("GET", "parking.stream_availability"): Call(
+        "/api/parking/availability/stream", None, 1
+    ),
+    ("GET", "parking.search_parking"): Call(
+        "/api/parking/search?q=Market&sort=price", None, 1
+    ),
+    ("GET", "parking.get_reservation_status"): Call(
+        "/api/parking/reservations/{reserved_id}/status", "user", 1
+    ),
+    ("POST", "parking.quick_reserve"): Call(
+        "/api/parking/lots/{lot_id}/reserve",
+        "user",
+        10,
+        json={"vehicle_number": "KA-0002"},
+        identity="free_user_id",
+    ),
+    # analytics
+    ("GET", "analytics.get_analytics_dashboard"): Call(
+        "/api/analytics/dashboard", "admin", 6
+    ),
+    ("GET", "analytics.get_lot_analytics"): Call(
+        "/api/analytics/lots/{lot_id}/analytics", "admin", 3
+    ),
+    ("GET", "analytics.export_user_data"): Call(
+        "/api/analytics/export/user-data?format=csv", "user", 1
+    ),
+    ("POST", "analytics.enqueue_user_data_export"): Call(
+        "/api/analytics/export/user-data/jobs", "user", 3
+    ),
+    ("GET", "analytics.get_user_data_export_job"): Call(
+        "/api/analytics/export/user-data/jobs/{task_id}",
+        "user",
+        0,
+        setup=queued_export_job,
+    ),
+    ("GET", "analytics.download_user_data_export"): Call(
+        "/api/analytics/export/download/{token}", None, 0, setup=export_file_token
+    ),
+}
+
+# Further calls of endpoints whose work depends on the request body, keyed
+# (method, endpoint, variant); the endpoint's plain call is in ENDPOINTS
+VARIANTS = {
+    ("PUT", "admin.update_parking_lot", "grow"): Call(
+        "/api/admin/parking-lots/{lot_id}", "admin", 7, json={"number_of_spots": 100}
+    ),
+    ("PUT", "admin.update_parking_lot", "shrink"): Call(
+        "/api/admin/parking-lots/{empty_lot_id}",
+        "admin",
+        12,
+        json={"number_of_spots": 1},
+    ),
+}
+
+CASES = {(method, endpoint, ""): call for (method, endpoint), call in ENDPOINTS.items()}
+CASES.update(VARIANTS)
+
+
+def build_app(database, uploads):
+    from app import create_app
+
+    config["pytest-budgets"] = type(
+        "BudgetConfig",
+        (TestingConfig,),
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}",
+            "UPLOAD_FOLDER": str(uploads),
+        },
+    )
+    return create_app("pytest-budgets")
+
+
+def dispose(app):
+    from models import db
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def prepare(app, lots, users, **sizes):
+    """Rows the calls act on, beyond the seeded history; returns their ids"""
+    from models import db, User, Reservation
+
+    with app.app_context():
+        login_user = User(
+            username="budget_user",
+            email="budget_user@example.com",
+            first_name="Budget",
+            last_name="User",
+        )
+        login_user.set_password(LOGIN_PASSWORD)
+        db.session.add(login_user)
+
+        # User 1 holds one reservation waiting to park and one parked car
+        reserved = Reservation.reserve_first_available(1, 1, "KA-1111")
+        active = Reservation.reserve_first_available(1, 2, "KA-2222")
+        db.session.flush()
+        active.status = "active"
+        active.parking_timestamp = active.reservation_timestamp
+        db.session.commit()
+
+        return {
+            "user_id": 1,
+            "other_user_id": 2,
+            "free_user_id": 3,
+            "login_user_id": login_user.id,
+            "lot_id": 1,
+            "empty_lot_id": lots,
+            "reserved_id": reserved.id,
+            "active_id": active.id,
+        }
+
+
+@pytest.fixture(scope="module")
+def templates(tmp_path_factory):
+    """A seeded and prepared database file per size, copied by each case"""
+    from conftest import seed_database
+    from models import db
+
+    built = {}
+    for size, sizes in SIZES.items():
+        directory = tmp_path_factory.mktemp(f"budget-{size}")
+        database = directory / "template.db"
+        app = build_app(database, directory / "uploads")
+        with app.app_context():
+            db.create_all()
+        seed_database(app, **sizes)
+        ids = prepare(app, **sizes)
+        dispose(app)
+        built[size] = (database, ids)
+    return built
+
+
+def headers_for(app, call, ids):
+    from flask_jwt_extended import create_access_token, create_refresh_token
+
+    if call.role is None:
+        return {}
+    user_type = "admin" if call.role == "admin" else "user"
+    identity_id = 1 if call.role == "admin" else ids[call.identity]
+    identity = {"id": identity_id, "username": "budget", "type": user_type}
+    with app.app_context():
+        if call.role == "refresh":
+            token = create_refresh_token(identity=identity)
+        else:
+            token = create_access_token(identity=identity)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def format_json(value, params):
+    if isinstance(value, dict):
+        return {key: format_json(item, params) for key, item in value.items()}
+    if isinstance(value, str):
+        return value.format(**params)
+    return value
+
+
+def count_statements(template, call, method, tmp_path):
+    """Statements one call sends against a copy of a template database"""
+    from models import db
+
+    source, ids = template
+    tmp_path.mkdir()
+    database = tmp_path / source.name
+    shutil.copy(source, database)
+    app = build_app(database, tmp_path / "uploads")
+
+    try:
+        params = dict(ids)
+        if call.setup:
+            with app.app_context():
+                params.update(call.setup(app, ids))
+
+        client = app.test_client()
+        headers = headers_for(app, call, ids)
+        with app.app_context():
+            engine = db.engine
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.open(
+                call.path.format(**params),
+                method=method,
+                headers=headers,
+                json=format_json(call.json, params),
+                buffered=False,
+            )
+            # Streamed bodies query while they are read. The availability
+            # stream runs until its TTL; all its queries precede its body.
+            if response.mimetype == "text/event-stream":
+                next(iter(response.response))
+            else:
+                response.get_data()
+            response.close()
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        assert response.status_code < 400, (response.status_code, response.data)
+        return statements
+    finally:
+        dispose(app)
+
+
+def test_every_route_has_a_budget(app):
+    routes = {
+        (method, rule.endpoint)
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != "static"
+        for method in rule.methods - {"HEAD", "OPTIONS"}
+    }
+
+    assert routes - set(ENDPOINTS) == set()
+    assert set(ENDPOINTS) - routes == set()
+    assert {(method, endpoint) for method, endpoint, _ in VARIANTS} <= routes
+
+
+@pytest.mark.parametrize(
+    "method, endpoint, variant", sorted(CASES), ids=lambda value: value or "plain"
+)
+def test_query_budget(templates, method, endpoint, variant, tmp_path):
+    call = CASES[(method, endpoint, variant)]
+
+    counts = {}
+    for size in SIZES:
+        statements = count_statements(templates[size], call, method, tmp_path / size)
+        counts[size] = len(statements)
+        assert counts[size] <= call.budget, statements
+
+    assert counts["small"] == counts["large"], counts
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Index usage tests for the hot query paths
+
+Each case runs a real endpoint or task against a seeded SQLite database,
+captures the statements it issues and runs EXPLAIN QUERY PLAN on them. A
+case fails when a statement reads parking_spots or reservations with a
+plain full table scan instead of an index.
+"""
+
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from models import db
+
+# Tables that grow with usage and must never be scanned without an index
+HOT_TABLES = {"parking_spots", "reservations"}
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+HOT_REQUESTS = [
+    ("user", "GET", "/api/user/dashboard"),
+    ("user", "GET", "/api/user/reservations"),
+    ("user", "GET", "/api/user/reservations?status=completed"),
+    ("user", "GET", "/api/user/reservations?after="),
+    ("user", "GET", "/api/user/reservations/{reservation_id}"),
+    ("user", "GET", "/api/analytics/dashboard"),
+    ("user", "GET", "/api/analytics/export/user-data"),
+    ("user", "GET", "/api/analytics/export/user-data?format=csv"),
+    ("user", "POST", "/api/user/reservations"),
+    ("user", "POST", "/api/parking/lots/2/reserve"),
+    (None, "GET", "/api/parking/lots"),
+    (None, "GET", "/api/parking/lots/1"),
+    (None, "GET", "/api/parking/lots/1/spots"),
+    (None, "GET", "/api/parking/availability"),
+    ("admin", "GET", "/api/admin/dashboard"),
+    ("admin", "GET", "/api/admin/reservations"),
+    ("admin", "GET", "/api/admin/reservations?status=active"),
+    ("admin", "GET", "/api/admin/reservations?after="),
+    ("admin", "GET", "/api/admin/reservations?status=completed&after="),
+    ("admin", "GET", "/api/admin/users?after="),
+    ("admin", "GET", "/api/admin/users/1/reservations"),
+    ("admin", "GET", "/api/admin/parking-lots/1/spots"),
+    ("admin", "GET", "/api/analytics/dashboard"),
+    ("admin", "GET", "/api/analytics/lots/1/analytics"),
+    ("admin", "DELETE", "/api/admin/parking-lots/5"),
+]
+
+
+@contextmanager
+def capture_statements(engine):
+    """Collect the single-row statements sent to the engine"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if not many and statement.lstrip().upper().startswith(
+            ("SELECT", "UPDATE", "DELETE")
+        ):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_table_scans(engine, captured):
+    """Return (statement, plan line) pairs for unindexed scans of hot tables"""
+    scans = []
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            plan = conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).fetchall()
+            for row in plan:
+                match = FULL_SCAN.match(row[-1])
+                if match and match.group(1) in HOT_TABLES:
+                    scans.append((statement, row[-1]))
+    return scans
+
+
+def assert_indexed(engine, captured):
+    scans = full_table_scans(engine, captured)
+    assert not scans, "\n\n".join(f"{line}\n  {sql}" for sql, line in scans)
+
+
+def start_parking(client, headers):
+    """Give user 1 an active reservation so active-status paths have data"""
+    response = client.post(
+        "/api/user/reservations",
+        json={"lot_id": 1, "vehicle_number": "KA-0001"},
+        headers=headers,
+    )
+    reservation_id = response.get_json()["reservation"]["id"]
+    client.post(f"/api/user/reservations/{reservation_id}/park", headers=headers)
+    return reservation_id
+
+
+@pytest.mark.parametrize("user_type,method,path", HOT_REQUESTS)
+def test_hot_endpoint_queries_use_indexes(
+    app, client, seed, auth_headers, user_type, method, path
+):
+    seed()
+    reservation_id = start_parking(client, auth_headers("user", 1))
+    path = path.format(reservation_id=reservation_id)
+
+    # User 1 is parked, so new reservations come from user 2
+    headers = {}
+    if user_type:
+        headers = auth_headers(user_type, 2 if method == "POST" else 1)
+    body = {"lot_id": 3, "vehicle_number": "KA-0002"} if method == "POST" else None
+
+    with app.app_context():
+        engine = db.engine
+    with capture_statements(engine) as captured:
+        response = client.open(path, method=method, json=body, headers=headers)
+
+    assert response.status_code < 300, response.get_json()
+    assert captured
+    assert_indexed(engine, captured)
+
+
+def test_release_queries_use_indexes(app, client, seed, auth_headers):
+    seed()
+    headers = auth_headers("user", 1)
+    reservation_id = start_parking(client, headers)
+
+    with app.app_context():
+        engine = db.engine
+    with capture_statements(engine) as captured:
+        response = client.post(
+            f"/api/user/reservations/{reservation_id}/release", headers=headers
+        )
+
+    assert response.status_code == 200, response.get_json()
+    assert_indexed(engine, captured)
+
+
+@pytest.mark.parametrize(
+    "task_name,args",
+    [
+        ("daily_reminder", ()),
+        ("monthly_report", ()),
+        ("export_user_data_csv", (1, "user_1@example.com")),
+        ("reconcile_spot_counters", ()),
+    ],
+)
+def test_task_queries_use_indexes(app, seed, task_name, args):
+    import tasks
+
+    seed()
+    with app.app_context():
+        engine = db.engine
+        with capture_statements(engine) as captured:
+            result = getattr(tasks, task_name)(*args)
+
+    assert not str(result).startswith("Error"), result
+    assert_indexed(engine, captured)
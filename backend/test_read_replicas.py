@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for read replica routing, with a SQLite replica copied from the
+primary file on demand
+"""
+
+import pytest
+
+from config import config, TestingConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a primary SQLite file with one replica file"""
+    from app import create_app
+    from app.replicas import sync_sqlite_replicas
+    from models import db
+
+    config["pytest-replicas"] = type(
+        "ReplicaConfig",
+        (TestingConfig,),
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'primary.db'}",
+            "READ_REPLICA_URLS": [f"sqlite:///{tmp_path / 'replica.db'}"],
+            "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        },
+    )
+    binds = getattr(TestingConfig, "SQLALCHEMY_BINDS", None)
+    app = create_app("pytest-replicas")
+    with app.app_context():
+        db.create_all()
+    sync_sqlite_replicas(app)
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registered a metadata per replica bind on the shared db
+    # object; drop them and the binds so create_all in later tests does not
+    # look for the replicas
+    for key in app.extensions["read_replicas"]:
+        db.metadatas.pop(key, None)
+    app.config["SQLALCHEMY_BINDS"] = binds
+    config.pop("pytest-replicas", None)
+
+
+def add_lot(app, name):
+    from models import db, ParkingLot
+
+    with app.app_context():
+        db.session.add(
+            ParkingLot(
+                prime_location_name=name,
+                address="1 Replica Road",
+                pin_code="00000",
+                number_of_spots=0,
+                price_per_hour=2.0,
+            )
+        )
+        db.session.commit()
+
+
+def lot_names(response):
+    assert response.status_code == 200
+    return {lot["prime_location_name"] for lot in response.get_json()["parking_lots"]}
+
+
+def test_reads_are_served_by_the_replica_until_it_syncs(app, client):
+    from app.replicas import sync_sqlite_replicas
+
+    add_lot(app, "Fresh Lot")
+    assert lot_names(client.get("/api/parking/lots")) == set()
+
+    sync_sqlite_replicas(app)
+    assert lot_names(client.get("/api/parking/lots")) == {"Fresh Lot"}
+
+
+def test_writer_reads_its_own_writes(app, client, auth_headers):
+    admin = auth_headers("admin", 1)
+    response = client.post(
+        "/api/admin/parking-lots",
+        json={
+            "prime_location_name": "Admin Lot",
+            "address": "2 Replica Road",
+            "pin_code": "00000",
+            "price_per_hour": 3.0,
+            "number_of_spots": 2,
+        },
+        headers=admin,
+    )
+    assert response.status_code == 201
+
+    # The admin who wrote reads from the primary, everyone else the replica
+    assert lot_names(client.get("/api/admin/parking-lots", headers=admin)) == {
+        "Admin Lot"
+    }
+    other_admin = auth_headers("admin", 2)
+    assert (
+        lot_names(client.get("/api/admin/parking-lots", headers=other_admin)) == set()
+    )
+
+
+def test_other_blueprints_and_writes_use_the_primary(app, client, auth_headers):
+    from models import db, ParkingLot
+
+    add_lot(app, "Primary Lot")
+    response = client.get("/api/user/parking-lots", headers=auth_headers("user", 1))
+    assert lot_names(response) == {"Primary Lot"}
+
+    with app.app_context():
+        db.session.info["read_bind"] = "replica_0"
+        assert ParkingLot.query.count() == 0
+
+        lot = ParkingLot(
+            prime_location_name="Written Lot",
+            address="3 Replica Road",
+            pin_code="00000",
+            number_of_spots=0,
+            price_per_hour=2.0,
+        )
+        db.session.add(lot)
+        db.session.commit()
+
+        # The write went to the primary and moved the session's reads there
+        assert "read_bind" not in db.session.info
+        assert ParkingLot.query.count() == 2
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Consistency tests for the hourly reservation rollup
+
+Reservations made and released through the API update the rollup
+incrementally; rebuilding it from the reservation history must give the
+same buckets.
+"""
+
+from models import db, ReservationHourlyRollup
+
+
+def rollup_rows():
+    rows = db.session.query(ReservationHourlyRollup).order_by(
+        ReservationHourlyRollup.lot_id, ReservationHourlyRollup.hour_bucket
+    )
+    return [
+        (
+            row.lot_id,
+            row.hour_bucket,
+            row.reservation_count,
+            row.completed_count,
+            round(row.revenue, 2),
+            round(row.parked_seconds),
+        )
+        for row in rows
+    ]
+
+
+def test_incremental_rollup_matches_backfill(app, client, seed, auth_headers):
+    from tasks import backfill_reservation_rollup
+
+    seed(reservations=300)
+    for user_id, lot_id in ((1, 1), (2, 1), (3, 2)):
+        headers = auth_headers("user", user_id)
+        response = client.post(
+            "/api/user/reservations",
+            json={"lot_id": lot_id, "vehicle_number": f"KA-{user_id:04d}"},
+            headers=headers,
+        )
+        reservation_id = response.get_json()["reservation"]["id"]
+        client.post(f"/api/user/reservations/{reservation_id}/park", headers=headers)
+        if user_id != 3:
+            response = client.post(
+                f"/api/user/reservations/{reservation_id}/release", headers=headers
+            )
+            assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        incremental = rollup_rows()
+        assert sum(row[2] for row in incremental) == 303
+        assert sum(row[3] for row in incremental) == 302
+
+        assert not backfill_reservation_rollup().startswith("Error")
+        assert rollup_rows() == incremental
+
+
+def test_admin_analytics_reads_rollup(app, client, seed, auth_headers):
+    seed(reservations=300)
+    with app.app_context():
+        revenue = db.session.query(
+            db.func.sum(ReservationHourlyRollup.revenue)
+        ).scalar()
+
+    response = client.get("/api/analytics/dashboard", headers=auth_headers("admin"))
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data["overview"]["total_reservations"] == 300
+    assert data["revenue"]["total_revenue"] == round(revenue, 2)
+    assert (
+        sum(day["reservations"] for day in data["trends"]["daily_reservations"]) <= 300
+    )
+
+
+def test_shrinking_a_lot_subtracts_its_removed_reservations(
+    app, client, seed, auth_headers
+):
+    from models import Reservation
+    from tasks import backfill_reservation_rollup
+
+    seed(lots=2, spots_per_lot=10, reservations=300)
+    response = client.put(
+        "/api/admin/parking-lots/1",
+        json={"number_of_spots": 2},
+        headers=auth_headers("admin"),
+    )
+    assert response.status_code == 200, response.get_json()
+
+    response = client.get("/api/analytics/dashboard", headers=auth_headers("admin"))
+    overview = response.get_json()["overview"]
+
+    with app.app_context():
+        remaining = Reservation.query.count()
+        assert remaining < 300
+        assert overview["total_reservations"] == remaining
+
+        incremental = rollup_rows()
+        assert not backfill_reservation_rollup().startswith("Error")
+        assert rollup_rows() == incremental
+
+
+def test_deleting_a_lot_drops_its_rollup(app, client, seed, auth_headers):
+    seed(lots=2, spots_per_lot=10, reservations=100)
+    response = client.delete("/api/admin/parking-lots/2", headers=auth_headers("admin"))
+    assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        assert {row[0] for row in rollup_rows()} == {1}
+
+
+def test_init_db_builds_a_missing_rollup(app, seed):
+    seed(reservations=50)
+    with app.app_context():
+        built = rollup_rows()
+        db.session.execute(db.delete(ReservationHourlyRollup))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["init-db"])
+
+    assert result.exit_code == 0, result.output
+    assert "Reservation rollup rebuilt" in result.output
+    with app.app_context():
+        assert rollup_rows() == built
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned response cache on the dashboard endpoints
+"""
+
+import threading
+import time
+
+from flask import jsonify
+from sqlalchemy import event
+
+from models import db
+
+
+def count_queries(app, client, path, headers=None):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.get_json()
+    return response, len(statements)
+
+
+def test_repeated_requests_are_served_from_cache(app, client, seed, auth_headers):
+    seed(reservations=200)
+    admin = auth_headers("admin")
+
+    first, first_queries = count_queries(app, client, "/api/analytics/dashboard", admin)
+    second, second_queries = count_queries(
+        app, client, "/api/analytics/dashboard", admin
+    )
+
+    assert first_queries > 0
+    assert second_queries == 0
+    assert second.get_json() == first.get_json()
+
+
+def test_reservation_changes_invalidate_cached_responses(
+    app, client, seed, auth_headers
+):
+    seed(reservations=200)
+    before = client.get("/api/parking/availability").get_json()["availability"]
+
+    response = client.post(
+        "/api/user/reservations",
+        json={"lot_id": 1, "vehicle_number": "KA-0001"},
+        headers=auth_headers("user", 1),
+    )
+    assert response.status_code == 201, response.get_json()
+
+    after, queries = count_queries(app, client, "/api/parking/availability")
+    after = after.get_json()["availability"]
+
+    assert queries > 0
+    assert after[0]["available_spots"] == before[0]["available_spots"] - 1
+
+
+def test_user_dashboards_are_cached_per_user(client, seed, auth_headers):
+    seed(reservations=200)
+
+    first = client.get("/api/analytics/dashboard", headers=auth_headers("user", 1))
+    second = client.get("/api/analytics/dashboard", headers=auth_headers("user", 2))
+
+    assert first.get_json() != second.get_json()
+
+
+def test_recompute_locks_are_not_kept_per_key(client, seed, auth_headers):
+    from app.caching import _local_locks
+
+    seed(reservations=20)
+    for user_id in range(1, 6):
+        for page in range(3):
+            response = client.get(
+                f"/api/analytics/dashboard?page={page}",
+                headers=auth_headers("user", user_id),
+            )
+            assert response.status_code == 200
+
+    assert _local_locks == {}
+
+
+def test_access_is_checked_before_the_cache(client, seed, auth_headers):
+    seed(reservations=10)
+
+    missing = client.get(
+        "/api/analytics/lots/99/analytics", headers=auth_headers("admin")
+    )
+    forbidden = client.get("/api/admin/dashboard", headers=auth_headers("user", 1))
+    allowed = client.get("/api/admin/dashboard", headers=auth_headers("admin"))
+    denied = client.get("/api/admin/dashboard", headers=auth_headers("user", 1))
+
+    assert forbidden.status_code == 403
+    assert allowed.status_code == 200
+    assert denied.status_code == 403
+
+
+def test_cache_stats_report_hits_and_misses(client, seed, auth_headers):
+    seed(reservations=10)
+    admin = auth_headers("admin")
+    for _ in range(3):
+        client.get("/api/admin/dashboard", headers=admin)
+
+    stats = client.get("/api/admin/cache-stats", headers=admin).get_json()["cache"]
+
+    assert stats["endpoints"]["admin-dashboard"] == {
+        "hits": 2,
+        "stale": 0,
+        "misses": 1,
+        "hit_rate": 66.67,
+    }
+
+
+def concurrent_dashboards(app, auth_headers, monkeypatch, requests=8):
+    """Fire simultaneous admin dashboard requests at a slow, counted view"""
+    import api.analytics
+
+    calls = []
+
+    def slow_admin_analytics():
+        calls.append(threading.get_ident())
+        time.sleep(0.3)
+        return jsonify({"computed": len(calls)}), 200
+
+    monkeypatch.setattr(api.analytics, "get_admin_analytics", slow_admin_analytics)
+    headers = auth_headers("admin")
+    barrier = threading.Barrier(requests)
+    responses = []
+
+    def request_dashboard():
+        client = app.test_client()
+        barrier.wait()
+        responses.append(client.get("/api/analytics/dashboard", headers=headers))
+
+    threads = [threading.Thread(target=request_dashboard) for _ in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return calls, responses
+
+
+def test_concurrent_misses_compute_once(app, auth_headers, monkeypatch):
+    calls, responses = concurrent_dashboards(app, auth_headers, monkeypatch)
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [200] * 8
+    assert all(r.get_json() == {"computed": 1} for r in responses)
+
+
+def test_stale_response_is_served_while_recomputing(
+    app, client, auth_headers, monkeypatch
+):
+    from app.caching import bump_data_version
+
+    admin = auth_headers("admin")
+    client.get("/api/analytics/dashboard", headers=admin)
+    with app.app_context():
+        bump_data_version()
+
+    calls, responses = concurrent_dashboards(app, auth_headers, monkeypatch)
+    bodies = [r.get_json() for r in responses]
+
+    assert len(calls) == 1
+    # One request recomputed, the others got the previous dashboard
+    assert bodies.count({"computed": 1}) == 1
+    assert sum("overview" in body for body in bodies) == 7
+
+    stats = client.get("/api/admin/cache-stats", headers=admin).get_json()["cache"]
+    assert stats["endpoints"]["analytics-dashboard"]["stale"] == 7
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-request SQL instrumentation
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from config import config, TestingConfig
+
+
+@pytest.fixture
+def instrumented_app(tmp_path):
+    from app import create_app
+    from models import db
+
+    config["pytest-instrumented"] = type(
+        "InstrumentedConfig",
+        (TestingConfig,),
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'parking_test.db'}",
+            "SQL_INSTRUMENTATION": True,
+        },
+    )
+    app = create_app("pytest-instrumented")
+    with app.app_context():
+        db.create_all()
+
+    @app.route("/lots-one-by-one")
+    def lots_one_by_one():
+        from models import ParkingLot
+
+        ids = [lot.id for lot in ParkingLot.query.all()]
+        names = [
+            ParkingLot.query.filter_by(id=i).one().prime_location_name for i in ids
+        ]
+        return {"names": names}
+
+    @app.route("/failing-statement")
+    def failing_statement():
+        try:
+            db.session.execute(text("SELECT * FROM missing_table"))
+        except OperationalError:
+            db.session.rollback()
+        connection = db.session.connection()
+        return {"pending": list(connection.info.get("query_started", []))}
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def server_timing(response):
+    """Query count and DB milliseconds from the Server-Timing header"""
+    match = re.search(
+        r'db;dur=([\d.]+);desc="(\d+) queries"', response.headers["Server-Timing"]
+    )
+    return int(match.group(2)), float(match.group(1))
+
+
+def sql_logs(caplog):
+    return [
+        json.loads(record.getMessage())
+        for record in caplog.records
+        if record.getMessage().startswith('{"event": "sql"')
+    ]
+
+
+def test_reports_query_count_and_time_per_request(instrumented_app, caplog):
+    from conftest import seed_database
+
+    seed_database(instrumented_app, lots=3, users=5, reservations=20)
+    client = instrumented_app.test_client()
+
+    with caplog.at_level(logging.INFO, logger=instrumented_app.logger.name):
+        response = client.get("/api/parking/lots")
+
+    assert response.status_code == 200
+    count, db_ms = server_timing(response)
+    assert count >= 1
+    assert db_ms >= 0
+    assert "app;dur=" in response.headers["Server-Timing"]
+
+    [log] = sql_logs(caplog)
+    assert log["endpoint"] == "parking.get_parking_lots"
+    assert log["queries"] == count
+    assert log["repeated"] == []
+
+
+def test_flags_repeated_statements(instrumented_app, caplog):
+    from conftest import seed_database
+
+    seed_database(instrumented_app, lots=6, users=2, reservations=1)
+    client = instrumented_app.test_client()
+
+    with caplog.at_level(logging.INFO, logger=instrumented_app.logger.name):
+        response = client.get("/lots-one-by-one")
+
+    assert server_timing(response)[0] == 7
+    [record] = [r for r in caplog.records if r.levelno == logging.WARNING]
+    [repeated] = json.loads(record.getMessage())["repeated"]
+    assert repeated["count"] == 6
+    assert repeated["statement"].startswith("SELECT ... FROM parking_lots WHERE")
+
+
+def test_failed_statements_are_counted_and_not_left_pending(instrumented_app):
+    response = instrumented_app.test_client().get("/failing-statement")
+
+    assert response.get_json() == {"pending": []}
+    assert server_timing(response)[0] == 1
+
+
+def test_unsampled_requests_are_not_measured(instrumented_app):
+    instrumented_app.config["SQL_INSTRUMENTATION_SAMPLE_RATE"] = 0
+    response = instrumented_app.test_client().get("/api/parking/lots")
+
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+
+
+def test_off_by_default(app, client):
+    from app.instrumentation import _before_cursor_execute
+    from models import db
+
+    response = client.get("/api/parking/lots")
+
+    assert "Server-Timing" not in response.headers
+    with app.app_context():
+        assert not event.contains(
+            db.engine, "before_cursor_execute", _before_cursor_execute
+        )
+
+
+@pytest.mark.parametrize(
+    "value, enabled",
+    [("1", True), ("true", True), ("On", True), ("0", False), ("false", False)],
+)
+def test_enabled_from_environment(value, enabled):
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from config import Config; print(Config.SQL_INSTRUMENTATION)",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "SQL_INSTRUMENTATION": value},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert output.strip() == str(enabled)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the production SQLite profile
+"""
+
+import pytest
+from sqlalchemy import text
+
+from config import config, ProductionConfig, TestingConfig
+
+
+@pytest.fixture
+def production_app(tmp_path):
+    """App on a SQLite file with the production pragmas and pool"""
+    from app import create_app
+    from models import db
+
+    config["pytest-production-sqlite"] = type(
+        "ProductionSqliteConfig",
+        (TestingConfig,),
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'parking_prod.db'}",
+            "SQLITE_PRAGMAS": ProductionConfig.SQLITE_PRAGMAS,
+            "SQLALCHEMY_ENGINE_OPTIONS": ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+        },
+    )
+    app = create_app("pytest-production-sqlite")
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def pragma(connection, name):
+    return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_every_connection_gets_the_production_pragmas(production_app):
+    from models import db
+
+    with production_app.app_context():
+        engine = db.engine
+        assert (
+            engine.pool.size()
+            == ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS["pool_size"]
+        )
+        # Two connections checked out at once are distinct pool entries
+        with engine.connect() as first, engine.connect() as second:
+            for connection in (first, second):
+                assert pragma(connection, "journal_mode") == "wal"
+                assert pragma(connection, "synchronous") == 1  # NORMAL
+                assert pragma(connection, "busy_timeout") == 5000
+                assert pragma(connection, "cache_size") == -64000
+                assert pragma(connection, "mmap_size") == 256 * 1024 * 1024
+                assert pragma(connection, "temp_store") == 2  # MEMORY
+
+
+def test_default_profile_leaves_sqlite_defaults(app):
+    from models import db
+
+    with app.app_context(), db.engine.connect() as connection:
+        assert pragma(connection, "journal_mode") == "delete"
+        assert pragma(connection, "synchronous") == 2  # FULL
+
+
+def test_open_reader_does_not_block_a_writer(production_app):
+    from models import db, User
+
+    with production_app.app_context():
+        reader = db.engine.raw_connection()
+        try:
+            cursor = reader.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT count(*) FROM users")
+            assert cursor.fetchone()[0] == 0
+
+            # Would wait out busy_timeout and fail under a rollback journal
+            db.session.add(
+                User(
+                    username="writer",
+                    email="writer@example.com",
+                    password_hash="x",
+                    first_name="W",
+                    last_name="R",
+                )
+            )
+            db.session.commit()
+
+            # The reader keeps its snapshot until its transaction ends
+            cursor.execute("SELECT count(*) FROM users")
+            assert cursor.fetchone()[0] == 0
+            cursor.execute("COMMIT")
+            cursor.execute("SELECT count(*) FROM users")
+            assert cursor.fetchone()[0] == 1
+        finally:
+            reader.close()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Startup budget tests
+
+Each case boots the app factory in a fresh interpreter under
+`python -X importtime`, so every module is imported cold. A case fails when
+startup imports a library that only background jobs need, touches the
+database, or takes longer than the budget.
+"""
+
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative import time allowed for the app package, in seconds. Generous
+# so slow machines pass; the module list below catches most regressions.
+IMPORT_BUDGET = 1.5
+
+# Libraries that web workers must not load at startup
+LAZY_MODULES = [
+    "celery",
+    "kombu",
+    "tasks",
+    "requests",
+    "pandas",
+    "matplotlib",
+    "seaborn",
+    "flask_user",
+]
+
+
+def boot(tmp_path):
+    """Build an app in a new interpreter; returns (loaded modules, timings)"""
+    database = tmp_path / "startup.db"
+    code = (
+        "import sys\n"
+        "from config import config, TestingConfig\n"
+        "config['startup'] = type('StartupConfig', (TestingConfig,), "
+        f"{{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{database}'}})\n"
+        "from app import create_app\n"
+        "create_app('startup')\n"
+        "print('\\n'.join(sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                timings[name.strip()] = int(cumulative) / 1e6
+    return set(result.stdout.split()), timings, database
+
+
+def test_app_factory_has_no_side_effects(tmp_path):
+    _, _, database = boot(tmp_path)
+
+    assert not database.exists()
+
+
+def test_app_factory_leaves_heavy_imports_to_jobs(tmp_path):
+    modules, _, _ = boot(tmp_path)
+
+    loaded = [name for name in LAZY_MODULES if name in modules]
+    assert not loaded
+
+
+def test_app_import_time_budget(tmp_path):
+    _, timings, _ = boot(tmp_path)
+
+    assert timings["app"] < IMPORT_BUDGET, sorted(
+        timings.items(), key=lambda item: -item[1]
+    )[:15]
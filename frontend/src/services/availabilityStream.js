@@ -0,0 +1,33 @@
+import api from '@/services/api'
+
+// Subscribe to live parking availability pushed by the server.
+// onSnapshot receives every active lot once per (re)connection, onChange
+// receives a single lot whenever its spot counters change.
+// Returns a function that closes the stream.
+export function subscribeAvailability({ onSnapshot, onChange } = {}) {
+    if (typeof EventSource === 'undefined') {
+        return () => {}
+    }
+
+    const source = new EventSource(`${api.defaults.baseURL}/parking/availability/stream`)
+
+    source.addEventListener('snapshot', event => {
+        if (onSnapshot) {
+            onSnapshot(JSON.parse(event.data))
+        }
+    })
+
+    source.addEventListener('availability', event => {
+        if (onChange) {
+            onChange(JSON.parse(event.data))
+        }
+    })
+
+    // The server ends each stream after a while; EventSource reconnects
+    // after the advertised retry delay and receives a fresh snapshot
+    source.onerror = () => {
+        console.warn('Availability stream disconnected, retrying')
+    }
+
+    return () => source.close()
+}
@@ -175,12 +175,14 @@ export default {
             try {
                 dispatch('setLoading', true, { root: true })
 
-                const response = await api.get('/analytics/export/user-data')
+                // The server streams the CSV; compressed in transit, gunzipped by the browser
+                const response = await api.get('/analytics/export/user-data', {
+                    params: { format: 'csv', gzip: 1 },
+                    responseType: 'blob',
+                    timeout: 0
+                })
 
-                // Convert data to CSV and trigger download
-                const csvData = response.data.export_data
-                const csv = convertToCSV(csvData)
-                downloadCSV(csv, 'my-parking-history.csv')
+                downloadCSV(response.data, 'my-parking-history.csv')
 
                 dispatch('showAlert', {
                     message: 'Export completed successfully!',
@@ -208,23 +210,7 @@ export default {
 }
 
 // Helper functions
-function convertToCSV(data) {
-    if (!data.length) return ''
-
-    const headers = Object.keys(data[0])
-    const csvContent = [
-        headers.join(','),
-        ...data.map(row => headers.map(header => {
-            const value = row[header]
-            return typeof value === 'string' && value.includes(',') ? `"${value}"` : value
-        }).join(','))
-    ].join('\n')
-
-    return csvContent
-}
-
-function downloadCSV(csv, filename) {
-    const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' })
+function downloadCSV(blob, filename) {
     const link = document.createElement('a')
 
     if (link.download !== undefined) {
@@ -116,6 +116,7 @@ start_backend() {
     source venv/bin/activate
     export FLASK_ENV=development
     export FLASK_DEBUG=True
+    flask --app app init-db
     python run.py &
     BACKEND_PID=$!
     echo $BACKEND_PID > backend.pid
@@ -136,13 +137,19 @@ start_celery() {
     if command_exists redis-server && port_in_use 6379; then
         cd backend
         source venv/bin/activate
-        celery -A app.celery worker --loglevel=info &
-        CELERY_PID=$!
-        echo $CELERY_PID > celery.pid
-        echo -e "${GREEN}✅ Celery worker started (PID: $CELERY_PID)${NC}"
+        # One worker per queue so exports never wait behind bulk jobs:
+        # queue name, concurrency
+        for worker in "interactive 4" "notifications 2" "bulk 2"; do
+            set -- $worker
+            celery -A celery_worker.celery worker -Q $1 -c $2 -n $1@%h \
+                --prefetch-multiplier 1 --loglevel=info &
+            CELERY_PID=$!
+            echo $CELERY_PID > celery-$1.pid
+            echo -e "${GREEN}✅ Celery $1 worker started (PID: $CELERY_PID)${NC}"
+        done
         
         # Start Celery beat
-        celery -A app.celery beat --loglevel=info &
+        celery -A celery_worker.celery beat --loglevel=info &
         BEAT_PID=$!
         echo $BEAT_PID > celery_beat.pid
         echo -e "${GREEN}✅ Celery beat started (PID: $BEAT_PID)${NC}"
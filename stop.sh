@@ -72,9 +72,11 @@ else
     fi
 fi
 
-# Stop Celery worker
-if [ -f "backend/celery.pid" ]; then
-    stop_process "Celery Worker" "backend/celery.pid"
+# Stop Celery workers
+if ls backend/celery-*.pid > /dev/null 2>&1; then
+    for pid_file in backend/celery-*.pid; do
+        stop_process "Celery Worker $(basename $pid_file .pid)" "$pid_file"
+    done
 else
     # Try to find and stop Celery worker
     CELERY_PID=$(pgrep -f "celery.*worker")
@@ -116,7 +118,7 @@ if [ ! -z "$FRONTEND_PORT_PID" ]; then
 fi
 
 # Clean up any remaining PID files
-rm -f backend/backend.pid frontend/frontend.pid backend/celery.pid backend/celery_beat.pid
+rm -f backend/backend.pid frontend/frontend.pid backend/celery-*.pid backend/celery_beat.pid
 
 # Note about Redis
 echo -e "\n${BLUE}Note:${NC} Redis server is left running as it may be used by other applications."